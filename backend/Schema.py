@@ -1,90 +1,62 @@
 # ---------- 0. Dependencies ----------
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
 import os
-import decimal
-from typing import Any, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List
 from datetime import datetime, timezone
 import mysql.connector
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
-load_dotenv()
+import env  # noqa: F401  (must run before the settings below are read)
+
+from answer_cache import Answer, AnswerCache, get_answer_cache
+from db_pool import get_pool, run_blocking
+from query_cache import get_query_cache
+from query_guard import (
+    ER_QUERY_TIMEOUT,
+    QueryRejected,
+    check_plan,
+    execution_timeout,
+    timeout_error,
+)
+from replica_router import get_replica_router
+from result_compaction import (
+    TOOL_RESULT_TOKEN_BUDGET,
+    compact_rows,
+    compact_stale_results,
+)
+from row_codec import RowConverter, dumps
+from schema_overview import get_schema_overview
+from session_store import DEFAULT_SESSION, get_session_store
+from single_flight import SingleFlight
+from sql_guard import get_sql_guard
+from sql_text import cap_limit, normalize_sql
+from title_search import search_titles, search_titles_declaration
+from tracing import Span, span
+
+if TYPE_CHECKING:
+    # google-genai takes about half a second to import; see get_client().
+    from google import genai
+    from google.genai import types
+
+logger = logging.getLogger(__name__)
 # ---------- 1. Helpers ----------
 
 
-def _get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST", "localhost"),
-        port=int(os.getenv("MYSQL_PORT", 3306)),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database=os.getenv("MYSQL_DB"),
-    )
-
-
-def _fetch_schema_overview() -> str:
-    conn = _get_db_connection()
-    try:
-        db_name = conn.database
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT TABLE_NAME FROM information_schema.tables WHERE table_schema=%s",
-                (db_name,),
-            )
-            tables = [r[0] for r in cur.fetchall()]
-
-        lines: List[str] = []
-        with conn.cursor() as cur:
-            for tbl in tables:
-                cur.execute(
-                    """
-                    SELECT COLUMN_NAME, COLUMN_TYPE
-                    FROM information_schema.columns
-                    WHERE table_schema=%s AND table_name=%s
-                    ORDER BY ORDINAL_POSITION
-                    """,
-                    (db_name, tbl),
-                )
-                cols = [f"{c} {t}" for c, t in cur.fetchall()]
-                lines.append(f"- {tbl}: {', '.join(cols)}")
-        return "\n".join(lines)
-    finally:
-        conn.close()
-
-
-def _normalise_json(obj):
-    """Recursively convert Decimal → float so the object is JSON-serialisable."""
-    if isinstance(obj, decimal.Decimal):
-        return float(obj)  # or str(obj) if you prefer exact text
-    if isinstance(obj, list):
-        return [_normalise_json(v) for v in obj]
-    if isinstance(obj, dict):
-        return {k: _normalise_json(v) for k, v in obj.items()}
-    return obj
-
-
-def _normalise(obj):
-    from decimal import Decimal
-
-    if isinstance(obj, Decimal):
-        return float(obj)
-    if isinstance(obj, (list, tuple)):
-        return [_normalise(x) for x in obj]
-    if isinstance(obj, dict):
-        return {k: _normalise(v) for k, v in obj.items()}
-    return obj
-
-
 def _get_current_date_info() -> str:
     """获取当前日期信息，包括多种格式"""
+    # Day granularity only: the system instruction is cached until the date changes.
     now = datetime.now(timezone.utc)
     local_now = datetime.now()
 
     return f"""## Current Date Information
 - **Current UTC Date**: {now.strftime("%Y-%m-%d")}
-- **Current UTC DateTime**: {now.strftime("%Y-%m-%d %H:%M:%S UTC")}
 - **Current Local Date**: {local_now.strftime("%Y-%m-%d")}
-- **Current Local DateTime**: {local_now.strftime("%Y-%m-%d %H:%M:%S")}
 - **Day of Week**: {now.strftime("%A")}
 - **Month**: {now.strftime("%B %Y")}
 - **Year**: {now.year}
@@ -99,8 +71,6 @@ Use this date information when:
 """
 
 
-SCHEMA_OVERVIEW = _fetch_schema_overview()
-
 # ---------- 2. System instruction ----------
 
 
@@ -163,6 +133,8 @@ def _get_base_system_prompt() -> str:
     - The goal is accuracy and clarity, not rigid formatting
 
     ## Critical Instruction for Tool Usage
+    **Finding titles by name**: Call the `search_titles` tool first to turn a movie/show name (in any language) into candidate `tconst` values ranked by popularity, then query details with `execute_mysql_query` using `WHERE tconst = ...`. Only fall back to `LIKE` when `search_titles` finds nothing; `LIKE '%name%'` scans the whole table.
+
     **IMPORTANT**: You have access to the `execute_mysql_query` tool and can call it MULTIPLE TIMES in the same conversation turn. When you encounter:
     - SQL errors (wrong column names, syntax issues, etc.)
     - Empty or insufficient results
@@ -171,6 +143,8 @@ def _get_base_system_prompt() -> str:
 
     You MUST immediately call the tool again with a corrected or alternative query. Do NOT wait for user input. Keep trying different approaches until you get meaningful results or exhaust reasonable options.
 
+    **Independent lookups in one step**: When several queries do not depend on each other's results (e.g. ratings of three different films, or a count plus a top-10 list), emit all of the function calls together in the same response. They are executed in parallel and you receive every result at once, which saves a full round trip per query.
+
     ## Workflow
 
     ### 1. 🎯 Understand Requirements
@@ -225,6 +199,7 @@ def _get_base_system_prompt() -> str:
     2. **Error/Issue Analysis**
        - Column name errors → Check schema and correct
        - Syntax errors → Fix syntax and retry
+       - `too_expensive` errors → Follow the returned hint: filter on indexed keys, avoid full scans of large tables, then retry
        - Missing tconst/primaryTitle → Add required fields to SELECT clause
        - Empty results → Try broader search or different approach
        - Insufficient data → Try additional/complementary queries
@@ -270,16 +245,12 @@ def _get_base_system_prompt() -> str:
 
     ## Duplicate Title Smart Handling
 
-    When encountering movies/TV shows with identical names, use this SQL pattern (always including tconst and primaryTitle):
+    `search_titles` already returns same-named titles most popular first, so normally take its first candidate. If you must search with SQL, use the precomputed `title_popularity` table (always including tconst and primaryTitle):
     ```sql
-    SELECT tb.tconst, tb.primaryTitle, tb.startYear, tr.averageRating, tr.numVotes
-    FROM title_basics tb
-    LEFT JOIN title_ratings tr ON tb.tconst = tr.tconst
-    WHERE tb.primaryTitle LIKE '%movie_name%'
-    ORDER BY
-        COALESCE(tr.numVotes, 0) DESC,
-        COALESCE(tr.averageRating, 0) DESC,
-        COALESCE(tb.startYear, 0) DESC
+    SELECT tconst, primaryTitle, startYear, averageRating, numVotes
+    FROM title_popularity
+    WHERE primaryTitle = 'Movie Name'
+    ORDER BY popularity_rank
     LIMIT 1;
     ```
 
@@ -291,6 +262,8 @@ def _get_base_system_prompt() -> str:
     - **title_episode**: Episode data for TV series
     - **title_akas**: Alternative titles (note: uses titleId instead of tconst)
     - **name_basics**: People data with nconst as unique ID
+    - **title_popularity**, **year_genre_stats**, **person_filmography**: precomputed summaries (popularity ranks, per year/genre/titleType rating stats with the most voted and best rated tconst, per-person credit counts and ratings). Prefer them over aggregating title_basics/title_ratings/title_principals, e.g. "best horror movie of 1999" → `SELECT best_tconst FROM year_genre_stats WHERE startYear = 1999 AND genre = 'Horror' AND titleType = 'movie'`, "most prolific directors" → `ORDER BY directing_count DESC` on person_filmography
+    - **title_genre** (tconst, genre), **title_director** / **title_writer** (tconst, nconst), **person_known_for** (nconst, tconst), **person_profession** (nconst, profession): indexed one-row-per-value versions of the comma-separated columns `title_basics.genres`, `title_crew.directors`/`writers`, `name_basics.knownForTitles`/`primaryProfession`. Always JOIN these instead of using `FIND_IN_SET` or `LIKE` on the list columns, e.g. `JOIN title_genre g ON g.tconst = tb.tconst AND g.genre = 'Horror'` or `JOIN title_director d ON d.tconst = tb.tconst WHERE d.nconst = 'nm0634240'`
 
     ## Response Style Guidelines
 
@@ -318,7 +291,7 @@ def _get_system_instruction() -> str:
     return f"""{_get_base_system_prompt()}
 
 ## Database schema
-{SCHEMA_OVERVIEW}
+{get_schema_overview().get()}
 """
 
 
@@ -328,7 +301,9 @@ mysql_query_declaration: Dict[str, Any] = {
     "name": "execute_mysql_query",
     "description": (
         "Runs a read-only SELECT on the project's MySQL database and returns the "
-        "result set as JSON (array of row objects). Mutating statements are rejected. "
+        "result set as JSON (array of row objects). Only a single SELECT is accepted; "
+        "table and column names are checked against the schema first, and errors "
+        "list the closest valid names. "
         "You can call this function MULTIPLE TIMES in the same response to retry "
         "failed queries, refine results, or gather additional data."
     ),
@@ -341,7 +316,10 @@ mysql_query_declaration: Dict[str, Any] = {
             },
             "limit": {
                 "type": "integer",
-                "description": "Optional row limit (1-1000).",
+                "description": (
+                    "Optional row limit (1-1000, default 1000). Larger results are "
+                    "cut off and reported as truncated in the metadata."
+                ),
                 "minimum": 1,
                 "maximum": 1000,
             },
@@ -353,130 +331,553 @@ mysql_query_declaration: Dict[str, Any] = {
 # ---------- 4. Actual executor ----------
 
 
-def execute_mysql_query(sql: str) -> List[Dict[str, Any]]:
-    conn = _get_db_connection()
-    try:
-        with conn.cursor(dictionary=True) as cur:
-            cur.execute(sql)
-            rows = [dict(r) for r in cur.fetchall()]
-            return _normalise(rows)
-    finally:
-        conn.close()
+MAX_ROW_LIMIT = int(os.getenv("QUERY_MAX_ROWS", 1000))
+FETCH_BATCH_SIZE = int(os.getenv("QUERY_FETCH_BATCH", 200))
+
+
+def _fetch_capped(pool, conn, sql: str, cap: int) -> tuple[List[Dict[str, Any]], bool]:
+    """Stream at most ``cap`` rows with an unbuffered cursor.
+
+    The plan is checked by the cost guard first and the statement runs under
+    ``max_execution_time``. Returns the rows, already converted to
+    JSON-ready values, and whether more rows were available.
+    """
+    sql = cap_limit(sql, cap + 1)
+    check_plan(conn, sql)
+    with execution_timeout(pool, conn, sql) as statement:
+        cur = conn.cursor(buffered=False)
+        try:
+            with span("db.execute", sql=sql):
+                cur.execute(statement)
+        except mysql.connector.Error as err:
+            if err.errno == ER_QUERY_TIMEOUT:
+                raise timeout_error(err) from err
+            raise
+        convert = RowConverter(cur.description)
+        rows: List[Dict[str, Any]] = []
+        with span("db.fetch") as s:
+            while len(rows) <= cap:
+                batch = cur.fetchmany(min(FETCH_BATCH_SIZE, cap + 1 - len(rows)))
+                if not batch:
+                    break
+                rows.extend(convert(batch))
+            s.set(rows=len(rows))
+
+        truncated = len(rows) > cap
+        if truncated and cur.fetchone() is not None:
+            # The LIMIT could not be applied; rather than draining a huge result
+            # set, drop the connection together with its unread rows.
+            pool.invalidate(conn)
+            conn.close()
+        else:
+            cur.close()
+    return rows[:cap], truncated
+
+
+query_flight = SingleFlight()
+
+
+def execute_mysql_query(
+    sql: str, limit: int | None = None
+) -> tuple[List[Dict[str, Any]], bool]:
+    """Run ``sql`` and return ``(rows, truncated)``, capped at ``limit`` rows.
+
+    ``sql`` is validated locally first (:mod:`sql_guard`) and runs on a read
+    replica when ``MYSQL_REPLICAS`` is set.  Results are served from the
+    result cache when possible, and identical queries already running for
+    another chat are joined instead of being executed again; the returned
+    rows may be shared and must not be mutated.
+    """
+    guard = get_sql_guard()
+    if guard is not None:
+        guard.validate(sql)
+    cap = max(1, min(int(limit or MAX_ROW_LIMIT), MAX_ROW_LIMIT))
+    cache = get_query_cache()
+    key = (normalize_sql(sql), cap)
+    if cache is not None:
+        hit, result = cache.get(key)
+        if hit:
+            return result
+
+    def run() -> tuple[List[Dict[str, Any]], bool]:
+        router = get_replica_router()
+        if router is not None:
+            result = router.run(lambda pool, conn: _fetch_capped(pool, conn, sql, cap))
+        else:
+            pool = get_pool()
+            with pool.connection() as conn:
+                result = _fetch_capped(pool, conn, sql, cap)
+        if cache is not None:
+            cache.put(key, result)
+        return result
+
+    return query_flight.do(key, run)
 
 
 # ---------- 5. Gemini client & base config ----------
 
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-_tool_spec = types.Tool(function_declarations=[mysql_query_declaration])
+# Built on first use (or by the app lifespan in the background), so importing
+# this module needs neither google-genai nor an API key.  Tests may assign a
+# stand-in to ``client`` directly.
+client: genai.Client | None = None
+_client_lock = threading.Lock()
 
 
-def _get_base_config():
-    """动态生成配置，确保每次都有最新的日期信息"""
-    return types.GenerateContentConfig(
-        system_instruction=_get_system_instruction(), tools=[_tool_spec]
+def get_client() -> genai.Client:
+    """The shared Gemini client, created on first use."""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from google import genai
+
+                client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    return client
+
+
+def _tool_spec() -> types.Tool:
+    from google.genai import types
+
+    return types.Tool(
+        function_declarations=[mysql_query_declaration, search_titles_declaration]
     )
 
 
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+# Explicit Gemini context caching of the system prompt + schema + tools.
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "0") == "1"
+CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", 3600))
+
+
+class _BaseConfig:
+    """The GenerateContentConfig shared by every model call.
+
+    It is built once and rebuilt only when the date section or the schema
+    overview of the system prompt changes (or the server-side context cache
+    is about to expire).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._key: tuple[str, str, str | None] | None = None
+        self._config: types.GenerateContentConfig | None = None
+        self._cache_name: str | None = None
+        self._cache_expires = 0.0
+
+    @staticmethod
+    def _prompt_key() -> tuple[str, str, str | None]:
+        return (
+            datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+            datetime.now().strftime("%Y-%m-%d"),
+            # A cached overview re-read after a migration changes the digest.
+            get_schema_overview().digest,
+        )
+
+    def current(self) -> types.GenerateContentConfig | None:
+        """The cached config if still valid, without doing any I/O."""
+        if self._key != self._prompt_key():
+            return None
+        if self._cache_name and time.monotonic() > self._cache_expires:
+            return None
+        return self._config
+
+    def build(self) -> types.GenerateContentConfig:
+        from google.genai import types
+
+        with self._lock:
+            config = self.current()
+            if config is not None:
+                return config
+            instruction = _get_system_instruction()
+            key = self._prompt_key()
+            config = self._build_cached(instruction) if CONTEXT_CACHE_ENABLED else None
+            if config is None:
+                config = types.GenerateContentConfig(
+                    system_instruction=instruction, tools=[_tool_spec()]
+                )
+            self._key, self._config = key, config
+            return config
+
+    def _build_cached(self, instruction: str) -> types.GenerateContentConfig | None:
+        """Upload the static prefix as a Gemini cached content; ``None`` on failure."""
+        from google.genai import types
+
+        old = self._cache_name
+        client = get_client()
+        try:
+            cache = client.caches.create(
+                model=MODEL_NAME,
+                config=types.CreateCachedContentConfig(
+                    display_name="moviegpt-system",
+                    system_instruction=instruction,
+                    tools=[_tool_spec()],
+                    ttl=f"{CONTEXT_CACHE_TTL}s",
+                ),
+            )
+        except Exception:
+            logger.exception("Gemini context cache unavailable, sending prompt inline")
+            self._cache_name = None
+            self._delete_cache(client, old)
+            return None
+        self._cache_name = cache.name
+        # Rebuild a little early so requests never reference an expired cache;
+        # at most half the TTL, or a short TTL would rebuild on every call.
+        margin = min(60, CONTEXT_CACHE_TTL / 2)
+        self._cache_expires = time.monotonic() + CONTEXT_CACHE_TTL - margin
+        self._delete_cache(client, old)
+        return types.GenerateContentConfig(cached_content=cache.name)
+
+    @staticmethod
+    def _delete_cache(client: genai.Client, name: str | None) -> None:
+        if name:
+            try:
+                client.caches.delete(name=name)
+            except Exception:
+                pass
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._key = None
+
+
+_base_config = _BaseConfig()
+
+
+def _get_base_config() -> types.GenerateContentConfig:
+    """Shared model config, rebuilt only when the date changes."""
+    return _base_config.current() or _base_config.build()
+
+
+async def _aget_base_config() -> types.GenerateContentConfig:
+    """Like :func:`_get_base_config`, but builds off the event loop."""
+    return _base_config.current() or await asyncio.to_thread(_base_config.build)
+
+
+def refresh_schema_overview() -> bool:
+    """Reload the schema from the database; rebuild the prompt if it changed."""
+    changed = get_schema_overview().refresh()
+    if changed:
+        _base_config.invalidate()
+        answers = get_answer_cache()
+        if answers is not None:
+            answers.invalidate()
+    return changed
+
+
 # ---------- 6. Enhanced multi-turn chat helper with multi-tool support ----------
 
-chat_history: List[types.Content] = []
+MAX_TOOL_ROUNDS = 10  # Prevent infinite loops
+MAX_ROUNDS_REPLY = "I apologize, but I reached the maximum number of query attempts. Please try reformulating your request."
+EMPTY_REPLY = "I apologize, but I encountered an issue generating a response."
+UNSUPPORTED_REPLY = "Unsupported function call."
+
+# Streaming: flush buffered text once it reaches this many characters or has
+# been held for this many seconds, whichever comes first.
+STREAM_CHUNK_CHARS = int(os.getenv("STREAM_CHUNK_CHARS", 48))
+STREAM_CHUNK_SECONDS = float(os.getenv("STREAM_CHUNK_SECONDS", 0.05))
+
+
+def _str_arg(args: dict[str, Any], name: str, required: bool = False) -> str | None:
+    """A string argument of a model function call; :class:`QueryRejected` if malformed."""
+    value = args.get(name)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise QueryRejected(
+            "invalid_argument",
+            f"'{name}' must be a non-empty string, got {value!r}.",
+            argument=name,
+        )
+    return value
+
+
+def _int_arg(args: dict[str, Any], name: str) -> int | None:
+    """An optional integer argument; the model sometimes sends 20.0 or "20"."""
+    value = args.get(name)
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise QueryRejected(
+        "invalid_argument", f"'{name}' must be an integer, got {value!r}.", argument=name
+    )
+
+
+def _run_query_call(
+    fc: types.FunctionCall, all_results: list[dict[str, Any]]
+) -> tuple[dict[str, Any], list[dict[str, Any]] | None]:
+    """Execute one ``execute_mysql_query`` call and build the tool payload.
+
+    Returns the payload for the FunctionResponse and the rows (``None`` on error).
+    """
+    args = fc.args or {}
+    sql = args.get("sql")
+
+    # Execute SQL and capture any errors
+    try:
+        sql = _str_arg(args, "sql", required=True)
+        data, truncated = execute_mysql_query(sql, _int_arg(args, "limit"))
+        payload = compact_rows(data, TOOL_RESULT_TOKEN_BUDGET)
+        all_results.append({"sql": sql, "rows": data, "truncated": truncated})
+
+        # Add some metadata to help the AI understand the result
+        payload["metadata"] = {
+            "row_count": len(data),
+            "query_successful": True,
+            "sql_executed": sql,
+            "truncated": truncated,
+        }
+        if truncated:
+            payload["metadata"]["note"] = (
+                f"Only the first {len(data)} rows are shown. Add filters, "
+                "aggregate, or ORDER BY ... LIMIT to get the rows you need."
+            )
+        return payload, data
+
+    except QueryRejected as rej:
+        # Structured so the model can retry with a cheaper query.
+        payload = {
+            "error": {**rej.to_error(), "sql": sql},
+            "metadata": {"query_successful": False, "sql_executed": sql},
+        }
+        all_results.append({"sql": sql, "error": rej.message})
+        return payload, None
+
+    except mysql.connector.Error as err:
+        payload = {
+            "error": {
+                "code": err.errno,
+                "message": err.msg,
+                "sql": sql,
+            },
+            "metadata": {"query_successful": False, "sql_executed": sql},
+        }
+        all_results.append({"sql": sql, "error": err.msg})
+        return payload, None
+
+
+def _run_search_call(
+    fc: types.FunctionCall, all_results: list[dict[str, Any]]
+) -> tuple[dict[str, Any], list[dict[str, Any]] | None]:
+    """Execute one ``search_titles`` call and build the tool payload."""
+    args = fc.args or {}
+    query = args.get("query")
+    try:
+        query = _str_arg(args, "query", required=True)
+        data = search_titles(query, _int_arg(args, "limit"), _str_arg(args, "title_type"))
+    except QueryRejected as rej:
+        all_results.append({"tool": fc.name, "query": query, "error": rej.message})
+        return {
+            "error": {**rej.to_error(), "query": query},
+            "metadata": {"query_successful": False},
+        }, None
+    except mysql.connector.Error as err:
+        all_results.append({"tool": fc.name, "query": query, "error": err.msg})
+        return {
+            "error": {"code": err.errno, "message": err.msg, "query": query},
+            "metadata": {"query_successful": False},
+        }, None
+
+    all_results.append({"tool": fc.name, "query": query, "rows": data})
+    return {
+        "rows": data,
+        "metadata": {"row_count": len(data), "query_successful": True, "query": query},
+    }, data
+
+
+# Tool name -> handler returning (payload, rows or None on error)
+_TOOL_HANDLERS = {
+    "execute_mysql_query": _run_query_call,
+    "search_titles": _run_search_call,
+}
+
+
+def _record_usage(s: Span, usage: types.GenerateContentResponseUsageMetadata | None) -> None:
+    if usage is not None:
+        s.set(
+            tokens_in=usage.prompt_token_count,
+            tokens_out=(usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0),
+            tokens_cached=usage.cached_content_token_count,
+        )
+
+
+def _tool_exchange(
+    model_parts: List[types.Part], payloads: List[dict[str, Any]]
+) -> List[types.Content]:
+    """Model's function calls followed by one tool message answering all of them."""
+    from google.genai import types
+
+    return [
+        types.Content(role="model", parts=model_parts),
+        types.Content(
+            role="tool",
+            parts=[
+                types.Part(
+                    function_response=types.FunctionResponse(
+                        name=part.function_call.name,
+                        response=payload,
+                    )
+                )
+                for part, payload in zip(model_parts, payloads)
+            ],
+        ),
+    ]
+
+
+ToolOutcome = tuple[dict[str, Any], list[dict[str, Any]] | None, list[dict[str, Any]]]
+
+
+def _run_tool_call(fc: types.FunctionCall) -> ToolOutcome:
+    """Run one call; returns (payload, rows or None, its all_results entries)."""
+    entries: list[dict[str, Any]] = []
+    with span(f"tool.{fc.name}") as s:
+        try:
+            payload, data = _TOOL_HANDLERS[fc.name](fc, entries)
+        except Exception as exc:
+            # Reported to the model like any tool error instead of aborting
+            # the other calls of the round and the whole turn.
+            logger.exception("tool call %s failed", fc.name)
+            message = f"Internal error: {exc}"
+            payload = {
+                "error": {"code": "internal_error", "message": message},
+                "metadata": {"query_successful": False},
+            }
+            data = None
+            entries.append({"tool": fc.name, "error": message})
+        s.set(rows=len(data) if data is not None else 0, bytes=len(dumps(payload)))
+        if "error" in payload:
+            s.set(error=payload["error"].get("message"))
+    return payload, data, entries
+
+
+def _run_tool_calls(calls: List[types.FunctionCall]) -> List[ToolOutcome]:
+    """Execute the independent calls of one model turn concurrently.
+
+    Each call borrows its own pooled connection; outcomes keep call order.
+    """
+    if len(calls) == 1:
+        return [_run_tool_call(calls[0])]
+    with ThreadPoolExecutor(min(len(calls), get_pool().size)) as executor:
+        # One context copy per call keeps the calls under the current span.
+        futures = [
+            executor.submit(contextvars.copy_context().run, _run_tool_call, fc)
+            for fc in calls
+        ]
+        return [f.result() for f in futures]
+
+
+async def _arun_tool_calls(calls: List[types.FunctionCall]) -> List[ToolOutcome]:
+    return list(await asyncio.gather(*(run_blocking(_run_tool_call, fc) for fc in calls)))
+
+
+def _start_messages(session_id: str, user_message: str) -> List[types.Content]:
+    """Stored history of the session followed by the new user message."""
+    from google.genai import types
+
+    turns = get_session_store().get(session_id)
+    # Trimming may cut an exchange in half; history must start with a user turn.
+    while turns and turns[0]["role"] != "user":
+        turns.pop(0)
+    return [
+        types.Content(role=turn["role"], parts=[types.Part(text=turn["text"])])
+        for turn in turns
+    ] + [types.Content(role="user", parts=[types.Part(text=user_message)])]
+
+
+def _remember(session_id: str, user_message: str, assistant_reply: str) -> None:
+    """Update the session's history with the final exchange."""
+    get_session_store().append(
+        session_id,
+        [
+            {"role": "user", "text": user_message},
+            {"role": "model", "text": assistant_reply},
+        ],
+    )
+
+
+def _answer_cache_for(messages: List[types.Content]) -> AnswerCache | None:
+    """The answer cache, if this turn may use it: only a session's first
+    message is answered without context."""
+    return get_answer_cache() if len(messages) == 1 else None
+
+
+def _lookup_answer(answers: AnswerCache, user_message: str) -> Answer | None:
+    with span("answer_cache.get") as s:
+        cached = answers.get(user_message)
+        s.set(hit=cached is not None)
+    return cached
+
+
+def _store_answer(answers: AnswerCache, user_message: str, answer: Answer) -> None:
+    """Cache a complete answer; turns where a tool call failed are not reused."""
+    if not any("error" in entry for entry in answer.results):
+        answers.put(user_message, answer)
 
 
 def chat(
     user_message: str,
+    session_id: str = DEFAULT_SESSION,
 ) -> tuple[str, str | None, list[dict[str, Any]] | None, list[dict[str, Any]]]:
-    global chat_history
-
     # ① Add user message to history
-    messages: List[types.Content] = chat_history + [
-        types.Content(role="user", parts=[types.Part(text=user_message)])
-    ]
+    messages = _start_messages(session_id, user_message)
+
+    answers = _answer_cache_for(messages)
+    cached = _lookup_answer(answers, user_message) if answers is not None else None
+    if cached is not None:
+        _remember(session_id, user_message, cached.text)
+        return cached.text, cached.sql, cached.data, cached.results
 
     last_sql: str | None = None
     last_rows: list[dict[str, Any]] | None = None
     all_results: list[dict[str, Any]] = []
 
     # ② Start the conversation loop to handle multiple tool calls
-    max_iterations = 10  # Prevent infinite loops
     iteration = 0
 
-    while iteration < max_iterations:
+    while iteration < MAX_TOOL_ROUNDS:
         iteration += 1
 
         # Generate response from model with dynamic config
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=messages,
-            config=_get_base_config(),  # 使用动态配置
-        )
-
-        if not response.candidates or not response.candidates[0].content.parts:
-            return (
-                "I apologize, but I encountered an issue generating a response.",
-                None,
-                None,
-                all_results,
+        with span("gemini.generate", round=iteration) as s:
+            response = get_client().models.generate_content(
+                model=MODEL_NAME,
+                contents=messages,
+                config=_get_base_config(),
             )
+            _record_usage(s, response.usage_metadata)
 
-        first_part = response.candidates[0].content.parts[0]
+        if not response.candidates or not response.candidates[0].content.parts:
+            return (EMPTY_REPLY, None, None, all_results)
 
-        # ③ Check if LLM wants to call a function
-        if getattr(first_part, "function_call", None):
-            fc = first_part.function_call
+        call_parts = [
+            p for p in response.candidates[0].content.parts if p.function_call
+        ]
 
-            if fc.name == "execute_mysql_query":
-                sql = fc.args["sql"]
+        # ③ Check if LLM wants to call functions (possibly several at once)
+        if call_parts:
+            calls = [p.function_call for p in call_parts]
+            if any(fc.name not in _TOOL_HANDLERS for fc in calls):
+                assistant_reply = UNSUPPORTED_REPLY
+                break
 
-                # Execute SQL and capture any errors
-                try:
-                    data = execute_mysql_query(sql)
-                    last_sql = sql
+            outcomes = _run_tool_calls(calls)
+            for fc, (_, data, entries) in zip(calls, outcomes):
+                all_results.extend(entries)
+                if data is not None and fc.name == "execute_mysql_query":
+                    last_sql = fc.args["sql"]
                     last_rows = data
-                    payload = {"rows": _normalise_json(data)}
-                    all_results.append({"sql": sql, "rows": _normalise_json(data)})
-
-                    # Add some metadata to help the AI understand the result
-                    payload["metadata"] = {
-                        "row_count": len(data),
-                        "query_successful": True,
-                        "sql_executed": sql,
-                    }
-
-                except mysql.connector.Error as err:
-                    payload = {
-                        "error": {
-                            "code": err.errno,
-                            "message": err.msg,
-                            "sql": sql,
-                        },
-                        "metadata": {"query_successful": False, "sql_executed": sql},
-                    }
-                    all_results.append({"sql": sql, "error": err.msg})
-
-                # Add model's function call and tool response to conversation
-                messages.extend(
-                    [
-                        types.Content(role="model", parts=[first_part]),
-                        types.Content(
-                            role="tool",
-                            parts=[
-                                types.Part(
-                                    function_response=types.FunctionResponse(
-                                        name=fc.name,
-                                        response=payload,
-                                    )
-                                )
-                            ],
-                        ),
-                    ]
-                )
 
-                # Continue the loop to let AI process the result and potentially make more calls
-                continue
+            # Add model's function calls and all tool responses to conversation
+            compact_stale_results(messages)
+            messages.extend(_tool_exchange(call_parts, [o[0] for o in outcomes]))
 
-            else:
-                assistant_reply = "Unsupported function call."
-                break
+            # Continue the loop to let AI process the results and potentially make more calls
+            continue
 
         # ④ LLM provided a text response (no more function calls)
         else:
@@ -484,25 +885,183 @@ def chat(
             break
 
     # Handle case where we hit max iterations
-    if iteration >= max_iterations:
-        assistant_reply = "I apologize, but I reached the maximum number of query attempts. Please try reformulating your request."
+    if iteration >= MAX_TOOL_ROUNDS:
+        assistant_reply = MAX_ROUNDS_REPLY
 
     # ⑤ Update chat history with the final exchange
-    chat_history.extend(
-        [
-            types.Content(role="user", parts=[types.Part(text=user_message)]),
-            types.Content(role="model", parts=[types.Part(text=assistant_reply)]),
-        ]
-    )
+    _remember(session_id, user_message, assistant_reply)
+    if answers is not None and assistant_reply not in (MAX_ROUNDS_REPLY, UNSUPPORTED_REPLY):
+        _store_answer(
+            answers, user_message, Answer(assistant_reply, last_sql, last_rows, all_results)
+        )
 
     return (
         assistant_reply,
         last_sql,
-        _normalise_json(last_rows) if last_rows is not None else None,
+        last_rows,
         all_results,
     )
 
 
+class _TextCoalescer:
+    """Merge small streamed text deltas into reasonably sized chunks."""
+
+    def __init__(self, min_chars: int, max_delay: float) -> None:
+        self.min_chars = min_chars
+        self.max_delay = max_delay
+        self._buf: List[str] = []
+        self._size = 0
+        self._since = 0.0
+
+    def push(self, text: str) -> str | None:
+        if not self._buf:
+            self._since = time.monotonic()
+        self._buf.append(text)
+        self._size += len(text)
+        if (
+            self._size >= self.min_chars
+            or time.monotonic() - self._since >= self.max_delay
+        ):
+            return self.flush()
+        return None
+
+    def flush(self) -> str | None:
+        if not self._buf:
+            return None
+        chunk = "".join(self._buf)
+        self._buf.clear()
+        self._size = 0
+        return chunk
+
+
+async def achat_stream(
+    user_message: str, session_id: str = DEFAULT_SESSION
+) -> AsyncIterator[dict[str, Any]]:
+    """Async streaming variant of :func:`chat`.
+
+    Uses the async Gemini client and runs SQL on the bounded database thread
+    pool, so the event loop is never blocked. Yields events as they happen:
+
+    - ``{"type": "token", "text": ...}`` for coalesced text deltas
+    - ``{"type": "tool", "round": n, "tool": name, "sql": ..., "row_count": n | None,
+      "truncated": bool, "error": ...}`` after each tool round
+    - a final ``{"type": "final", "text", "sql", "data", "results"}`` envelope
+
+    A cached answer (see :mod:`answer_cache`) is sent as one token event and
+    a final envelope with ``"cached": True``.
+    """
+    # The session store may be on disk (SESSION_BACKEND=sqlite).
+    messages = await asyncio.to_thread(_start_messages, session_id, user_message)
+
+    answers = _answer_cache_for(messages)
+    if answers is not None:
+        # The lookup may poll dataset_version, so it runs off the event loop.
+        cached = await run_blocking(_lookup_answer, answers, user_message)
+        if cached is not None:
+            await asyncio.to_thread(_remember, session_id, user_message, cached.text)
+            yield {"type": "token", "text": cached.text}
+            yield {"type": "final", **cached._asdict(), "cached": True}
+            return
+
+    last_sql: str | None = None
+    last_rows: list[dict[str, Any]] | None = None
+    all_results: list[dict[str, Any]] = []
+    reply_parts: List[str] = []
+    coalescer = _TextCoalescer(STREAM_CHUNK_CHARS, STREAM_CHUNK_SECONDS)
+
+    # Fixed replies that were never streamed as tokens
+    notice: str | None = MAX_ROUNDS_REPLY
+    for iteration in range(1, MAX_TOOL_ROUNDS + 1):
+        call_parts: List[types.Part] = []
+        with span("gemini.generate", round=iteration, stream=True) as s:
+            usage = None
+            async for chunk in await get_client().aio.models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=messages,
+                config=await _aget_base_config(),
+            ):
+                # Usage totals arrive with the last chunk.
+                usage = chunk.usage_metadata or usage
+                if not chunk.candidates or not chunk.candidates[0].content:
+                    continue
+                for part in chunk.candidates[0].content.parts or []:
+                    if part.function_call:
+                        call_parts.append(part)
+                    elif part.text and not part.thought:
+                        reply_parts.append(part.text)
+                        text = coalescer.push(part.text)
+                        if text:
+                            yield {"type": "token", "text": text}
+            _record_usage(s, usage)
+
+        text = coalescer.flush()
+        if text:
+            yield {"type": "token", "text": text}
+
+        # ③ Every call of the round runs concurrently; one tool message answers all
+        if call_parts:
+            calls = [p.function_call for p in call_parts]
+            if any(fc.name not in _TOOL_HANDLERS for fc in calls):
+                notice = UNSUPPORTED_REPLY
+                break
+            outcomes = await _arun_tool_calls(calls)
+            for fc, (payload, data, entries) in zip(calls, outcomes):
+                all_results.extend(entries)
+                if data is not None and fc.name == "execute_mysql_query":
+                    last_sql = fc.args["sql"]
+                    last_rows = data
+                yield {
+                    "type": "tool",
+                    "round": iteration,
+                    "tool": fc.name,
+                    "sql": (fc.args or {}).get("sql"),
+                    "row_count": len(data) if data is not None else None,
+                    "truncated": payload["metadata"].get("truncated", False),
+                    "error": payload.get("error", {}).get("message"),
+                }
+            compact_stale_results(messages)
+            messages.extend(_tool_exchange(call_parts, [o[0] for o in outcomes]))
+            continue
+
+        # ④ Text-only round: the answer is complete
+        notice = None if reply_parts else EMPTY_REPLY
+        break
+
+    if notice is not None:
+        reply_parts.append(notice)
+        yield {"type": "token", "text": notice}
+    assistant_reply = "".join(reply_parts)
+
+    await asyncio.to_thread(_remember, session_id, user_message, assistant_reply)
+    if answers is not None and notice is None:
+        # put() copies, encodes and embeds answers of up to max_entry_bytes.
+        await asyncio.to_thread(
+            _store_answer,
+            answers,
+            user_message,
+            Answer(assistant_reply, last_sql, last_rows, all_results),
+        )
+
+    yield {
+        "type": "final",
+        "text": assistant_reply,
+        "sql": last_sql,
+        "data": last_rows,
+        "results": all_results,
+    }
+
+
+async def achat(
+    user_message: str,
+    session_id: str = DEFAULT_SESSION,
+) -> tuple[str, str | None, list[dict[str, Any]] | None, list[dict[str, Any]]]:
+    """Non-blocking :func:`chat` for the API; same return shape."""
+    async for event in achat_stream(user_message, session_id):
+        if event["type"] == "final":
+            return event["text"], event["sql"], event["data"], event["results"]
+    raise RuntimeError("chat stream ended without a final event")
+
+
 # ---------- 7. Quick demo ----------
 
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+"""Answer cache for repeated first questions of a conversation.
+
+Only context-free turns are cached (the first message of a session): later
+answers depend on the conversation.  Questions are keyed on a normalized
+form, ``normalize_question``, that drops case, punctuation, articles and
+politeness (English and Chinese), so "Please list the top 10 movies of
+1994." and "list top 10 movies of 1994" share an entry.  Words that say what
+is asked for, plural endings included, are kept.
+
+With ``similarity`` set, a question that misses the exact key may also reuse
+the answer of a close one: both are embedded locally as hashed character
+n-gram vectors and compared by cosine similarity.  Questions must contain
+the same numbers, negations and comparison words (``anchors``) to match, so
+"movies of 1994" never answers "movies of 1995" and "without Tom Hanks"
+never answers "with Tom Hanks".
+
+Entries expire after ``ttl`` seconds, when the dataset is reloaded
+(``version_fn``) and at midnight UTC, because the system prompt carries the
+current date and "this year" questions depend on it.
+"""
+
+from __future__ import annotations
+
+import copy
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from query_cache import dataset_version
+from row_codec import dumps
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# Words that change the tone of a question, not what it asks for.  Question
+# and verb words ("what", "list", "show") and plural endings are kept: "What
+# is the top movie" and "List the top movies" want different answers.
+_EN_FILLERS = frozenset("a an the please pls plz kindly hey hi hello".split())
+_EN_POLITE = re.compile(r"^(?:(?:can|could|would|will) you |i'd like to know |i want to know )+")
+# Chinese politeness is only stripped at the start (prefixes) or the end
+# (particles) of the question, never inside it: "可以" is also a title.
+_ZH_PREFIXES = ("请问", "请你", "请", "帮我", "麻烦", "能不能", "我想知道")
+_ZH_PARTICLES = ("吗", "呢", "吧", "啊", "呀")
+
+# Negation and comparison words flip what a question asks for while barely
+# moving its n-gram vector, so like numbers they must match exactly.
+_EN_ANCHORS = frozenset(
+    """
+    not no non nor never without except excluding worst least lowest bottom
+    fewest less fewer lower below under before after above over earliest
+    oldest latest newest
+    """.split()
+)
+_ZH_ANCHOR_RE = re.compile(
+    "不是|没有|除了|最差|最烂|最低|最少|最早|最新|之前|以前|之后|以后|以上|以下"
+    "|超过|低于|高于|少于|多于|不|没|无|非"
+)
+
+_DIMENSIONS = 1 << 18
+
+
+def _is_punct(ch: str) -> bool:
+    return unicodedata.category(ch)[0] in "PSZ" or ch.isspace()
+
+
+def _strip_zh(text: str) -> str:
+    changed = True
+    while changed:
+        changed = False
+        for prefix in _ZH_PREFIXES:
+            if text.startswith(prefix) and len(text) > len(prefix):
+                text, changed = text[len(prefix) :].lstrip(), True
+        for particle in _ZH_PARTICLES:
+            if text.endswith(particle) and len(text) > len(particle):
+                text, changed = text[: -len(particle)].rstrip(), True
+    return text
+
+
+def normalize_question(text: str) -> str:
+    """Canonical form of a question; equal for rewordings that only differ
+    in case, punctuation, articles or politeness."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    words = "".join(" " if _is_punct(ch) and ch != "'" else ch for ch in text).split()
+    kept = [w.strip("'") for w in words if w not in _EN_FILLERS]
+    text = _EN_POLITE.sub("", " ".join(w for w in kept if w))
+    if _CJK_RE.search(text):
+        text = _strip_zh(text)
+    return text
+
+
+def anchors(normalized: str) -> Tuple[str, ...]:
+    """Numbers, negations and comparison words of a normalized question."""
+    found = _NUMBER_RE.findall(normalized)
+    found.extend(w for w in normalized.split() if w in _EN_ANCHORS)
+    if _CJK_RE.search(normalized):
+        found.extend(_ZH_ANCHOR_RE.findall(normalized))
+    return tuple(sorted(found))
+
+
+def _features(normalized: str) -> List[str]:
+    """Character n-grams: bigrams for CJK text, trigrams of each word otherwise."""
+    if _CJK_RE.search(normalized):
+        chars = normalized.replace(" ", "")
+        return list(chars) + [chars[i : i + 2] for i in range(len(chars) - 1)]
+    features: List[str] = []
+    for word in normalized.split():
+        padded = f" {word} "
+        features.append(word)
+        features.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+def embed(normalized: str) -> Dict[int, float]:
+    """Sparse unit vector of hashed n-gram counts."""
+    vector: Dict[int, float] = {}
+    for feature in _features(normalized):
+        index = zlib.crc32(feature.encode("utf-8")) % _DIMENSIONS
+        vector[index] = vector.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class Answer(NamedTuple):
+    text: str
+    sql: Optional[str]
+    data: Optional[List[Dict[str, Any]]]
+    results: List[Dict[str, Any]]
+
+
+class _Entry(NamedTuple):
+    answer: Answer
+    size: int
+    expires_at: float
+    anchors: Tuple[str, ...]
+    vector: Optional[Dict[int, float]]
+
+
+def _copy(answer: Answer) -> Answer:
+    """Callers get their own rows: an answer is shared by every hit."""
+    return copy.deepcopy(answer)
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class AnswerCache:
+    """LRU + TTL cache of answers bounded by their approximate JSON size.
+
+    ``similarity`` is the cosine threshold for near-duplicate questions;
+    ``0`` matches normalized questions exactly only.  ``version_fn`` works
+    as in :class:`query_cache.QueryCache`.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl: float = 3600.0,
+        similarity: float = 0.0,
+        max_entry_bytes: Optional[int] = None,
+        version_fn: Optional[Callable[[], Any]] = None,
+        version_check: float = 30.0,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self.version_fn = version_fn
+        self.version_check = version_check
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._day = _today()
+        self._version: Any = None
+        self._version_checked = float("-inf")
+
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= self._entries.pop(key).size
+
+    def _clear_locked(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        self.invalidations += 1
+
+    def _check_version(self) -> None:
+        if self.version_fn is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._version_checked < self.version_check:
+                return
+            self._version_checked = now
+        try:
+            version = self.version_fn()
+        except Exception:
+            return
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self._clear_locked()
+                self._version = version
+
+    def _check_day(self) -> None:
+        """Called with the lock held."""
+        today = _today()
+        if today != self._day:
+            self._day = today
+            if self._entries:
+                self._clear_locked()
+
+    def get(self, question: str) -> Optional[Answer]:
+        """The cached answer to ``question`` or a close rewording of it."""
+        self._check_version()
+        key = normalize_question(question)
+        vector = embed(key) if self.similarity > 0 and key else None
+        now = time.monotonic()
+        with self._lock:
+            self._check_day()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(entry.answer)
+            if vector is not None:
+                match = self._nearest(key, vector, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.hits += 1
+                    self.similar_hits += 1
+                    return _copy(self._entries[match].answer)
+            self.misses += 1
+            return None
+
+    def _nearest(self, key: str, vector: Dict[int, float], now: float) -> Optional[str]:
+        """Most similar live entry above the threshold; called with the lock held."""
+        wanted = anchors(key)
+        best, best_score = None, self.similarity
+        for other, entry in self._entries.items():
+            if entry.anchors != wanted or entry.vector is None or entry.expires_at < now:
+                continue
+            score = cosine(vector, entry.vector)
+            if score >= best_score:
+                best, best_score = other, score
+        return best
+
+    def put(self, question: str, answer: Answer) -> None:
+        key = normalize_question(question)
+        if not key:
+            return
+        size = len(dumps(answer._asdict()))
+        if size > self.max_entry_bytes:
+            return
+        entry = _Entry(
+            _copy(answer),
+            size,
+            time.monotonic() + self.ttl,
+            anchors(key),
+            embed(key) if self.similarity > 0 else None,
+        )
+        with self._lock:
+            self._check_day()
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self) -> None:
+        """Drop every entry, e.g. after the schema changed."""
+        with self._lock:
+            self._clear_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide cache, or ``None`` when ``ANSWER_CACHE_ENABLED=0``."""
+    global _cache
+    if os.getenv("ANSWER_CACHE_ENABLED", "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache(
+                    max_bytes=int(os.getenv("ANSWER_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+                    ttl=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+                    similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", 0)),
+                    version_fn=dataset_version,
+                    version_check=float(os.getenv("QUERY_CACHE_VERSION_CHECK", 30)),
+                )
+    return _cache
@@ -0,0 +1,438 @@
+"""Offline load test for ``/api/chat``, ``/api/chat/stream`` and ``/api/info``.
+
+Usage::
+
+    python bench_load.py                                   # every endpoint
+    python bench_load.py --endpoints chat stream --concurrency 16 --requests 400
+    python bench_load.py --max-p99-ms 800 --json load.json # CI gate
+
+By default the app runs in-process with no network access:
+
+- Gemini is ``fake_gemini.ScriptedGemini`` (``--model-latency`` per round),
+  replaying the scenarios of ``fake_gemini.SCENARIOS``;
+- OMDb is ``omdb_stub`` on a local port (``--omdb-latency`` per lookup),
+  with a fresh OMDb cache;
+- MySQL is a generated ``sqlite_fixture`` database behind the normal
+  connection pool (``--mysql`` uses the ``MYSQL_*`` database instead);
+  ``--replicas N`` adds N copies of it as read replicas behind
+  ``replica_router``, and ``--fail-replica S`` makes the first replica
+  unreachable S seconds into the run to exercise failover.
+
+``--url`` sends the same workload to a running server instead.  The report
+gives requests, errors, throughput and p50/p90/p99/max latency per endpoint,
+time to first token for the stream, and where the time went per tracing
+span.  Exits with status 1 if a request failed or a ``--max-p99-ms`` /
+``--min-rps`` gate is missed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+ENDPOINTS = ("chat", "stream", "info")
+DEFAULT_MIX = ("top_rated", "genre_year", "director", "big_result", "chitchat")
+
+# (status, seconds to first streamed token or None, seconds total, bytes)
+Sample = Tuple[int, Optional[float], float, int]
+
+
+# ---------- targets ----------
+
+
+class InProcess:
+    """Calls the ASGI app directly; unlike httpx's ASGI transport it sees
+    streamed chunks as they are sent, so time to first token is real."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def request(self, method: str, path: str, body: Any = None) -> Sample:
+        raw = json.dumps(body).encode("utf-8") if body is not None else b""
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+        }
+        received = False
+        status = 0
+        first: Optional[float] = None
+        size = 0
+        started = time.perf_counter()
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": raw, "more_body": False}
+            await asyncio.Event().wait()  # the client never disconnects
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            nonlocal status, first, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if first is None and b'"token"' in chunk:
+                    first = time.perf_counter() - started
+
+        await self.app(scope, receive, send)
+        return status, first, time.perf_counter() - started, size
+
+
+class Remote:
+    def __init__(self, url: str, concurrency: int) -> None:
+        import httpx
+
+        limits = httpx.Limits(max_connections=concurrency)
+        self.client = httpx.AsyncClient(base_url=url, timeout=120, limits=limits)
+
+    async def request(self, method: str, path: str, body: Any = None) -> Sample:
+        started = time.perf_counter()
+        first: Optional[float] = None
+        size = 0
+        async with self.client.stream(method, path, json=body) as response:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if first is None and b'"token"' in chunk:
+                    first = time.perf_counter() - started
+        return response.status_code, first, time.perf_counter() - started, size
+
+
+# ---------- workload ----------
+
+
+def chat_body(i: int, worker: int, mix: List[str], endpoint: str) -> Dict[str, Any]:
+    from fake_gemini import question
+
+    # Seeded by the request index: every run asks the same questions.
+    message = question(mix[i % len(mix)], random.Random(i))
+    return {"message": message, "session_id": f"bench-{endpoint}-{worker}"}
+
+
+def info_path(rng: random.Random, titles: int) -> str:
+    # Half the lookups go to a small hot set, like popular titles in chat answers.
+    def pick() -> str:
+        n = rng.randint(1, 200) if rng.random() < 0.5 else rng.randint(1, titles)
+        return f"tt{n:07d}"
+
+    if rng.random() < 0.5:
+        return f"/api/info/{pick()}"
+    return "/api/info?ids=" + ",".join(pick() for _ in range(5))
+
+
+@dataclass
+class PhaseResult:
+    endpoint: str
+    latencies: List[float] = field(default_factory=list)
+    first_token: List[float] = field(default_factory=list)
+    errors: int = 0
+    bytes: int = 0
+    wall: float = 0.0
+
+    def report(self) -> Dict[str, Any]:
+        n = len(self.latencies)
+        out: Dict[str, Any] = {
+            "endpoint": self.endpoint,
+            "requests": n,
+            "errors": self.errors,
+            "rps": round(n / self.wall, 1) if self.wall else 0.0,
+            "mb": round(self.bytes / 1e6, 2),
+        }
+        for p in (50, 90, 99):
+            out[f"p{p}_ms"] = _ms(percentile(self.latencies, p))
+        out["max_ms"] = _ms(max(self.latencies, default=0.0))
+        if self.first_token:
+            out["ttft_p50_ms"] = _ms(percentile(self.first_token, 50))
+            out["ttft_p99_ms"] = _ms(percentile(self.first_token, 99))
+        return out
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def run_phase(
+    endpoint: str,
+    make: Callable[[int, int], Awaitable[Sample]],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> PhaseResult:
+    for i in range(warmup):
+        await make(-1 - i, 0)
+
+    result = PhaseResult(endpoint)
+    counter = iter(range(requests))
+
+    async def worker(worker_id: int) -> None:
+        for i in counter:
+            try:
+                status, first, seconds, size = await make(i, worker_id)
+            except Exception:
+                logging.getLogger(__name__).exception("%s request failed", endpoint)
+                result.errors += 1
+                continue
+            if status >= 400:
+                result.errors += 1
+            result.latencies.append(seconds)
+            result.bytes += size
+            if first is not None:
+                result.first_token.append(first)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    result.wall = time.perf_counter() - started
+    return result
+
+
+# ---------- offline environment ----------
+
+
+def prepare_offline(args: argparse.Namespace, workdir: Path) -> None:
+    """Point the backend at local stand-ins; must run before it is imported."""
+    from omdb_stub import start_stub
+
+    stub = start_stub(latency=args.omdb_latency)
+    os.environ.update(
+        {
+            "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY") or "offline",
+            "GEMINI_PRELOAD": "0",
+            "GEMINI_CONTEXT_CACHE": "0",
+            "OMDB_BASE_URL": stub.url,
+            "OMDB_API_KEY": "offline",
+            "OMDB_CACHE_PATH": str(workdir / "omdb_cache.sqlite3"),
+            "SCHEMA_CACHE_PATH": "",
+            "SESSION_BACKEND": "memory",
+            "MYSQL_POOL_SIZE": str(args.pool_size),
+            "QUERY_CACHE_ENABLED": "0" if args.no_query_cache else "1",
+            "ANSWER_CACHE_ENABLED": "0" if args.no_answer_cache else "1",
+        }
+    )
+
+
+class Outage:
+    """Switch that makes a stand-in replica unreachable, like a stopped server."""
+
+    def __init__(self) -> None:
+        self.down = False
+
+
+def replica_factory(path: Path, outage: Outage) -> Callable[[], Any]:
+    from mysql.connector import errors
+    from sqlite_fixture import SQLiteConnection
+
+    class ReplicaConnection(SQLiteConnection):
+        def cursor(self, *args: Any, **kwargs: Any) -> Any:
+            if outage.down:
+                raise errors.OperationalError(msg="Lost connection to MySQL server")
+            return super().cursor(*args, **kwargs)
+
+        def is_connected(self) -> bool:
+            return not outage.down
+
+    def factory() -> ReplicaConnection:
+        if outage.down:
+            raise errors.InterfaceError(msg=f"Can't connect to replica {path.name}")
+        return ReplicaConnection(path)
+
+    return factory
+
+
+def install_offline(args: argparse.Namespace, workdir: Path) -> Optional[Outage]:
+    """Install the stand-ins; returns the switch of the first replica, if any."""
+    import Schema
+    from db_pool import ConnectionPool, get_pool, install_pool
+    from fake_gemini import ScriptedGemini
+
+    Schema.client = ScriptedGemini(
+        latency=args.model_latency, chunk_delay=args.chunk_delay
+    )
+    if args.mysql:
+        return None
+    from replica_router import ReplicaRouter, install_replica_router
+    from sqlite_fixture import SQLiteConnection, build_fixture
+
+    path = build_fixture(workdir / "imdb.sqlite3", titles=args.titles)
+    install_pool(ConnectionPool(lambda: SQLiteConnection(path), size=args.pool_size))
+    if not args.replicas:
+        return None
+    outages = [Outage() for _ in range(args.replicas)]
+    pools = {}
+    for n, outage in enumerate(outages, start=1):
+        copy = Path(shutil.copy(path, workdir / f"replica{n}.sqlite3"))
+        pools[f"replica{n}"] = ConnectionPool(replica_factory(copy, outage), size=args.pool_size)
+    install_replica_router(ReplicaRouter(pools, primary=get_pool(), check_interval=0.5))
+    return outages[0]
+
+
+def span_breakdown() -> List[Tuple[str, int, float]]:
+    """(span, count, mean ms) from the in-process tracing histograms."""
+    from tracing import SPAN_SECONDS
+
+    rows = [
+        (labels[0], count, total / count * 1000)
+        for labels, (count, total) in SPAN_SECONDS.totals().items()
+        if count
+    ]
+    return sorted(rows, key=lambda r: r[1] * r[2], reverse=True)
+
+
+async def main(args: argparse.Namespace, outage: Optional[Outage] = None) -> int:
+    mix = args.scenarios
+    rng = random.Random(1)
+    if args.url:
+        target: Any = Remote(args.url, args.concurrency)
+    else:
+        import fastapi_backend
+
+        if not args.verbose:
+            logging.getLogger("fastapi_backend").setLevel(logging.WARNING)
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+        target = InProcess(fastapi_backend.app)
+
+    makers: Dict[str, Callable[[int, int], Awaitable[Sample]]] = {
+        "chat": lambda i, w: target.request("POST", "/api/chat", chat_body(i, w, mix, "chat")),
+        "stream": lambda i, w: target.request(
+            "POST", "/api/chat/stream", chat_body(i, w, mix, "stream")
+        ),
+        "info": lambda i, w: target.request("GET", info_path(rng, args.titles)),
+    }
+
+    async def run_all() -> List[PhaseResult]:
+        return [
+            await run_phase(e, makers[e], args.requests, args.concurrency, args.warmup)
+            for e in args.endpoints
+        ]
+
+    if outage is not None and args.fail_replica is not None:
+        asyncio.get_running_loop().call_later(args.fail_replica, setattr, outage, "down", True)
+
+    if args.url:
+        results = await run_all()
+    else:
+        async with fastapi_backend.app.router.lifespan_context(fastapi_backend.app):
+            results = await run_all()
+
+    reports = [r.report() for r in results]
+    print(
+        f"{'endpoint':<9}{'reqs':>7}{'err':>5}{'rps':>9}{'p50':>9}{'p90':>9}"
+        f"{'p99':>9}{'max':>9}   (ms)"
+    )
+    for r in reports:
+        print(
+            f"{r['endpoint']:<9}{r['requests']:>7}{r['errors']:>5}{r['rps']:>9.1f}"
+            f"{r['p50_ms']:>9.1f}{r['p90_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}"
+        )
+        if "ttft_p50_ms" in r:
+            print(f"{'':<9}first token p50 {r['ttft_p50_ms']:.1f}  p99 {r['ttft_p99_ms']:.1f}")
+
+    spans = [] if args.url else span_breakdown()
+    if spans:
+        print(f"\n{'span':<28}{'count':>8}{'mean ms':>10}")
+        for name, count, mean in spans:
+            print(f"{name:<28}{count:>8}{mean:>10.2f}")
+
+    router = None
+    if not args.url:
+        from replica_router import get_replica_router
+
+        router = get_replica_router()
+    if router is not None:
+        stats = router.stats()
+        print(f"\n{'database':<28}{'queries':>8}{'errors':>8}  state")
+        for name, replica in stats["replicas"].items():
+            state = "up" if replica["healthy"] else "down"
+            print(f"{name:<28}{replica['queries']:>8}{replica['errors']:>8}  {state}")
+        print(f"{'primary (fallback)':<28}{stats['primary_queries']:>8}")
+        print(f"failovers {stats['failovers']}")
+
+    failures = []
+    for r in reports:
+        if r["errors"]:
+            failures.append(f"{r['endpoint']}: {r['errors']} failed requests")
+        if args.max_p99_ms is not None and r["p99_ms"] > args.max_p99_ms:
+            failures.append(f"{r['endpoint']}: p99 {r['p99_ms']} ms > {args.max_p99_ms} ms")
+        if args.min_rps is not None and r["rps"] < args.min_rps:
+            failures.append(f"{r['endpoint']}: {r['rps']} req/s < {args.min_rps} req/s")
+
+    if args.json:
+        payload = {
+            "config": {k: v for k, v in vars(args).items() if k != "json"},
+            "endpoints": reports,
+            "spans": [{"span": n, "count": c, "mean_ms": round(m, 3)} for n, c, m in spans],
+            "replicas": router.stats() if router else None,
+            "failures": failures,
+        }
+        args.json.write_text(json.dumps(payload, indent=1), encoding="utf-8")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=200, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5, help="unrecorded requests per endpoint")
+    parser.add_argument("--scenarios", nargs="+", default=list(DEFAULT_MIX))
+    parser.add_argument("--model-latency", type=float, default=0.02, help="seconds per round")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between chunks")
+    parser.add_argument("--omdb-latency", type=float, default=0.01)
+    parser.add_argument("--titles", type=int, default=20_000, help="fixture size")
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument("--no-query-cache", action="store_true")
+    parser.add_argument("--no-answer-cache", action="store_true")
+    parser.add_argument("--mysql", action="store_true", help="use the MYSQL_* database")
+    parser.add_argument("--replicas", type=int, default=0, help="fixture copies as read replicas")
+    parser.add_argument(
+        "--fail-replica", type=float, metavar="SECONDS", help="stop the first replica after"
+    )
+    parser.add_argument("--url", help="load a running server instead of the in-process app")
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--min-rps", type=float)
+    parser.add_argument("--json", type=Path, help="write the report here")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory(prefix="moviegpt-bench-") as tmp:
+        outage = None
+        if not args.url:
+            prepare_offline(args, Path(tmp))
+            outage = install_offline(args, Path(tmp))
+        sys.exit(asyncio.run(main(args, outage)))
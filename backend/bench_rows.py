@@ -0,0 +1,121 @@
+"""Cost of turning a query result into the ``/api/chat`` response body.
+
+Usage::
+
+    python bench_rows.py                 # 1000 rows, best of 20
+    python bench_rows.py --rows 5000 --repeat 50
+
+Compares the previous pipeline (dictionary cursor rows copied into dicts,
+walked once by ``_normalise`` and three more times by ``_normalise_json``,
+then encoded by the stdlib ``JSONResponse``) with the current one
+(``RowConverter`` on cursor tuples, then ``row_codec.dumps``).  The rows mix
+DECIMAL, DATE and binary columns like the IMDb tables; the previous encoder
+could not serialise the last two at all, so its baseline uses ``default=str``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import decimal
+import json
+import timeit
+from typing import Any, Dict, List
+
+from mysql.connector import FieldType
+
+import row_codec
+from row_codec import BINARY_CHARSET, RowConverter, dumps
+
+UTF8MB4 = 255
+DESCRIPTION = [
+    ("tconst", FieldType.VAR_STRING, None, None, None, None, 0, 0, UTF8MB4),
+    ("primaryTitle", FieldType.VAR_STRING, None, None, None, None, 1, 0, UTF8MB4),
+    ("startYear", FieldType.LONG, None, None, None, None, 1, 0, UTF8MB4),
+    ("averageRating", FieldType.NEWDECIMAL, None, None, None, None, 1, 0, UTF8MB4),
+    ("numVotes", FieldType.LONG, None, None, None, None, 1, 0, UTF8MB4),
+    ("genres", FieldType.VAR_STRING, None, None, None, None, 1, 0, UTF8MB4),
+    ("loaded_on", FieldType.DATE, None, None, None, None, 1, 0, UTF8MB4),
+    ("row_hash", FieldType.STRING, None, None, None, None, 1, 0, BINARY_CHARSET),
+]
+
+
+def make_rows(n: int) -> List[tuple]:
+    day = datetime.date(2025, 1, 1)
+    return [
+        (
+            f"tt{i:07d}",
+            f"Movie number {i}",
+            1950 + i % 75,
+            decimal.Decimal(f"{1 + i % 90 / 10:.1f}"),
+            i * 37 % 2_000_000,
+            "Drama,Comedy",
+            day + datetime.timedelta(days=i % 365),
+            i.to_bytes(16, "big"),
+        )
+        for i in range(n)
+    ]
+
+
+# ---- previous pipeline, kept here only for comparison ----
+
+
+def _normalise(obj: Any) -> Any:
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (list, tuple)):
+        return [_normalise(x) for x in obj]
+    if isinstance(obj, dict):
+        return {k: _normalise(v) for k, v in obj.items()}
+    return obj
+
+
+def _normalise_json(obj: Any) -> Any:
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, list):
+        return [_normalise_json(v) for v in obj]
+    if isinstance(obj, dict):
+        return {k: _normalise_json(v) for k, v in obj.items()}
+    return obj
+
+
+def previous(rows: List[tuple]) -> bytes:
+    columns = [d[0] for d in DESCRIPTION]
+    fetched = [dict(zip(columns, r)) for r in rows]  # dictionary cursor
+    data = _normalise([dict(r) for r in fetched])
+    _normalise_json(data)  # tool payload
+    results = [{"rows": _normalise_json(data)}]  # all_results
+    body = {"data": _normalise_json(data), "results": results}  # chat() return
+    return json.dumps(
+        body, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+def current(rows: List[tuple]) -> bytes:
+    data = RowConverter(DESCRIPTION)(rows)
+    return dumps({"data": data, "results": [{"rows": data}]})
+
+
+def best_ms(fn: Any, rows: List[tuple], repeat: int) -> float:
+    return min(timeit.repeat(lambda: fn(rows), number=1, repeat=repeat)) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    encoder = "orjson" if row_codec.orjson is not None else "stdlib json"
+    print(f"{args.rows} rows, {len(DESCRIPTION)} columns, encoder: {encoder}")
+
+    timings: Dict[str, float] = {}
+    for name, fn in (("previous", previous), ("current", current)):
+        timings[name] = best_ms(fn, rows, args.repeat)
+        print(f"{name:<9} {timings[name]:8.2f} ms  {len(fn(rows)):>9,} bytes")
+
+    convert = best_ms(lambda r: RowConverter(DESCRIPTION)(r), rows, args.repeat)
+    print(f"  of which conversion {convert:.2f} ms")
+    print(f"speed-up  {timings['previous'] / timings['current']:.1f}x")
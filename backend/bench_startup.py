@@ -0,0 +1,119 @@
+"""Measure backend cold-start time against a budget.
+
+Usage::
+
+    python bench_startup.py                  # 5 runs, 0.8 s budget
+    python bench_startup.py --runs 10 --budget 0.6 --importtime 15
+
+Every run is a fresh interpreter that imports ``fastapi_backend`` and enters
+the application lifespan, i.e. what uvicorn does before it accepts requests
+(and what every recycled worker pays again).  Neither step may touch MySQL
+or Gemini, so the benchmark needs no running services.  Exits with status 1
+when the median time to ready exceeds ``--budget``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+_PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import fastapi_backend
+imported = time.perf_counter()
+genai_imported = "google.genai" in sys.modules
+
+async def ready():
+    async with fastapi_backend.app.router.lifespan_context(fastapi_backend.app):
+        return time.perf_counter()
+
+print(json.dumps({
+    "import": imported - started,
+    "ready": asyncio.run(ready()) - started,
+    "genai_imported": genai_imported,
+}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    # Startup must not depend on the key; the preload just logs a warning.
+    env.setdefault("GOOGLE_API_KEY", "bench")
+    return env
+
+
+def measure(runs: int) -> List[dict]:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE],
+            cwd=BACKEND_DIR,
+            env=_env(),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def slowest_imports(limit: int) -> List[tuple[int, int, str]]:
+    """``(self µs, cumulative µs, module)`` of the slowest imports, by cumulative time."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import fastapi_backend"],
+        cwd=BACKEND_DIR,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|", 2)
+        if own.strip().isdigit():
+            rows.append((int(own), int(cumulative), name.rstrip()))
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows[:limit]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget", type=float, default=0.8, help="max median seconds to ready"
+    )
+    parser.add_argument(
+        "--importtime", type=int, default=0, metavar="N", help="also list the N slowest imports"
+    )
+    args = parser.parse_args()
+
+    samples = measure(args.runs)
+    for key in ("import", "ready"):
+        values = [s[key] for s in samples]
+        print(
+            f"{key:<7} median {statistics.median(values):.3f}s  "
+            f"min {min(values):.3f}s  max {max(values):.3f}s"
+        )
+    if any(s["genai_imported"] for s in samples):
+        print("warning: importing fastapi_backend imported google-genai")
+
+    if args.importtime:
+        print(f"\n{'self ms':>8} {'cum ms':>8}  module")
+        for own, cumulative, name in slowest_imports(args.importtime):
+            print(f"{own / 1000:>8.1f} {cumulative / 1000:>8.1f}  {name}")
+
+    ready = statistics.median(s["ready"] for s in samples)
+    verdict = "within" if ready <= args.budget else "OVER"
+    print(f"\nready {ready:.3f}s is {verdict} the {args.budget:.3f}s budget")
+    sys.exit(0 if ready <= args.budget else 1)
@@ -0,0 +1,501 @@
+"""Parallel, resumable loader for the IMDb TSV dumps.
+
+Usage::
+
+    python bulk_load.py --data-dir ../data            # load everything
+    python bulk_load.py --tables title_akas --fresh    # reload one table
+
+Tables are created with their primary key only and loaded concurrently with
+``LOAD DATA LOCAL INFILE``.  Files larger than ``--chunk-mb`` are split on
+line boundaries and loaded chunk by chunk; every finished chunk is recorded
+in a JSON checkpoint, so an interrupted run resumes where it stopped.
+Chunks use ``REPLACE`` so re-loading one that had committed before the
+checkpoint was written is harmless.  Secondary and FULLTEXT indexes are
+built once a table is complete, then ``dataset_version`` is stamped and
+``db/normalize.sql`` and ``db/summaries.sql`` rebuild the derived tables.
+
+The server must allow ``local_infile`` (docker-compose.yml enables it).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import env  # noqa: F401
+from db_pool import connect
+from db_scripts import DERIVED_SCRIPTS, SQL_DIR, run_script
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = SQL_DIR.parent / "data"
+COPY_BLOCK = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    name: str
+    file: str
+    columns: Tuple[str, ...]
+    key: Tuple[str, ...]
+    # Column definitions and PRIMARY KEY only; indexes come after the load.
+    ddl: str
+    indexes: Tuple[str, ...] = ()
+
+
+# Same layout as db/init.sql.
+TABLES: Dict[str, TableSpec] = {
+    spec.name: spec
+    for spec in (
+        TableSpec(
+            "name_basics",
+            "name.basics.tsv",
+            ("nconst", "primaryName", "birthYear", "deathYear",
+             "primaryProfession", "knownForTitles"),
+            ("nconst",),
+            """
+            nconst            CHAR(10)  PRIMARY KEY,
+            primaryName       VARCHAR(255),
+            birthYear         SMALLINT,
+            deathYear         SMALLINT,
+            primaryProfession VARCHAR(255),
+            knownForTitles    VARCHAR(255)
+            """,
+        ),
+        TableSpec(
+            "title_basics",
+            "title.basics.tsv",
+            ("tconst", "titleType", "primaryTitle", "originalTitle", "isAdult",
+             "startYear", "endYear", "runtimeMinutes", "genres"),
+            ("tconst",),
+            """
+            tconst          CHAR(10)  PRIMARY KEY,
+            titleType       VARCHAR(32),
+            primaryTitle    VARCHAR(512),
+            originalTitle   VARCHAR(512),
+            isAdult         TINYINT(1),
+            startYear       SMALLINT,
+            endYear         SMALLINT,
+            runtimeMinutes  INT UNSIGNED,
+            genres          VARCHAR(128)
+            """,
+            ("ADD FULLTEXT INDEX ft_title_basics (primaryTitle, originalTitle) "
+             "WITH PARSER ngram",),
+        ),
+        TableSpec(
+            "title_akas",
+            "title.akas.tsv",
+            ("titleId", "ordering", "title", "region", "language", "types",
+             "attributes", "isOriginalTitle"),
+            ("titleId", "ordering"),
+            """
+            titleId     CHAR(10),
+            ordering    INT,
+            title       VARCHAR(1024),
+            region      VARCHAR(16),
+            language    VARCHAR(32),
+            types       VARCHAR(128),
+            attributes  VARCHAR(128),
+            isOriginalTitle TINYINT(1),
+            PRIMARY KEY (titleId, ordering)
+            """,
+            ("ADD FULLTEXT INDEX ft_title_akas (title) WITH PARSER ngram",),
+        ),
+        TableSpec(
+            "title_crew",
+            "title.crew.tsv",
+            ("tconst", "directors", "writers"),
+            ("tconst",),
+            """
+            tconst     CHAR(10) PRIMARY KEY,
+            directors  TEXT,
+            writers    TEXT
+            """,
+        ),
+        TableSpec(
+            "title_episode",
+            "title.episode.tsv",
+            ("tconst", "parentTconst", "seasonNumber", "episodeNumber"),
+            ("tconst",),
+            """
+            tconst        CHAR(10) PRIMARY KEY,
+            parentTconst  CHAR(10),
+            seasonNumber  INT UNSIGNED,
+            episodeNumber INT UNSIGNED
+            """,
+            ("ADD INDEX parentTconst (parentTconst)",),
+        ),
+        TableSpec(
+            "title_principals",
+            "title.principals.tsv",
+            ("tconst", "ordering", "nconst", "category", "job", "characters"),
+            ("tconst", "ordering"),
+            """
+            tconst     CHAR(10),
+            ordering   INT,
+            nconst     CHAR(10),
+            category   VARCHAR(64),
+            job        TEXT,
+            characters VARCHAR(1024),
+            PRIMARY KEY (tconst, ordering)
+            """,
+            ("ADD INDEX nconst (nconst)",),
+        ),
+        TableSpec(
+            "title_ratings",
+            "title.ratings.tsv",
+            ("tconst", "averageRating", "numVotes"),
+            ("tconst",),
+            """
+            tconst        CHAR(10) PRIMARY KEY,
+            averageRating DECIMAL(3,1),
+            numVotes      INT
+            """,
+        ),
+    )
+}
+
+
+# ---------- checkpoint ----------
+
+class Checkpoint:
+    """JSON progress file, rewritten atomically after every finished step.
+
+    Layout::
+
+        {"tables": {name: {"source": {...}, "chunks": {start: rows},
+                           "indexed": bool}},
+         "derived": bool}
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self.data: Dict[str, Any] = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self.data = {}
+        self.data.setdefault("tables", {})
+        self.data.setdefault("derived", False)
+
+    def table(self, name: str) -> Dict[str, Any]:
+        return self.data["tables"].setdefault(
+            name, {"source": None, "chunks": {}, "indexed": False}
+        )
+
+    def reset_table(self, name: str, source: Dict[str, Any]) -> None:
+        with self._lock:
+            self.data["tables"][name] = {"source": source, "chunks": {}, "indexed": False}
+            self.data["derived"] = False
+            self._save()
+
+    def chunk_done(self, name: str, start: int, rows: int) -> None:
+        with self._lock:
+            self.table(name)["chunks"][str(start)] = rows
+            self._save()
+
+    def mark(self, name: Optional[str], key: str) -> None:
+        with self._lock:
+            target = self.table(name) if name else self.data
+            target[key] = True
+            self._save()
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.data, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+# ---------- chunk planning ----------
+
+def _source_info(path: Path) -> Dict[str, Any]:
+    st = path.stat()
+    return {"size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def plan_chunks(path: Path, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """Byte ranges ``[start, end)`` covering the data lines of ``path``.
+
+    Boundaries are the first newline after every ``chunk_bytes`` step, so no
+    line is split and the file never has to be scanned as a whole.
+    """
+    size = path.stat().st_size
+    with path.open("rb") as f:
+        f.readline()  # header
+        start = f.tell()
+        ranges: List[Tuple[int, int]] = []
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _copy_range(src: Path, start: int, end: int, dst: Path) -> int:
+    """Copy ``src[start:end]`` to ``dst`` and return its number of lines."""
+    lines = 0
+    last = b"\n"
+    with src.open("rb") as fin, dst.open("wb") as fout:
+        fin.seek(start)
+        remaining = end - start
+        while remaining:
+            block = fin.read(min(COPY_BLOCK, remaining))
+            if not block:
+                break
+            fout.write(block)
+            lines += block.count(b"\n")
+            last = block[-1:]
+            remaining -= len(block)
+    return lines + (last != b"\n")
+
+
+# ---------- loader ----------
+
+class BulkLoader:
+    def __init__(
+        self,
+        data_dir: Path,
+        checkpoint: Checkpoint,
+        tables: List[str],
+        workers: int = 4,
+        chunk_bytes: int = 128 * 1024 * 1024,
+    ) -> None:
+        self.data_dir = data_dir
+        self.checkpoint = checkpoint
+        self.tables = [TABLES[name] for name in tables]
+        self.workers = workers
+        self.chunk_bytes = chunk_bytes
+
+        self._local = threading.local()
+        self._conns: List[Any] = []
+        self._lock = threading.Lock()
+        self._remaining: Dict[str, int] = {}
+        # table -> rows, first chunk start, last chunk end, index seconds
+        self.report: Dict[str, Dict[str, float]] = {}
+
+    # ----- connections -----
+
+    def _conn(self) -> Any:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(allow_local_infile=True)
+            with conn.cursor() as cur:
+                # Rows come straight from the dump; skip the per-row checks.
+                cur.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+                cur.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def _execute(self, sql: str, params: Tuple = ()) -> int:
+        with self._conn().cursor() as cur:
+            cur.execute(sql, params)
+            return cur.rowcount
+
+    def _table_exists(self, name: str) -> bool:
+        with self._conn().cursor() as cur:
+            cur.execute("SHOW TABLES LIKE %s", (name,))
+            return cur.fetchone() is not None
+
+    # ----- steps -----
+
+    def _prepare(self, spec: TableSpec) -> List[Tuple[int, int]]:
+        """Create or resume ``spec`` and return the chunks still to load."""
+        path = self.data_dir / spec.file
+        source = _source_info(path)
+        state = self.checkpoint.table(spec.name)
+        if state["source"] != source or not self._table_exists(spec.name):
+            if state["source"] is not None:
+                logger.info("%s: source or table changed, starting over", spec.name)
+            self._execute(f"DROP TABLE IF EXISTS {spec.name}")
+            # Row hashes of incremental_refresh.py describe the old contents.
+            self._execute(f"DROP TABLE IF EXISTS {spec.name}__hash")
+            self._execute(
+                f"CREATE TABLE {spec.name} ({spec.ddl}) DEFAULT CHARSET = utf8mb4"
+            )
+            self.checkpoint.reset_table(spec.name, source)
+            state = self.checkpoint.table(spec.name)
+
+        chunks = plan_chunks(path, self.chunk_bytes)
+        todo = [c for c in chunks if str(c[0]) not in state["chunks"]]
+        if len(todo) < len(chunks):
+            logger.info(
+                "%s: resuming, %d of %d chunks already loaded",
+                spec.name, len(chunks) - len(todo), len(chunks),
+            )
+        return todo
+
+    def _load_chunk(self, spec: TableSpec, start: int, end: int, total: int) -> None:
+        path = self.data_dir / spec.file
+        columns = ", ".join(spec.columns)
+        sql = (
+            f"LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {spec.name} "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+            f"({columns})"
+        )
+        began = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix="bulk_load_") as tmp:
+            chunk = Path(tmp) / f"{spec.name}.{start}.tsv"
+            rows = _copy_range(path, start, end, chunk)
+            self._execute(sql, (str(chunk),))
+        finished = time.perf_counter()
+        self.checkpoint.chunk_done(spec.name, start, rows)
+
+        with self._lock:
+            report = self.report.setdefault(
+                spec.name, {"rows": 0, "start": began, "end": finished, "index": 0.0}
+            )
+            report["rows"] += rows
+            report["start"] = min(report["start"], began)
+            report["end"] = max(report["end"], finished)
+            self._remaining[spec.name] -= 1
+            done = total - self._remaining[spec.name]
+            last = self._remaining[spec.name] == 0
+        elapsed = finished - began
+        logger.info(
+            "%s: chunk %d/%d, %d rows in %.1fs (%.0f rows/s)",
+            spec.name, done, total, rows, elapsed, rows / elapsed if elapsed else 0,
+        )
+        if last:
+            self._build_indexes(spec)
+
+    def _build_indexes(self, spec: TableSpec) -> None:
+        if self.checkpoint.table(spec.name)["indexed"]:
+            return
+        began = time.perf_counter()
+        if spec.indexes:
+            self._execute(f"ALTER TABLE {spec.name} {', '.join(spec.indexes)}")
+            logger.info(
+                "%s: indexes built in %.1fs", spec.name, time.perf_counter() - began
+            )
+        self.checkpoint.mark(spec.name, "indexed")
+        with self._lock:
+            self.report.setdefault(
+                spec.name, {"rows": 0, "start": began, "end": began, "index": 0.0}
+            )["index"] = time.perf_counter() - began
+
+    def _finish(self, derive: bool) -> None:
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS dataset_version ("
+            "id TINYINT PRIMARY KEY, loaded_at TIMESTAMP(6) NOT NULL"
+            ") DEFAULT CHARSET = utf8mb4"
+        )
+        self._execute("REPLACE INTO dataset_version VALUES (1, CURRENT_TIMESTAMP(6))")
+        if derive and not self.checkpoint.data["derived"]:
+            for script in DERIVED_SCRIPTS:
+                run_script(script, self._conn())
+            self.checkpoint.mark(None, "derived")
+
+    # ----- entry point -----
+
+    def run(self, derive: bool = True) -> bool:
+        """Load every selected table; return ``False`` if any step failed."""
+        tasks: List[Tuple[int, TableSpec, int, int, int]] = []
+        pending_index: List[TableSpec] = []
+        for spec in self.tables:
+            todo = self._prepare(spec)
+            self._remaining[spec.name] = len(todo)
+            if not todo:
+                pending_index.append(spec)
+            for start, end in todo:
+                tasks.append((end - start, spec, start, end, len(todo)))
+        # Biggest chunks first keeps every worker busy until the end.
+        tasks.sort(key=lambda t: -t[0])
+
+        ok = True
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="bulk_load") as pool:
+            futures = {
+                pool.submit(self._load_chunk, spec, start, end, total): spec.name
+                for _, spec, start, end, total in tasks
+            }
+            futures.update(
+                {pool.submit(self._build_indexes, spec): spec.name for spec in pending_index}
+            )
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception:
+                    ok = False
+                    logger.exception("%s: load failed", futures[future])
+
+        try:
+            if ok:
+                self._finish(derive)
+        except Exception:
+            ok = False
+            logger.exception("post-load step failed")
+        finally:
+            for conn in self._conns:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        return ok
+
+    def summary(self) -> str:
+        lines = [f"{'table':<18} {'rows':>12} {'load s':>8} {'rows/s':>10} {'index s':>8}"]
+        for spec in self.tables:
+            r = self.report.get(spec.name)
+            if r is None:
+                continue
+            seconds = r["end"] - r["start"]
+            rate = r["rows"] / seconds if seconds > 0 else 0
+            lines.append(
+                f"{spec.name:<18} {int(r['rows']):>12,} {seconds:>8.1f} "
+                f"{rate:>10,.0f} {r['index']:>8.1f}"
+            )
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-mb", type=int, default=128)
+    parser.add_argument(
+        "--checkpoint", type=Path, help="progress file (default: <data-dir>/.bulk_load.json)"
+    )
+    parser.add_argument("--fresh", action="store_true", help="ignore saved progress")
+    parser.add_argument(
+        "--skip-derived", action="store_true", help="do not rebuild the derived tables"
+    )
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.data_dir / ".bulk_load.json"
+    if args.fresh and checkpoint_path.exists():
+        data = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+        for name in args.tables:
+            data.get("tables", {}).pop(name, None)
+        data["derived"] = False
+        checkpoint_path.write_text(json.dumps(data, indent=1), encoding="utf-8")
+
+    loader = BulkLoader(
+        args.data_dir,
+        Checkpoint(checkpoint_path),
+        args.tables,
+        workers=args.workers,
+        chunk_bytes=args.chunk_mb * 1024 * 1024,
+    )
+    started = time.perf_counter()
+    ok = loader.run(derive=not args.skip_derived)
+    print(loader.summary())
+    print(f"total {time.perf_counter() - started:.1f}s")
+    if not ok:
+        print("some steps failed; run the same command again to resume", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,277 @@
+"""Thread-safe MySQL connection pool with health checks and metrics."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+import mysql.connector
+from mysql.connector import errors
+
+from tracing import span
+
+
+T = TypeVar("T")
+
+
+class PoolTimeout(errors.PoolError):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+def connect(**overrides: Any):
+    """Open a raw connection using the ``MYSQL_*`` environment variables."""
+    params: Dict[str, Any] = dict(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        port=int(os.getenv("MYSQL_PORT", 3306)),
+        user=os.getenv("MYSQL_USER"),
+        password=os.getenv("MYSQL_PASSWORD"),
+        database=os.getenv("MYSQL_DB"),
+        # Pooled connections are reused across requests, so a long-lived
+        # REPEATABLE READ snapshot would hide freshly loaded data.
+        autocommit=True,
+    )
+    params.update(overrides)
+    return mysql.connector.connect(**params)
+
+
+class ConnectionPool:
+    """Bounded pool of reusable connections.
+
+    Connections are opened lazily by ``factory`` up to ``size``.  Idle
+    connections older than ``recycle`` seconds are closed instead of being
+    handed out, and connections that sat idle longer than ``ping_after``
+    seconds are pinged before reuse.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int = 5,
+        timeout: float = 10.0,
+        recycle: float = 1800.0,
+        ping_after: float = 30.0,
+    ) -> None:
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        # (connection, created_at, last_used_at)
+        self._idle: Deque[Tuple[Any, float, float]] = deque()
+        self._created_at: Dict[int, float] = {}
+        self._doomed: set[int] = set()
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._handshakes = 0
+        self._handshake_total = 0.0
+        self._handshake_last = 0.0
+        self._recycled = 0
+        self._timeouts = 0
+        self._acquired = 0
+
+    # ---------- connection lifecycle ----------
+
+    def _open(self) -> Any:
+        start = time.perf_counter()
+        conn = self._factory()
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._handshakes += 1
+            self._handshake_total += elapsed
+            self._handshake_last = elapsed
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _dispose(self, conn: Any) -> None:
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+            self._doomed.discard(id(conn))
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(conn: Any) -> bool:
+        try:
+            return bool(conn.is_connected())
+        except Exception:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """Borrow a connection, waiting at most ``timeout`` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        candidate = None
+        with self._cond:
+            if self._closed:
+                raise errors.PoolError(msg="Connection pool is closed")
+            self._waiting += 1
+            try:
+                while not self._idle and self._in_use >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            msg=f"Timed out after {timeout:.1f}s waiting for a "
+                            f"database connection (pool size {self.size})"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            if self._idle:
+                candidate = self._idle.pop()
+            self._in_use += 1
+            self._acquired += 1
+
+        try:
+            if candidate is None:
+                return self._open()
+            conn, created, last_used = candidate
+            now = time.monotonic()
+            if now - created > self.recycle:
+                with self._cond:
+                    self._recycled += 1
+                self._dispose(conn)
+                return self._open()
+            if now - last_used > self.ping_after and not self._is_alive(conn):
+                with self._cond:
+                    self._recycled += 1
+                self._dispose(conn)
+                return self._open()
+            return conn
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """Return ``conn`` to the pool, or close it when ``discard`` is set."""
+        with self._cond:
+            discard = discard or self._closed or id(conn) in self._doomed
+            created = self._created_at.get(id(conn), time.monotonic())
+        if discard:
+            self._dispose(conn)
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((conn, created, time.monotonic()))
+            self._cond.notify()
+
+    def invalidate(self, conn: Any) -> None:
+        """Mark a borrowed connection so it is closed instead of reused."""
+        with self._cond:
+            self._doomed.add(id(conn))
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Context manager that borrows a connection and always returns it."""
+        with span("db.acquire"):
+            conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=not self._is_alive(conn))
+            raise
+        else:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close idle connections and refuse further acquires."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._dispose(conn)
+
+    # ---------- metrics ----------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "acquired": self._acquired,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "handshakes": self._handshakes,
+                "handshake_last_ms": round(self._handshake_last * 1000, 2),
+                "handshake_avg_ms": round(
+                    self._handshake_total / self._handshakes * 1000, 2
+                )
+                if self._handshakes
+                else 0.0,
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it from the environment on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    connect,
+                    size=int(os.getenv("MYSQL_POOL_SIZE", 5)),
+                    timeout=float(os.getenv("MYSQL_POOL_TIMEOUT", 10)),
+                    recycle=float(os.getenv("MYSQL_POOL_RECYCLE", 1800)),
+                    ping_after=float(os.getenv("MYSQL_POOL_PING_AFTER", 30)),
+                )
+    return _pool
+
+
+def install_pool(pool: ConnectionPool) -> None:
+    """Replace the process-wide pool, e.g. with a local stand-in for benchmarks."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    if old is not None:
+        old.close()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking database work off the event loop.
+
+    The worker threads are capped at the pool size, so queued coroutines wait
+    for a thread here instead of piling up on the pool's acquire timeout.
+    """
+    global _executor
+    if _executor is None:
+        size = get_pool().size
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=size, thread_name_prefix="mysql"
+                )
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context (the current tracing span) into the thread.
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor, functools.partial(ctx.run, fn, *args, **kwargs)
+    )
@@ -0,0 +1,75 @@
+"""Run the post-load SQL scripts in ``db/`` against the configured database.
+
+Usage::
+
+    python db_scripts.py normalize summaries
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import List
+
+import env  # noqa: F401
+from db_pool import connect
+from sql_text import tokenize
+
+SQL_DIR = Path(__file__).resolve().parent.parent / "db"
+
+# Script name -> file in db/
+SCRIPTS = {
+    "normalize": "normalize.sql",
+    "summaries": "summaries.sql",
+}
+
+# Scripts that derive tables from the IMDb tables, in dependency order.
+DERIVED_SCRIPTS = ("normalize", "summaries")
+
+logger = logging.getLogger(__name__)
+
+
+def split_statements(text: str) -> List[str]:
+    """Split a script on top-level ``;`` (semicolons inside strings are kept)."""
+    statements: List[str] = []
+    start = 0
+    for tok in tokenize(text):
+        if tok.kind == "punct" and tok.text == ";":
+            statements.append(text[start : tok.pos])
+            start = tok.pos + 1
+    statements.append(text[start:])
+    # Drop pieces that only hold comments or whitespace.
+    return [s.strip() for s in statements if next(tokenize(s), None) is not None]
+
+
+def run_script(name: str, conn=None) -> None:
+    """Execute ``db/<script>`` statement by statement, logging timings."""
+    path = SQL_DIR / SCRIPTS[name]
+    own = conn is None
+    conn = conn or connect()
+    try:
+        with conn.cursor() as cur:
+            for statement in split_statements(path.read_text(encoding="utf-8")):
+                started = time.perf_counter()
+                cur.execute(statement)
+                if cur.with_rows:
+                    cur.fetchall()
+                logger.info(
+                    "%s: %.1fs %s",
+                    name,
+                    time.perf_counter() - started,
+                    " ".join(statement.split())[:80],
+                )
+    finally:
+        if own:
+            conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scripts", nargs="+", choices=sorted(SCRIPTS))
+    for script in parser.parse_args().scripts:
+        run_script(script)
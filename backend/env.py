@@ -0,0 +1,9 @@
+"""Load ``backend/.env`` into the process environment, once.
+
+Modules read their settings with ``os.getenv`` at import time, so entry
+points import this module before anything else.
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,298 @@
+"""Scripted stand-in for ``genai.Client``, for offline tests and benchmarks.
+
+Usage::
+
+    import Schema
+    from fake_gemini import ScriptedGemini
+    Schema.client = ScriptedGemini(latency=0.05)
+
+The user message selects a scenario by a ``[name]`` prefix, e.g.
+``"[top_rated] best movies of 1994"``; the first number in the message is
+passed to it.  ``question`` writes such a message with a realistic year,
+person or page for each scenario.  A scenario returns the rounds of one turn: lists of function
+calls the model "makes", then the final answer text.  Which round to replay
+is read from the conversation itself (the model turns since the last user
+message), so one client serves any number of concurrent chats.  The default
+scenarios query the tables of ``sqlite_fixture`` with SQL that also runs on
+MySQL.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Union
+
+from google.genai import types
+
+from row_codec import dumps
+
+Call = tuple[str, Dict[str, Any]]
+Round = Union[List[Call], str]  # function calls, or the final answer
+Scenario = Callable[[int], List[Round]]
+
+_SCENARIO_RE = re.compile(r"^\s*\[(\w+)\]")
+_NUMBER_RE = re.compile(r"\d+")
+
+_FILLER = (
+    "The ranking is based on the number of IMDb votes, which tracks how widely "
+    "a title was seen better than the rating alone. Ask for another year, genre "
+    "or person to compare, or open a title to see its poster and plot."
+)
+
+
+def _query(sql: str, limit: Optional[int] = None) -> Call:
+    args: Dict[str, Any] = {"sql": " ".join(sql.split())}
+    if limit is not None:
+        args["limit"] = limit
+    return ("execute_mysql_query", args)
+
+
+def top_rated(year: int) -> List[Round]:
+    year = year or 1994
+    return [
+        [
+            _query(f"""
+                SELECT b.tconst, b.primaryTitle, r.averageRating, r.numVotes
+                FROM title_basics b JOIN title_ratings r ON r.tconst = b.tconst
+                WHERE b.startYear = {year} AND b.titleType = 'movie'
+                ORDER BY r.numVotes DESC LIMIT 10""")
+        ],
+        f"These are the most voted movies released in {year}. {_FILLER}",
+    ]
+
+
+def genre_year(year: int) -> List[Round]:
+    """Two independent queries in one round (run concurrently)."""
+    year = year or 2001
+    return [
+        [
+            _query(f"""
+                SELECT g.genre, COUNT(*) AS titles
+                FROM title_genre g JOIN title_basics b ON b.tconst = g.tconst
+                WHERE b.startYear = {year}
+                GROUP BY g.genre ORDER BY titles DESC"""),
+            _query(f"""
+                SELECT COUNT(*) AS rated, AVG(r.averageRating) AS avg_rating
+                FROM title_basics b JOIN title_ratings r ON r.tconst = b.tconst
+                WHERE b.startYear = {year}"""),
+        ],
+        f"Drama led the genres of {year}; the average rating is shown below. {_FILLER}",
+    ]
+
+
+def director(n: int) -> List[Round]:
+    """Two dependent rounds: rank directors, then one filmography."""
+    person = f"nm{n or 1:07d}"
+    return [
+        [
+            _query("""
+                SELECT n.nconst, n.primaryName, COUNT(*) AS films
+                FROM title_director d JOIN name_basics n ON n.nconst = d.nconst
+                GROUP BY n.nconst, n.primaryName ORDER BY films DESC LIMIT 5""")
+        ],
+        [
+            _query(f"""
+                SELECT b.tconst, b.primaryTitle, b.startYear, r.averageRating
+                FROM title_director d
+                JOIN title_basics b ON b.tconst = d.tconst
+                LEFT JOIN title_ratings r ON r.tconst = b.tconst
+                WHERE d.nconst = '{person}' ORDER BY b.startYear""")
+        ],
+        f"Here is the filmography of {person}, ordered by year. {_FILLER}",
+    ]
+
+
+def big_result(n: int) -> List[Round]:
+    """A 1000-row result, to exercise compaction and serialisation."""
+    offset = ((n or 1) - 1) % 10 * 1000
+    return [
+        [
+            _query(
+                f"""
+                SELECT tconst, primaryTitle, titleType, startYear, averageRating,
+                       numVotes, popularity_rank
+                FROM title_popularity
+                WHERE popularity_rank > {offset}
+                ORDER BY popularity_rank LIMIT 1000""",
+                limit=1000,
+            )
+        ],
+        f"These are the titles ranked {offset + 1} to {offset + 1000} by votes. {_FILLER}",
+    ]
+
+
+def chitchat(n: int) -> List[Round]:
+    return [f"Hello! I can answer questions about movies, people and ratings. {_FILLER}"]
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "top_rated": top_rated,
+    "genre_year": genre_year,
+    "director": director,
+    "big_result": big_result,
+    "chitchat": chitchat,
+}
+
+# A question per scenario; the placeholders cover the years, people and
+# result pages of ``sqlite_fixture`` and of the real IMDb data alike.
+QUESTIONS: Dict[str, str] = {
+    "top_rated": "What were the most popular movies of {year}?",
+    "genre_year": "Which genres dominated {year}, and how were they rated?",
+    "director": "Who directed the most films? Show me the films of nm{person:07d}.",
+    "big_result": "List page {page} of the most voted titles.",
+    "chitchat": "Hi, what can you do?",
+}
+
+
+def question(scenario: str, rng: random.Random) -> str:
+    """A user message that replays ``scenario``."""
+    text = QUESTIONS.get(scenario, "Tell me about movies.").format(
+        year=rng.randint(1950, 2024), person=rng.randint(1, 5000), page=rng.randint(1, 10)
+    )
+    return f"[{scenario}] {text}"
+
+
+def _part_chars(part: types.Part) -> int:
+    if part.text:
+        return len(part.text)
+    if part.function_response is not None:
+        return len(dumps(part.function_response.response))
+    if part.function_call is not None:
+        return len(dumps(part.function_call.args))
+    return 0
+
+
+class _Models:
+    def __init__(self, owner: "ScriptedGemini") -> None:
+        self._owner = owner
+
+    def generate_content(self, *, contents: List[types.Content], **_: Any):
+        time.sleep(self._owner.latency)
+        return self._owner.respond(contents)
+
+    def generate_content_stream(
+        self, *, contents: List[types.Content], **_: Any
+    ) -> Iterator[types.GenerateContentResponse]:
+        time.sleep(self._owner.latency)
+        for i, chunk in enumerate(self._owner.respond_chunks(contents)):
+            if i and self._owner.chunk_delay:
+                time.sleep(self._owner.chunk_delay)
+            yield chunk
+
+
+class _AsyncModels:
+    def __init__(self, owner: "ScriptedGemini") -> None:
+        self._owner = owner
+
+    async def generate_content(self, *, contents: List[types.Content], **_: Any):
+        await asyncio.sleep(self._owner.latency)
+        return self._owner.respond(contents)
+
+    async def generate_content_stream(
+        self, *, contents: List[types.Content], **_: Any
+    ) -> AsyncIterator[types.GenerateContentResponse]:
+        owner = self._owner
+
+        async def stream() -> AsyncIterator[types.GenerateContentResponse]:
+            await asyncio.sleep(owner.latency)
+            for i, chunk in enumerate(owner.respond_chunks(contents)):
+                if i and owner.chunk_delay:
+                    await asyncio.sleep(owner.chunk_delay)
+                yield chunk
+
+        return stream()
+
+
+class _Aio:
+    def __init__(self, owner: "ScriptedGemini") -> None:
+        self.models = _AsyncModels(owner)
+
+
+class ScriptedGemini:
+    """Replays scenario scripts through the ``models`` / ``aio.models`` API."""
+
+    def __init__(
+        self,
+        scenarios: Optional[Dict[str, Scenario]] = None,
+        default: str = "chitchat",
+        latency: float = 0.0,
+        chunk_delay: float = 0.0,
+        chunk_words: int = 6,
+    ) -> None:
+        self.scenarios = scenarios or SCENARIOS
+        self.default = default
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_words = chunk_words
+        self.models = _Models(self)
+        self.aio = _Aio(self)
+        self.calls = 0
+
+    def rounds(self, message: str) -> List[Round]:
+        """The script that answers the user ``message``."""
+        match = _SCENARIO_RE.match(message)
+        scenario = self.scenarios.get(match.group(1) if match else "", self.scenarios[self.default])
+        number = _NUMBER_RE.search(message[match.end() :] if match else message)
+        return scenario(int(number.group()) if number else 0)
+
+    def _next_round(self, contents: List[types.Content]) -> tuple[Round, int]:
+        """The scripted round for this conversation and the prompt size in tokens."""
+        start = max(
+            i
+            for i, c in enumerate(contents)
+            if c.role == "user" and any(p.text for p in c.parts or [])
+        )
+        message = next(p.text for p in contents[start].parts if p.text)
+        done = sum(1 for c in contents[start + 1 :] if c.role == "model")
+
+        rounds = self.rounds(message)
+
+        prompt_chars = sum(_part_chars(p) for c in contents for p in c.parts or [])
+        self.calls += 1
+        return rounds[min(done, len(rounds) - 1)], prompt_chars // 4 + 1
+
+    @staticmethod
+    def _response(parts: List[types.Part], prompt_tokens: int, output_chars: int, usage: bool):
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_chars // 4 + 1,
+                total_token_count=prompt_tokens + output_chars // 4 + 1,
+            )
+            if usage
+            else None,
+        )
+
+    @staticmethod
+    def _call_parts(calls: List[Call]) -> List[types.Part]:
+        return [
+            types.Part(function_call=types.FunctionCall(name=name, args=args))
+            for name, args in calls
+        ]
+
+    def respond(self, contents: List[types.Content]) -> types.GenerateContentResponse:
+        step, prompt_tokens = self._next_round(contents)
+        if isinstance(step, str):
+            return self._response([types.Part(text=step)], prompt_tokens, len(step), True)
+        parts = self._call_parts(step)
+        return self._response(parts, prompt_tokens, len(dumps([a for _, a in step])), True)
+
+    def respond_chunks(self, contents: List[types.Content]) -> List[types.GenerateContentResponse]:
+        step, prompt_tokens = self._next_round(contents)
+        if not isinstance(step, str):
+            size = len(dumps([a for _, a in step]))
+            return [self._response(self._call_parts(step), prompt_tokens, size, True)]
+        words = step.split(" ")
+        pieces = [
+            " ".join(words[i : i + self.chunk_words]) + " "
+            for i in range(0, len(words), self.chunk_words)
+        ]
+        return [
+            # Usage totals ride on the last chunk, as with the real API.
+            self._response([types.Part(text=piece)], prompt_tokens, len(step), last)
+            for piece, last in zip(pieces, [False] * (len(pieces) - 1) + [True])
+        ]
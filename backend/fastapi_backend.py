@@ -2,22 +2,83 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
-from typing import AsyncGenerator
-
-from fastapi import FastAPI, HTTPException
+import os
+import secrets
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import httpx
+import mysql.connector
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-
-from Schema import chat, chat_history
-from get_info import get_info
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+import env  # noqa: F401
+from Schema import (
+    achat,
+    achat_stream,
+    get_client,
+    query_flight,
+    refresh_schema_overview,
+)
+from session_store import DEFAULT_SESSION, get_session_store
+from answer_cache import get_answer_cache
+from db_pool import get_pool, run_blocking
+from query_cache import get_query_cache
+from replica_router import get_replica_router
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry
+from get_info import (
+    MAX_BATCH_IDS,
+    OMDbError,
+    aclose as close_omdb,
+    aget_info,
+    get_info_many,
+    omdb_flight,
+)
+from omdb_cache import get_omdb_cache
+from row_codec import dumps
+from tracing import span
+from schema_overview import get_schema_overview
+from sql_guard import get_sql_guard
 
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+# Import google-genai and build the client in the background once the server
+# is up, instead of on the first chat request (or at import time).
+GEMINI_PRELOAD = os.getenv("GEMINI_PRELOAD", "1") == "1"
+
+
+def _preload_gemini() -> None:
+    try:
+        get_client()
+    except Exception as exc:
+        logger.warning("Gemini客户端预加载失败，将在首次请求时重试: %s", exc)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    preload = None
+    if GEMINI_PRELOAD:
+        preload = asyncio.create_task(asyncio.to_thread(_preload_gemini))
+    yield
+    if preload is not None:
+        await preload
+    await close_omdb()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded by ``row_codec.dumps`` (orjson when installed)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,75 +90,155 @@ app.add_middleware(
 
 
 @app.post("/api/chat")
-async def api_chat(payload: dict) -> JSONResponse:
+async def api_chat(payload: dict) -> FastJSONResponse:
     """Return a single assistant response."""
     user_message = payload.get("message")
     if not user_message:
         raise HTTPException(status_code=400, detail="缺少message参数")
 
-    logger.info("收到用户消息: %s", user_message)
-    text, sql, data, results = chat(user_message)
-    logger.info("AI回复: %s", text)
+    session_id = payload.get("session_id") or DEFAULT_SESSION
 
-    return JSONResponse({"text": text, "sql": sql, "data": data, "results": results})
+    logger.info("收到用户消息[%s]: %s", session_id, user_message)
+    with span("chat.turn", session=session_id) as turn:
+        text, sql, data, results = await achat(user_message, session_id)
+    logger.info("AI回复[%s]: %s", turn.trace_id, text)
+
+    return FastJSONResponse(
+        {"text": text, "sql": sql, "data": data, "results": results},
+        headers={"X-Trace-Id": turn.trace_id},
+    )
 
 
 @app.post("/api/chat/stream")
 async def api_chat_stream(payload: dict) -> StreamingResponse:
-    """Stream tokens one by one in a Server-Sent Events format."""
+    """Stream the reply as Server-Sent Events while Gemini generates it.
+
+    Text frames carry ``token``, tool rounds are reported as ``event: "tool"``
+    frames, and the last frame has ``complete: true`` with the full envelope.
+    """
     user_message = payload.get("message")
     if not user_message:
         raise HTTPException(status_code=400, detail="缺少message参数")
 
-    async def generator() -> AsyncGenerator[str, None]:
-        text, sql, data, results = chat(user_message)
-        for i, char in enumerate(text):
-            chunk = json.dumps(
-                {"token": char, "complete": i == len(text) - 1},
-                ensure_ascii=False,
-            )
-            yield f"data: {chunk}\n\n"
+    session_id = payload.get("session_id") or DEFAULT_SESSION
 
-        final = json.dumps({"complete": True, "text": text, "sql": sql, "data": data, "results": results}, ensure_ascii=False)
-        yield f"data: {final}\n\n"
-        yield "data: [DONE]\n\n"
+    logger.info("收到用户消息(流式)[%s]: %s", session_id, user_message)
 
-    return StreamingResponse(generator(), media_type="text/plain")
+    async def generator() -> AsyncIterator[bytes]:
+        with span("chat.turn", session=session_id, stream=True) as turn:
+            async for event in achat_stream(user_message, session_id):
+                kind = event.pop("type")
+                if kind == "token":
+                    frame = {"token": event["text"], "complete": False}
+                elif kind == "tool":
+                    frame = {"event": "tool", **event}
+                else:
+                    logger.info("AI回复[%s]: %s", turn.trace_id, event["text"])
+                    frame = {"complete": True, **event}
+                yield b"data: " + dumps(frame) + b"\n\n"
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(generator(), media_type="text/event-stream")
 
 
 @app.get("/api/history")
-async def get_chat_history() -> JSONResponse:
-    """Return stored conversation history."""
+async def get_chat_history(session_id: str = DEFAULT_SESSION) -> JSONResponse:
+    """Return stored conversation history of one session."""
     history = []
-    for content in chat_history:
-        if hasattr(content, "role") and hasattr(content, "parts"):
-            role = "user" if content.role == "user" else "assistant"
-            text = content.parts[0].text if content.parts else ""
-            history.append(
-                {"id": f"{len(history)}", "type": role, "text": text, "timestamp": 0}
-            )
+    for turn in await asyncio.to_thread(get_session_store().get, session_id):
+        role = "user" if turn["role"] == "user" else "assistant"
+        history.append(
+            {"id": f"{len(history)}", "type": role, "text": turn["text"], "timestamp": 0}
+        )
 
     return JSONResponse({"history": history})
 
 
 @app.post("/api/clear")
-async def clear_history() -> JSONResponse:
-    """Clear the conversation history."""
-    chat_history.clear()
+async def clear_history(session_id: str = DEFAULT_SESSION) -> JSONResponse:
+    """Clear the conversation history of one session."""
+    await asyncio.to_thread(get_session_store().clear, session_id)
     return JSONResponse({"message": "历史记录已清除"})
 
 
+@app.get("/api/info")
+async def api_get_info_batch(ids: str = "") -> JSONResponse:
+    """Fetch OMDb info for a comma-separated list of IMDb IDs at once."""
+    id_list = [i for i in ids.split(",") if i.strip()]
+    if not id_list:
+        raise HTTPException(status_code=400, detail="缺少ids参数")
+    if len(id_list) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"一次最多查询{MAX_BATCH_IDS}个ID"
+        )
+    results, errors = await get_info_many(id_list)
+    return JSONResponse({"results": results, "errors": errors})
+
+
 @app.get("/api/info/{imdb_id}")
 async def api_get_info(imdb_id: str) -> JSONResponse:
     """Fetch additional movie info from OMDb by IMDb ID."""
-    data = get_info(imdb_id)
+    try:
+        data = await aget_info(imdb_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except OMDbError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except httpx.HTTPError as exc:
+        logger.warning("OMDb请求失败 %s: %s", imdb_id, exc)
+        raise HTTPException(status_code=502, detail="OMDb暂时不可用")
     return JSONResponse(data)
 
 
+@app.post("/api/admin/schema/refresh")
+async def admin_refresh_schema(x_admin_token: str = Header("")) -> JSONResponse:
+    """Re-read the database schema (e.g. after a migration) without a restart."""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="未配置ADMIN_TOKEN，管理接口已禁用")
+    if not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="管理令牌无效")
+    try:
+        changed = await run_blocking(refresh_schema_overview)
+    except mysql.connector.Error as exc:
+        raise HTTPException(status_code=503, detail=f"数据库不可用: {exc}")
+    return JSONResponse({"changed": changed, "schema": get_schema_overview().stats()})
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Prometheus text format: latency, rows, bytes and token histograms per span."""
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+def _health() -> dict[str, Any]:
+    cache = get_query_cache()
+    guard = get_sql_guard()
+    router = get_replica_router()
+    answers = get_answer_cache()
+    return {
+        "status": "healthy",
+        "service": "MovieGPT API",
+        "db_pool": get_pool().stats(),
+        "replicas": router.stats() if router else None,
+        "sessions": get_session_store().stats(),
+        "query_cache": cache.stats() if cache else None,
+        "answer_cache": answers.stats() if answers else None,
+        "schema": get_schema_overview().stats(),
+        "sql_guard": guard.stats() if guard else None,
+        "omdb_cache": get_omdb_cache().stats(),
+        "single_flight": {
+            "sql": query_flight.stats(),
+            "omdb": omdb_flight.stats(),
+        },
+    }
+
+
 @app.get("/health")
 async def health_check() -> JSONResponse:
     """Simple health check used by the frontend."""
-    return JSONResponse({"status": "healthy", "service": "MovieGPT API"})
+    # The SQLite session store and OMDb cache sum their tables for stats().
+    return JSONResponse(await asyncio.to_thread(_health))
 
 
 if __name__ == "__main__":
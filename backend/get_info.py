@@ -2,49 +2,156 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
 import os
-import time
-from typing import Dict
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
 
-import requests
-from dotenv import load_dotenv
+import httpx
+
+import env  # noqa: F401
+from omdb_cache import get_omdb_cache
+from single_flight import AsyncSingleFlight
+from tracing import span
 
-load_dotenv()
 OMDB_API_KEY = os.getenv("OMDB_API_KEY")
+# Point at a local stub (``python omdb_stub.py``) for tests and benchmarks.
+OMDB_BASE_URL = os.getenv("OMDB_BASE_URL", "https://www.omdbapi.com/")
+OMDB_CONCURRENCY = int(os.getenv("OMDB_CONCURRENCY", 8))
+OMDB_TIMEOUT = float(os.getenv("OMDB_TIMEOUT", 10))
+OMDB_RETRIES = 3
+MAX_BATCH_IDS = 50
 
+IMDB_ID_RE = re.compile(r"^tt\d{7,10}$")
 
-_CACHE: Dict[str, dict] = {}
 
+class OMDbError(Exception):
+    """OMDb answered, but with ``"Response": "False"`` (e.g. unknown id)."""
 
-def _fetch_from_api(imdb_id: str, retries: int = 3) -> dict:
-    """Fetch data from OMDb, retrying on failure."""
-    url = f"https://www.omdbapi.com/?i={imdb_id}&apikey={OMDB_API_KEY}&plot=full"
-    for attempt in range(retries):
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            # OMDb uses `Response":"False"` to indicate errors
-            if data.get("Response", "True") == "False":
-                raise ValueError(data.get("Error", "Unknown error"))
-            return data
-        except Exception:
-            if attempt == retries - 1:
-                raise
-            # Exponential backoff
-            time.sleep(2 ** attempt)
 
+def _new_client() -> httpx.AsyncClient:
+    # The connection limit is the concurrency bound: extra requests wait for
+    # a pooled keep-alive connection instead of opening new ones.
+    return httpx.AsyncClient(
+        base_url=OMDB_BASE_URL,
+        timeout=httpx.Timeout(OMDB_TIMEOUT, pool=None),
+        limits=httpx.Limits(
+            max_connections=OMDB_CONCURRENCY,
+            max_keepalive_connections=OMDB_CONCURRENCY,
+        ),
+    )
+
+
+_client: Optional[httpx.AsyncClient] = None
+# Concurrent requests for the same id share one OMDb round trip.
+omdb_flight = AsyncSingleFlight()
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+    return _client
 
-def get_info(imdb_id: str) -> dict:
-    """Return movie info from cache or fetch from OMDb."""
-    if imdb_id in _CACHE:
-        return _CACHE[imdb_id]
 
-    data = _fetch_from_api(imdb_id)
-    _CACHE[imdb_id] = data
+async def aclose() -> None:
+    """Close the shared HTTP client (call on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _fetch_from_api(client: httpx.AsyncClient, imdb_id: str) -> dict:
+    """Fetch data from OMDb, retrying transient failures."""
+    params = {"i": imdb_id, "apikey": OMDB_API_KEY or "", "plot": "full"}
+    with span("omdb.fetch", imdb_id=imdb_id) as s:
+        for attempt in range(OMDB_RETRIES):
+            s.set(attempts=attempt + 1)
+            try:
+                response = await client.get("", params=params)
+                response.raise_for_status()
+                data = response.json()
+                s.set(bytes=len(response.content), status=response.status_code)
+                break
+            except (httpx.HTTPError, ValueError) as exc:
+                status = getattr(getattr(exc, "response", None), "status_code", 0)
+                # A bad key or request stays bad; only back off on 429/5xx/network.
+                if attempt == OMDB_RETRIES - 1 or (400 <= status < 500 and status != 429):
+                    raise
+                # Exponential backoff
+                await asyncio.sleep(2**attempt)
+    # OMDb uses `Response":"False"` to indicate errors; retrying won't help
+    if data.get("Response", "True") == "False":
+        raise OMDbError(data.get("Error", "Unknown error"))
     return data
 
 
+async def _lookup(
+    imdb_ids: Iterable[str], client: Optional[httpx.AsyncClient] = None
+) -> Tuple[Dict[str, dict], Dict[str, BaseException]]:
+    ids: List[str] = list(dict.fromkeys(i.strip() for i in imdb_ids if i.strip()))
+    failures: Dict[str, BaseException] = {
+        i: ValueError("invalid IMDb id") for i in ids if not IMDB_ID_RE.match(i)
+    }
+    valid = [i for i in ids if i not in failures]
+
+    cache = get_omdb_cache()
+    results = await asyncio.to_thread(cache.get_many, valid)
+    missing = [i for i in valid if i not in results]
+    if missing:
+        client = client or _get_client()
+        fetched = await asyncio.gather(
+            *(omdb_flight.do(i, lambda i=i: _fetch_from_api(client, i)) for i in missing),
+            return_exceptions=True,
+        )
+        fresh: Dict[str, dict] = {}
+        for imdb_id, outcome in zip(missing, fetched):
+            if isinstance(outcome, BaseException):
+                failures[imdb_id] = outcome
+            else:
+                fresh[imdb_id] = outcome
+        await asyncio.to_thread(cache.put_many, fresh)
+        results.update(fresh)
+    return results, failures
+
+
+async def get_info_many(
+    imdb_ids: Iterable[str], client: Optional[httpx.AsyncClient] = None
+) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """Return ``(results, errors)`` for ``imdb_ids``, each keyed by IMDb id.
+
+    Cached ids are answered from the persistent cache; the rest are fetched
+    concurrently and stored.
+    """
+    results, failures = await _lookup(imdb_ids, client)
+    return results, {i: str(e) or type(e).__name__ for i, e in failures.items()}
+
+
+async def aget_info(imdb_id: str, client: Optional[httpx.AsyncClient] = None) -> dict:
+    """Return movie info for one id.
+
+    Raises ``ValueError`` for a malformed id, ``OMDbError`` when OMDb has no
+    such title and ``httpx.HTTPError`` when OMDb could not be reached.
+    """
+    imdb_id = imdb_id.strip()
+    if not IMDB_ID_RE.match(imdb_id):
+        raise ValueError("invalid IMDb id")
+    results, failures = await _lookup([imdb_id], client)
+    if imdb_id in results:
+        return results[imdb_id]
+    raise failures[imdb_id]
+
+
+def get_info(imdb_id: str) -> dict:
+    """Blocking variant for scripts; not for use inside a running event loop."""
+
+    async def run() -> dict:
+        async with _new_client() as client:
+            return await aget_info(imdb_id, client)
+
+    return asyncio.run(run())
+
+
 if __name__ == "__main__":
     print(get_info("tt1375666"))
@@ -0,0 +1,369 @@
+"""Incremental refresh of the IMDb tables from a newer set of TSV dumps.
+
+Usage::
+
+    python incremental_refresh.py --data-dir ../data/2025-01-02
+    python incremental_refresh.py --tables title_ratings --batch-size 20000
+
+Instead of dropping and reloading, every table is refreshed in five steps:
+
+1. stage   -- the new TSV (plain or ``.tsv.gz``) is streamed into
+              ``<table>__stage`` with ``LOAD DATA LOCAL INFILE``;
+2. diff    -- ``<table>__hash`` keeps an MD5 per live row, so one
+              anti-join finds deleted keys and one hash comparison finds
+              new or changed rows; they go into ``<table>__delta``;
+3. apply   -- the live table and its hashes are copied to ``<table>__new``
+              and ``<table>__hash__new``, and the deltas are applied to the
+              copies in batches of ``--batch-size`` rows, one transaction
+              each, so no transaction holds locks or undo log for a whole
+              table;
+4. publish -- one ``RENAME TABLE`` swaps every changed table and its hashes
+              in at once, as ``db/normalize.sql`` does, so concurrent
+              readers (``Schema.execute_mysql_query``) see either the old or
+              the new dataset, never a mix; ``dataset_version`` is bumped
+              right after, which empties the result caches;
+5. derive  -- ``db/normalize.sql`` and ``db/summaries.sql`` rebuild the
+              derived tables when a table they are built from changed.
+
+A refresh that fails before the rename leaves the live tables untouched;
+running it again starts over from fresh copies.
+
+The first refresh of a table builds its ``__hash`` side table from the
+current contents; ``bulk_load.py`` drops it whenever it reloads a table.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import env  # noqa: F401
+from bulk_load import DEFAULT_DATA_DIR, TABLES, TableSpec
+from db_pool import connect
+from db_scripts import DERIVED_SCRIPTS, run_script
+
+logger = logging.getLogger(__name__)
+
+# Tables each derived-table script reads.
+DERIVED_SOURCES = {
+    "normalize": {"title_basics", "title_crew", "name_basics"},
+    "summaries": {
+        "title_basics", "title_ratings", "title_crew", "title_principals", "name_basics",
+    },
+}
+
+
+@dataclass
+class TableDiff:
+    table: str
+    current: int = 0
+    staged: int = 0
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated + self.deleted
+
+
+def _row_hash(spec: TableSpec, alias: str) -> str:
+    """SQL expression hashing one row; NULL and '' hash differently."""
+    values = ", ".join(f"COALESCE({alias}.{c}, '\\\\N')" for c in spec.columns)
+    return f"UNHEX(MD5(CONCAT_WS(0x1f, {values})))"
+
+
+def _key_join(spec: TableSpec, left: str, right: str) -> str:
+    return " AND ".join(f"{left}.{k} = {right}.{k}" for k in spec.key)
+
+
+@contextmanager
+def _source_file(path: Path) -> Iterator[Path]:
+    """Yield ``path`` or, for a ``.gz`` dump, a decompressed temporary copy."""
+    if path.exists():
+        yield path
+        return
+    gz = path.with_name(path.name + ".gz")
+    with tempfile.TemporaryDirectory(prefix="refresh_") as tmp:
+        plain = Path(tmp) / path.name
+        with gzip.open(gz, "rb") as fin, plain.open("wb") as fout:
+            shutil.copyfileobj(fin, fout, 8 * 1024 * 1024)
+        yield plain
+
+
+class Refresher:
+    def __init__(
+        self,
+        data_dir: Path,
+        tables: List[str],
+        batch_size: int = 50000,
+        max_delete_ratio: float = 0.1,
+    ) -> None:
+        self.data_dir = data_dir
+        self.specs = [TABLES[name] for name in tables]
+        self.batch_size = batch_size
+        # A truncated download would otherwise delete most of a table.
+        self.max_delete_ratio = max_delete_ratio
+
+    @staticmethod
+    def _connect() -> Any:
+        conn = connect(allow_local_infile=True)
+        with conn.cursor() as cur:
+            cur.execute("SET SESSION foreign_key_checks = 0")
+        return conn
+
+    @staticmethod
+    def _execute(conn: Any, sql: str, params: tuple = ()) -> int:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            if cur.with_rows:
+                cur.fetchall()
+            return cur.rowcount
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn: Any) -> Iterator[None]:
+        conn.start_transaction()
+        try:
+            yield
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    @staticmethod
+    def _scalar(conn: Any, sql: str) -> Any:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    # ---------- 1 + 2: stage and diff (per table, in parallel) ----------
+
+    def _ensure_hashes(self, conn: Any, spec: TableSpec) -> None:
+        exists = self._scalar(conn, f"SHOW TABLES LIKE '{spec.name}__hash'")
+        if exists:
+            return
+        logger.info("%s: building row hashes of the current table", spec.name)
+        keys = ", ".join(spec.key)
+        select_keys = ", ".join(f"t.{k}" for k in spec.key)
+        self._execute(
+            conn,
+            f"CREATE TABLE {spec.name}__hash (PRIMARY KEY ({keys})) "
+            f"SELECT {select_keys}, {_row_hash(spec, 't')} AS row_hash "
+            f"FROM {spec.name} t",
+        )
+
+    def _stage(self, conn: Any, spec: TableSpec) -> int:
+        stage = f"{spec.name}__stage"
+        self._execute(conn, f"DROP TABLE IF EXISTS {stage}")
+        self._execute(
+            conn, f"CREATE TABLE {stage} ({spec.ddl}) DEFAULT CHARSET = utf8mb4"
+        )
+        with _source_file(self.data_dir / spec.file) as path:
+            return self._execute(
+                conn,
+                f"LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {stage} "
+                "CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                f"IGNORE 1 LINES ({', '.join(spec.columns)})",
+                (str(path),),
+            )
+
+    def _diff(self, conn: Any, spec: TableSpec) -> None:
+        """Fill ``<table>__delta`` with (seq, op, key): I/U from stage, D from hashes."""
+        delta = f"{spec.name}__delta"
+        first = spec.key[0]
+        s_keys = ", ".join(f"s.{k}" for k in spec.key)
+        h_keys = ", ".join(f"h.{k}" for k in spec.key)
+        self._execute(conn, f"DROP TABLE IF EXISTS {delta}")
+        self._execute(
+            conn,
+            f"CREATE TABLE {delta} (seq INT UNSIGNED AUTO_INCREMENT PRIMARY KEY) "
+            f"SELECT IF(h.{first} IS NULL, 'I', 'U') AS op, {s_keys} "
+            f"FROM {spec.name}__stage s "
+            f"LEFT JOIN {spec.name}__hash h ON {_key_join(spec, 'h', 's')} "
+            f"WHERE h.{first} IS NULL OR h.row_hash <> {_row_hash(spec, 's')} "
+            f"UNION ALL "
+            f"SELECT 'D', {h_keys} "
+            f"FROM {spec.name}__hash h "
+            f"LEFT JOIN {spec.name}__stage s ON {_key_join(spec, 's', 'h')} "
+            f"WHERE s.{first} IS NULL",
+        )
+
+    def _prepare(self, spec: TableSpec) -> TableDiff:
+        diff = TableDiff(spec.name)
+        conn = self._connect()
+        try:
+            started = time.perf_counter()
+            self._ensure_hashes(conn, spec)
+            diff.current = self._scalar(conn, f"SELECT COUNT(*) FROM {spec.name}__hash")
+            diff.seconds["hash"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            diff.staged = self._stage(conn, spec)
+            diff.seconds["stage"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            self._diff(conn, spec)
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT op, COUNT(*) FROM {spec.name}__delta GROUP BY op"
+                )
+                counts = dict(cur.fetchall())
+            diff.inserted = counts.get("I", 0)
+            diff.updated = counts.get("U", 0)
+            diff.deleted = counts.get("D", 0)
+            diff.seconds["diff"] = time.perf_counter() - started
+        finally:
+            conn.close()
+        logger.info(
+            "%s: %d staged, +%d ~%d -%d",
+            spec.name, diff.staged, diff.inserted, diff.updated, diff.deleted,
+        )
+        return diff
+
+    # ---------- 3 + 4: apply to shadow copies, publish with one rename ----------
+
+    def _shadow(self, conn: Any, spec: TableSpec) -> None:
+        """Copy the live table and its hashes to ``__new`` tables for the deltas."""
+        for live in (spec.name, f"{spec.name}__hash"):
+            self._execute(conn, f"DROP TABLE IF EXISTS {live}__new, {live}__old")
+            self._execute(conn, f"CREATE TABLE {live}__new LIKE {live}")
+            self._execute(conn, f"INSERT INTO {live}__new SELECT * FROM {live}")
+
+    def _apply(self, conn: Any, spec: TableSpec) -> None:
+        self._shadow(conn, spec)
+        target = f"{spec.name}__new"
+        hashes = f"{spec.name}__hash__new"
+        delta = f"{spec.name}__delta"
+        stage = f"{spec.name}__stage"
+        columns = ", ".join(spec.columns)
+        s_columns = ", ".join(f"s.{c}" for c in spec.columns)
+        updates = ", ".join(
+            f"{c} = s.{c}" for c in spec.columns if c not in spec.key
+        )
+        s_keys = ", ".join(f"s.{k}" for k in spec.key)
+        last = self._scalar(conn, f"SELECT MAX(seq) FROM {delta}") or 0
+
+        for lo in range(1, last + 1, self.batch_size):
+            hi = lo + self.batch_size - 1
+            window = f"d.seq BETWEEN {lo} AND {hi}"
+            with self._transaction(conn):
+                for table in (target, hashes):
+                    self._execute(
+                        conn,
+                        f"DELETE t FROM {table} t JOIN {delta} d "
+                        f"ON {_key_join(spec, 't', 'd')} WHERE d.op = 'D' AND {window}",
+                    )
+                self._execute(
+                    conn,
+                    f"INSERT INTO {target} ({columns}) "
+                    f"SELECT {s_columns} FROM {stage} s JOIN {delta} d "
+                    f"ON {_key_join(spec, 's', 'd')} WHERE d.op <> 'D' AND {window} "
+                    f"ON DUPLICATE KEY UPDATE {updates}",
+                )
+                self._execute(
+                    conn,
+                    f"INSERT INTO {hashes} ({', '.join(spec.key)}, row_hash) "
+                    f"SELECT {s_keys}, {_row_hash(spec, 's')} FROM {stage} s "
+                    f"JOIN {delta} d ON {_key_join(spec, 's', 'd')} "
+                    f"WHERE d.op <> 'D' AND {window} "
+                    f"ON DUPLICATE KEY UPDATE row_hash = {_row_hash(spec, 's')}",
+                )
+            logger.info("%s: applied delta rows %d-%d of %d", spec.name, lo, min(hi, last), last)
+
+    def _publish(self, conn: Any, specs: List[TableSpec]) -> None:
+        """Swap every ``__new`` copy in with a single, atomic ``RENAME TABLE``."""
+        live = [name for spec in specs for name in (spec.name, f"{spec.name}__hash")]
+        self._execute(
+            conn,
+            "RENAME TABLE "
+            + ", ".join(f"{t} TO {t}__old, {t}__new TO {t}" for t in live),
+        )
+        self._execute(conn, f"DROP TABLE {', '.join(f'{t}__old' for t in live)}")
+        self._execute(
+            conn, "REPLACE INTO dataset_version VALUES (1, CURRENT_TIMESTAMP(6))"
+        )
+
+    def _cleanup(self, conn: Any) -> None:
+        for spec in self.specs:
+            self._execute(
+                conn, f"DROP TABLE IF EXISTS {spec.name}__stage, {spec.name}__delta"
+            )
+
+    # ---------- entry point ----------
+
+    def run(self, workers: int = 4, derive: bool = True) -> List[TableDiff]:
+        with ThreadPoolExecutor(workers, thread_name_prefix="refresh") as pool:
+            diffs = list(pool.map(self._prepare, self.specs))
+        for d in diffs:
+            if d.current and d.deleted > d.current * self.max_delete_ratio:
+                raise RuntimeError(
+                    f"{d.table}: refusing to delete {d.deleted} of {d.current} rows "
+                    f"(more than {self.max_delete_ratio:.0%}); check the dump or "
+                    "raise --max-delete-ratio"
+                )
+
+        conn = self._connect()
+        try:
+            changed = [s for s, d in zip(self.specs, diffs) if d.changed]
+            if changed:
+                started = time.perf_counter()
+                for spec in changed:
+                    self._apply(conn, spec)
+                self._publish(conn, changed)
+                logger.info(
+                    "applied %d changed rows in %.1fs",
+                    sum(d.changed for d in diffs), time.perf_counter() - started,
+                )
+                changed_names = {s.name for s in changed}
+                for script in DERIVED_SCRIPTS if derive else ():
+                    if DERIVED_SOURCES[script] & changed_names:
+                        run_script(script, conn)
+            else:
+                logger.info("no changes")
+            self._cleanup(conn)
+        finally:
+            conn.close()
+        return diffs
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--max-delete-ratio", type=float, default=0.1)
+    parser.add_argument(
+        "--skip-derived", action="store_true", help="do not rebuild the derived tables"
+    )
+    args = parser.parse_args()
+
+    try:
+        results = Refresher(
+            args.data_dir, args.tables, args.batch_size, args.max_delete_ratio
+        ).run(
+            workers=args.workers, derive=not args.skip_derived
+        )
+    except Exception:
+        logger.exception("refresh failed; the live tables are unchanged, re-run to retry")
+        sys.exit(1)
+    print(f"{'table':<18} {'staged':>12} {'insert':>9} {'update':>9} {'delete':>9}")
+    for d in results:
+        print(
+            f"{d.table:<18} {d.staged:>12,} {d.inserted:>9,} {d.updated:>9,} {d.deleted:>9,}"
+        )
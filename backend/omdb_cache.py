@@ -0,0 +1,148 @@
+"""Persistent OMDb response cache shared by every worker process."""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+
+class OMDbCache:
+    """SQLite-backed cache with a TTL and a total size limit.
+
+    Entries expire ``ttl`` seconds after they were fetched.  When the stored
+    JSON exceeds ``max_bytes`` the least recently read entries are dropped
+    until the cache is back under ``low_water`` of the limit.
+    """
+
+    def __init__(
+        self, path: str, ttl: float = 7 * 24 * 3600.0, max_bytes: int = 64 * 1024 * 1024
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.low_water = 0.9
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._conn() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS omdb_info (
+                    imdb_id     TEXT PRIMARY KEY,
+                    body        TEXT NOT NULL,
+                    size        INTEGER NOT NULL,
+                    fetched_at  REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS omdb_info_accessed ON omdb_info (accessed_at)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, imdb_ids: Iterable[str]) -> Dict[str, Any]:
+        """Return the fresh cached entries among ``imdb_ids``."""
+        ids = list(imdb_ids)
+        if not ids:
+            return {}
+        now = time.time()
+        marks = ",".join("?" * len(ids))
+        with self._conn() as db:
+            rows = db.execute(
+                f"SELECT imdb_id, body FROM omdb_info "
+                f"WHERE imdb_id IN ({marks}) AND fetched_at >= ?",
+                (*ids, now - self.ttl),
+            ).fetchall()
+            if rows:
+                db.execute(
+                    f"UPDATE omdb_info SET accessed_at = ? "
+                    f"WHERE imdb_id IN ({','.join('?' * len(rows))})",
+                    (now, *(r[0] for r in rows)),
+                )
+        with self._lock:
+            self.hits += len(rows)
+            self.misses += len(ids) - len(rows)
+        return {imdb_id: json.loads(body) for imdb_id, body in rows}
+
+    def put_many(self, entries: Dict[str, Any]) -> None:
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for imdb_id, value in entries.items():
+            body = json.dumps(value, ensure_ascii=False)
+            rows.append((imdb_id, body, len(body.encode("utf-8")), now, now))
+        with self._conn() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO omdb_info VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._evict(db, now)
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        dropped = db.execute(
+            "DELETE FROM omdb_info WHERE fetched_at < ?", (now - self.ttl,)
+        ).rowcount
+        (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM omdb_info").fetchone()
+        if total > self.max_bytes:
+            target = total - int(self.max_bytes * self.low_water)
+            victims = []
+            for imdb_id, size in db.execute(
+                "SELECT imdb_id, size FROM omdb_info ORDER BY accessed_at"
+            ):
+                victims.append((imdb_id,))
+                target -= size
+                if target <= 0:
+                    break
+            db.executemany("DELETE FROM omdb_info WHERE imdb_id = ?", victims)
+            dropped += len(victims)
+        with self._lock:
+            self.evictions += dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._conn() as db:
+            entries, size = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM omdb_info"
+            ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[OMDbCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_omdb_cache() -> OMDbCache:
+    """Process-wide cache configured from the ``OMDB_CACHE_*`` variables."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OMDbCache(
+                    os.getenv("OMDB_CACHE_PATH", "omdb_cache.sqlite3"),
+                    ttl=float(os.getenv("OMDB_CACHE_TTL", 7 * 24 * 3600)),
+                    max_bytes=int(os.getenv("OMDB_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+                )
+    return _cache
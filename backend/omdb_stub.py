@@ -0,0 +1,110 @@
+"""Local stand-in for the OMDb API, for tests and benchmarks.
+
+Usage::
+
+    python omdb_stub.py --port 8765 --latency 0.2
+    OMDB_BASE_URL=http://127.0.0.1:8765/ uvicorn fastapi_backend:app
+
+``GET /?i=tt...`` answers with a deterministic OMDb-shaped record.  Ids
+made only of zeros (``tt0000000``) answer ``"Response": "False"`` like an
+unknown title, and ``GET /__stats`` reports how many lookups were served.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_record(imdb_id: str) -> Dict[str, Any]:
+    n = int(imdb_id[2:])
+    return {
+        "Title": f"Stub Movie {n}",
+        "Year": str(1950 + n % 70),
+        "Rated": "PG-13",
+        "Runtime": f"{80 + n % 60} min",
+        "Genre": "Drama, Comedy",
+        "Director": f"Director {n % 97}",
+        "Actors": f"Actor {n % 89}, Actor {n % 83}",
+        "Plot": f"Plot of stub movie {n}.",
+        "Country": "United States",
+        "Poster": "N/A",
+        "imdbRating": f"{5 + n % 50 / 10:.1f}",
+        "imdbVotes": f"{n % 100000:,}",
+        "imdbID": imdb_id,
+        "Type": "movie",
+        "Response": "True",
+    }
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0) -> None:
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.lookups = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubServer
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, payload: Dict[str, Any], status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/__stats":
+            self._send({"lookups": self.server.lookups})
+            return
+        imdb_id = parse_qs(url.query).get("i", [""])[0]
+        with self.server.lock:
+            self.server.lookups += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not imdb_id.startswith("tt") or not imdb_id[2:].isdigit():
+            self._send({"Response": "False", "Error": "Incorrect IMDb ID."})
+        elif int(imdb_id[2:]) == 0:
+            self._send({"Response": "False", "Error": "Error getting data."})
+        else:
+            self._send(fake_record(imdb_id))
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_stub(port: int = 0, latency: float = 0.0) -> StubServer:
+    """Serve the stub on a background thread; ``port=0`` picks a free port."""
+    server = StubServer(("127.0.0.1", port), latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per lookup")
+    args = parser.parse_args()
+    server = StubServer(("127.0.0.1", args.port), args.latency)
+    print(f"OMDb stub listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,155 @@
+"""Result cache for model-generated SELECTs, keyed on normalized SQL."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from db_pool import get_pool
+
+
+def _size_of(value: Any) -> int:
+    return len(json.dumps(value, default=str, ensure_ascii=False).encode("utf-8"))
+
+
+class QueryCache:
+    """LRU + TTL cache bounded by the approximate JSON size of its values.
+
+    ``version_fn`` returns a token that changes whenever the dataset is
+    reloaded; it is polled at most every ``version_check`` seconds and a new
+    token empties the cache.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 600.0,
+        max_entry_bytes: Optional[int] = None,
+        version_fn: Optional[Callable[[], Any]] = None,
+        version_check: float = 30.0,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self.version_fn = version_fn
+        self.version_check = version_check
+
+        self._lock = threading.Lock()
+        # key -> (value, size_bytes, expires_at)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._version: Any = None
+        self._version_checked = float("-inf")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _check_version(self) -> None:
+        if self.version_fn is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._version_checked < self.version_check:
+                return
+            self._version_checked = now
+        try:
+            version = self.version_fn()
+        except Exception:
+            return
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self._clear_locked()
+                self._version = version
+
+    def _clear_locked(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        self.invalidations += 1
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return ``(hit, value)``."""
+        self._check_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = _size_of(value)
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Drop every entry, e.g. after the dataset was reloaded."""
+        with self._lock:
+            self._clear_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def dataset_version() -> Any:
+    """``loaded_at`` stamp written by ``db/init.sql`` on every (re)load."""
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT loaded_at FROM dataset_version WHERE id = 1")
+            row = cur.fetchone()
+    return row[0] if row else None
+
+
+_cache: Optional[QueryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    """Process-wide cache, or ``None`` when ``QUERY_CACHE_ENABLED=0``."""
+    global _cache
+    if os.getenv("QUERY_CACHE_ENABLED", "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryCache(
+                    max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+                    ttl=float(os.getenv("QUERY_CACHE_TTL", 600)),
+                    version_fn=dataset_version,
+                    version_check=float(os.getenv("QUERY_CACHE_VERSION_CHECK", 30)),
+                )
+    return _cache
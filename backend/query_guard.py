@@ -0,0 +1,127 @@
+"""Pre-execution cost guard for model-written SQL."""
+
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from sql_text import is_query, tokenize
+
+COST_GUARD_ENABLED = os.getenv("QUERY_COST_GUARD", "1") == "1"
+MAX_ESTIMATED_ROWS = int(os.getenv("QUERY_MAX_ESTIMATED_ROWS", 5_000_000))
+# Largest table a plan may read in full (type ALL or a full index scan).
+# title_ratings (~1.5M rows) may still be scanned, e.g. for "top rated"
+# lists; title_basics (~11M), name_basics and the akas/principals tables may not.
+MAX_SCAN_ROWS = int(os.getenv("QUERY_MAX_SCAN_ROWS", 2_000_000))
+MAX_EXECUTION_MS = int(os.getenv("QUERY_MAX_EXECUTION_MS", 15000))
+
+# MySQL ER_QUERY_TIMEOUT: "maximum statement execution time exceeded"
+ER_QUERY_TIMEOUT = 3024
+
+EXPENSIVE_HINT = (
+    "Make the query cheaper before retrying: filter on indexed keys "
+    "(tconst, nconst, titleId, parentTconst), join from the most selective "
+    "table, avoid leading-wildcard LIKE '%...%' on large tables, and aggregate "
+    "or LIMIT early."
+)
+
+
+class QueryRejected(Exception):
+    """Model SQL that was refused or aborted; reported back as a tool error."""
+
+    def __init__(self, code: str, message: str, **details: Any) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.details = details
+
+    def to_error(self) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, **self.details}
+
+
+def estimate_rows(plan: List[Dict[str, Any]]) -> int:
+    """Rough rows examined: product of per-table estimates within each SELECT,
+    summed over the SELECTs of the statement."""
+    per_select: Dict[Any, int] = {}
+    for step in plan:
+        rows = int(step.get("rows") or 1)
+        per_select[step.get("id")] = per_select.get(step.get("id"), 1) * max(rows, 1)
+    return sum(per_select.values())
+
+
+def check_plan(conn, sql: str) -> None:
+    """EXPLAIN ``sql`` and raise :class:`QueryRejected` when it looks too expensive."""
+    if not COST_GUARD_ENABLED or not is_query(sql):
+        return
+    with conn.cursor(dictionary=True) as cur:
+        cur.execute(f"EXPLAIN {sql}")
+        plan = cur.fetchall()
+
+    estimated = estimate_rows(plan)
+    full_scans = [
+        {"table": step.get("table"), "rows": int(step.get("rows") or 0)}
+        for step in plan
+        if step.get("type") in ("ALL", "index")
+    ]
+    large_scans = [scan for scan in full_scans if scan["rows"] > MAX_SCAN_ROWS]
+    if large_scans:
+        tables = ", ".join(f"{s['table']} (~{s['rows']:,} rows)" for s in large_scans)
+        raise QueryRejected(
+            "too_expensive",
+            f"Query rejected: the plan reads all of {tables} "
+            f"(full scans are limited to {MAX_SCAN_ROWS:,} rows).",
+            estimated_rows=estimated,
+            full_scans=full_scans,
+            hint=EXPENSIVE_HINT,
+        )
+    if estimated > MAX_ESTIMATED_ROWS:
+        raise QueryRejected(
+            "too_expensive",
+            f"Query rejected: the plan examines about {estimated:,} rows "
+            f"(limit {MAX_ESTIMATED_ROWS:,}).",
+            estimated_rows=estimated,
+            full_scans=full_scans,
+            hint=EXPENSIVE_HINT,
+        )
+
+
+@contextmanager
+def execution_timeout(pool, conn, sql: str) -> Iterator[str]:
+    """Limit the run time of ``sql`` to ``MAX_EXECUTION_MS``; yields the statement to run.
+
+    A leading SELECT gets a ``MAX_EXECUTION_TIME`` optimizer hint, which costs
+    nothing extra.  Other statements (``WITH``, ``(SELECT ...) UNION ...``)
+    fall back to the session variable, which is reset on exit so the pooled
+    connection does not keep it; a connection that cannot be reset is
+    dropped from ``pool``.
+    """
+    if MAX_EXECUTION_MS <= 0:
+        yield sql
+        return
+    first = next(tokenize(sql), None)
+    if first is not None and first.text.lower() == "select":
+        end = first.pos + len(first.text)
+        yield f"{sql[:end]} /*+ MAX_EXECUTION_TIME({MAX_EXECUTION_MS}) */{sql[end:]}"
+        return
+    with conn.cursor() as cur:
+        cur.execute("SET SESSION max_execution_time = %s", (MAX_EXECUTION_MS,))
+    try:
+        yield sql
+    finally:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET SESSION max_execution_time = DEFAULT")
+        except Exception:
+            # Closed, or unread rows left behind by an error.
+            pool.invalidate(conn)
+
+
+def timeout_error(err: Exception) -> QueryRejected:
+    """Structured error for a statement killed by ``max_execution_time``."""
+    return QueryRejected(
+        "too_expensive",
+        f"Query aborted after {MAX_EXECUTION_MS} ms (max_execution_time).",
+        mysql_error=str(err),
+        hint=EXPENSIVE_HINT,
+    )
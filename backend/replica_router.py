@@ -0,0 +1,311 @@
+"""Read-replica routing for model-written queries.
+
+``MYSQL_REPLICAS`` lists ``host[:port]`` entries sharing the primary's user,
+password and database.  ``ReplicaRouter.run`` hands each query a connection
+from the healthy replica with the fewest outstanding queries and retries on
+another one when the connection fails; when no replica is usable it falls
+back to the primary pool.  A background thread checks every replica with
+``SELECT loaded_at FROM dataset_version``: a replica that does not answer is
+taken out of rotation, and one whose ``loaded_at`` differs from the
+primary's (still replaying a reload) is held back until it catches up.
+"""
+
+from __future__ import annotations
+
+import functools
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from mysql.connector import errors
+
+from db_pool import ConnectionPool, connect, get_pool
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+REPLICA_QUERIES = registry.counter(
+    "moviegpt_replica_queries_total", "Queries routed per database.", ["replica", "outcome"]
+)
+REPLICA_FAILOVERS = registry.counter(
+    "moviegpt_replica_failovers_total", "Queries retried on another database."
+)
+
+# Connection-level failures: the server is unreachable or dropped the link.
+# SQL errors (ProgrammingError, ...) are the query's fault and are not retried.
+FAILOVER_ERRORS = (errors.InterfaceError, errors.OperationalError, errors.PoolError)
+
+_VERSION_SQL = "SELECT loaded_at FROM dataset_version WHERE id = 1"
+
+
+class Replica:
+    """One read replica: its pool and health state."""
+
+    def __init__(self, name: str, pool: ConnectionPool) -> None:
+        self.name = name
+        self.pool = pool
+        self.outstanding = 0
+        self.healthy = True
+        self.stale = False
+        self.failures = 0  # consecutive
+        self.last_error: Optional[str] = None
+        self.last_check: Optional[float] = None
+        self.queries = 0
+        self.errors = 0
+
+    @property
+    def usable(self) -> bool:
+        return self.healthy and not self.stale
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "stale": self.stale,
+            "outstanding": self.outstanding,
+            "queries": self.queries,
+            "errors": self.errors,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+            "last_check": self.last_check,
+            "pool": self.pool.stats(),
+        }
+
+
+class ReplicaRouter:
+    """Least-outstanding-requests balancing over replicas with failover.
+
+    A replica is taken out of rotation after ``fail_threshold`` consecutive
+    connection failures (queries or health checks) and put back by the next
+    successful check.  ``primary`` serves queries while no replica is
+    usable; without it the failed replicas are tried anyway.
+    """
+
+    def __init__(
+        self,
+        replicas: Dict[str, ConnectionPool],
+        primary: Optional[ConnectionPool] = None,
+        check_interval: float = 5.0,
+        fail_threshold: int = 2,
+    ) -> None:
+        if not replicas:
+            raise ValueError("at least one replica is required")
+        self.replicas = [Replica(name, pool) for name, pool in replicas.items()]
+        self.primary = primary
+        self.check_interval = check_interval
+        self.fail_threshold = fail_threshold
+
+        self._lock = threading.Lock()
+        # Rotates the starting point so ties do not always pick the first replica.
+        self._turn = itertools.count()
+        self._stop = threading.Event()
+        self._checker: Optional[threading.Thread] = None
+        self.primary_queries = 0
+        self.failovers = 0
+
+    # ---------- routing ----------
+
+    def _pick(self, exclude: List[Replica]) -> Optional[Replica]:
+        with self._lock:
+            candidates = [r for r in self.replicas if r not in exclude]
+            usable = [r for r in candidates if r.usable]
+            if not usable:
+                if self.primary is not None or not candidates:
+                    return None
+                # Nothing healthy and no primary to fall back on: try them anyway.
+                usable = candidates
+            start = next(self._turn) % len(usable)
+            rotated = usable[start:] + usable[:start]
+            best = min(rotated, key=lambda r: r.outstanding)
+            best.outstanding += 1
+            return best
+
+    def _done(self, replica: Replica, error: Optional[BaseException]) -> None:
+        with self._lock:
+            replica.outstanding -= 1
+            replica.queries += 1
+            if error is None:
+                replica.failures = 0
+                return
+            replica.errors += 1
+            if not isinstance(error, errors.PoolError):
+                # A busy pool is not a broken server; only real failures count.
+                self._failed(replica, error)
+
+    def _failed(self, replica: Replica, error: BaseException) -> None:
+        replica.failures += 1
+        replica.last_error = str(error)
+        if replica.healthy and replica.failures >= self.fail_threshold:
+            replica.healthy = False
+            logger.warning("replica %s out of rotation: %s", replica.name, error)
+
+    def run(self, fn: Callable[[ConnectionPool, Any], T]) -> T:
+        """Call ``fn(pool, conn)`` on a replica connection, failing over on connection errors."""
+        tried: List[Replica] = []
+        last_error: Optional[BaseException] = None
+        while True:
+            replica = self._pick(tried)
+            if replica is None:
+                break
+            if tried:
+                self._count_failover()
+            try:
+                with replica.pool.connection() as conn:
+                    result = fn(replica.pool, conn)
+            except FAILOVER_ERRORS as exc:
+                self._done(replica, exc)
+                REPLICA_QUERIES.inc(replica=replica.name, outcome="failed")
+                logger.info("query failed on replica %s: %s", replica.name, exc)
+                tried.append(replica)
+                last_error = exc
+                continue
+            except BaseException:
+                self._done(replica, None)
+                REPLICA_QUERIES.inc(replica=replica.name, outcome="error")
+                raise
+            self._done(replica, None)
+            REPLICA_QUERIES.inc(replica=replica.name, outcome="ok")
+            return result
+
+        if self.primary is None:
+            raise last_error or errors.InterfaceError(msg="No database replica is reachable")
+        if tried:
+            self._count_failover()
+        with self._lock:
+            self.primary_queries += 1
+        with self.primary.connection() as conn:
+            result = fn(self.primary, conn)
+        REPLICA_QUERIES.inc(replica="primary", outcome="ok")
+        return result
+
+    def _count_failover(self) -> None:
+        with self._lock:
+            self.failovers += 1
+        REPLICA_FAILOVERS.inc()
+
+    # ---------- health checks ----------
+
+    @staticmethod
+    def _version(pool: ConnectionPool) -> Any:
+        with pool.connection(timeout=2.0) as conn:
+            with conn.cursor() as cur:
+                cur.execute(_VERSION_SQL)
+                row = cur.fetchone()
+        return row[0] if row else None
+
+    def check(self) -> None:
+        """Probe every replica once and update its health."""
+        expected = None
+        if self.primary is not None:
+            try:
+                expected = self._version(self.primary)
+            except Exception:
+                pass  # cannot compare; judge liveness only
+        for replica in self.replicas:
+            try:
+                version = self._version(replica.pool)
+            except Exception as exc:
+                with self._lock:
+                    replica.last_check = time.time()
+                    self._failed(replica, exc)
+                continue
+            with self._lock:
+                replica.last_check = time.time()
+                replica.failures = 0
+                if not replica.healthy:
+                    logger.info("replica %s back in rotation", replica.name)
+                replica.healthy = True
+                stale = expected is not None and version != expected
+                if stale != replica.stale:
+                    state = "is behind the primary" if stale else "caught up"
+                    logger.info("replica %s %s", replica.name, state)
+                replica.stale = stale
+
+    def _check_loop(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("replica health check failed")
+
+    def start(self) -> None:
+        """Start the background health checks (``check_interval <= 0`` disables them)."""
+        if self.check_interval <= 0 or self._checker is not None:
+            return
+        self._checker = threading.Thread(
+            target=self._check_loop, name="replica-health", daemon=True
+        )
+        self._checker.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "replicas": {r.name: r.stats() for r in self.replicas},
+                "usable": sum(1 for r in self.replicas if r.usable),
+                "primary_queries": self.primary_queries,
+                "failovers": self.failovers,
+            }
+
+
+def _parse_replicas(spec: str) -> Dict[str, Dict[str, Any]]:
+    """``"db2:3306,db3"`` -> ``{"db2:3306": {"host": "db2", "port": 3306}, ...}``"""
+    replicas = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        host, _, port = entry.partition(":")
+        replicas[entry] = {"host": host, "port": int(port or 3306)}
+    return replicas
+
+
+def _router_from_env() -> Optional[ReplicaRouter]:
+    spec = _parse_replicas(os.getenv("MYSQL_REPLICAS", ""))
+    if not spec:
+        return None
+    size = int(os.getenv("MYSQL_REPLICA_POOL_SIZE", os.getenv("MYSQL_POOL_SIZE", 5)))
+    return ReplicaRouter(
+        {
+            name: ConnectionPool(functools.partial(connect, **params), size=size)
+            for name, params in spec.items()
+        },
+        primary=get_pool() if os.getenv("REPLICA_FALLBACK_PRIMARY", "1") == "1" else None,
+        check_interval=float(os.getenv("REPLICA_CHECK_INTERVAL", 5)),
+        fail_threshold=int(os.getenv("REPLICA_FAIL_THRESHOLD", 2)),
+    )
+
+
+_router: Optional[ReplicaRouter] = None
+_router_lock = threading.Lock()
+_router_loaded = False
+
+
+def get_replica_router() -> Optional[ReplicaRouter]:
+    """Process-wide router, or ``None`` when ``MYSQL_REPLICAS`` is empty."""
+    global _router, _router_loaded
+    if not _router_loaded:
+        with _router_lock:
+            if not _router_loaded:
+                _router = _router_from_env()
+                if _router is not None:
+                    _router.start()
+                _router_loaded = True
+    return _router
+
+
+def install_replica_router(router: Optional[ReplicaRouter]) -> None:
+    """Replace the process-wide router, e.g. with local stand-ins for benchmarks."""
+    global _router, _router_loaded
+    with _router_lock:
+        old, _router = _router, router
+        _router_loaded = True
+    if old is not None:
+        old.close()
+    if router is not None:
+        router.start()
@@ -0,0 +1,106 @@
+"""Keep tool results sent back to Gemini within a token budget."""
+
+from __future__ import annotations
+
+import json
+import os
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+# Rough size heuristic: ~4 characters of JSON per token.
+CHARS_PER_TOKEN = 4
+TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", 4000))
+STALE_TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("STALE_TOOL_RESULT_TOKEN_BUDGET", 500))
+
+
+def estimate_tokens(obj: Any) -> int:
+    return len(json.dumps(obj, ensure_ascii=False, default=str)) // CHARS_PER_TOKEN + 1
+
+
+def _column_stats(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    stats: Dict[str, Dict[str, Any]] = {}
+    for col in rows[0]:
+        values = [r.get(col) for r in rows]
+        present = [v for v in values if v is not None]
+        info: Dict[str, Any] = {"nulls": len(values) - len(present)}
+        numbers = [
+            v for v in present if isinstance(v, (int, float)) and not isinstance(v, bool)
+        ]
+        if numbers and len(numbers) == len(present):
+            info.update(
+                min=min(numbers),
+                max=max(numbers),
+                mean=round(sum(numbers) / len(numbers), 3),
+            )
+        else:
+            counts = Counter(str(v) for v in present)
+            info["distinct"] = len(counts)
+            if len(counts) < len(present):
+                info["most_common"] = counts.most_common(3)
+        stats[col] = info
+    return stats
+
+
+def compact_rows(rows: List[Dict[str, Any]], budget: int) -> Dict[str, Any]:
+    """Fit ``rows`` into about ``budget`` tokens.
+
+    Small results are returned whole as ``{"rows": rows}``. Larger ones keep
+    the leading rows that fit (the model's ORDER BY decides which rows matter)
+    plus per-column statistics over the full result under ``"summary"``.
+    """
+    if not rows or estimate_tokens(rows) <= budget:
+        return {"rows": rows}
+
+    summary = {"row_count": len(rows), "columns": _column_stats(rows)}
+    remaining = budget - estimate_tokens(summary)
+    shown: List[Dict[str, Any]] = []
+    for row in rows:
+        cost = estimate_tokens(row)
+        if cost > remaining:
+            break
+        shown.append(row)
+        remaining -= cost
+    summary["rows_shown"] = len(shown)
+    return {"rows": shown, "summary": summary}
+
+
+def compact_stale_results(messages: List[types.Content]) -> None:
+    """Shrink the tool payloads already in ``messages`` to the stale budget.
+
+    Called before a new tool result is appended, so only the newest result
+    travels at full size on the following model rounds.
+    """
+    from google.genai import types
+
+    for i, content in enumerate(messages):
+        if content.role != "tool" or not content.parts:
+            continue
+        parts = []
+        changed = False
+        for part in content.parts:
+            fr = part.function_response
+            response = fr.response if fr else None
+            if not response or "rows" not in response or response.get("stale"):
+                parts.append(part)
+                continue
+            compacted = compact_rows(response["rows"], STALE_TOOL_RESULT_TOKEN_BUDGET)
+            if "summary" in response:
+                # Statistics of the full result beat those of the rows shown.
+                compacted["summary"] = {
+                    **response["summary"],
+                    "rows_shown": len(compacted["rows"]),
+                }
+            parts.append(
+                types.Part(
+                    function_response=types.FunctionResponse(
+                        name=fr.name,
+                        response={**response, **compacted, "stale": True},
+                    )
+                )
+            )
+            changed = True
+        if changed:
+            messages[i] = types.Content(role=content.role, parts=parts)
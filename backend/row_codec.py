@@ -0,0 +1,138 @@
+"""Convert database rows to JSON-ready values once, and encode them fast.
+
+``RowConverter`` looks at the cursor description once and converts only the
+columns whose type needs it (DECIMAL → float, DATE/DATETIME → ISO text,
+TIME → text, binary strings → UTF-8 text or hex), so a fetched result is
+JSON-serialisable as it comes off the cursor and is never walked again.
+
+``dumps`` uses orjson when it is installed (``pip install orjson``) and the
+standard library otherwise.
+"""
+
+from __future__ import annotations
+
+import datetime
+import decimal
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from mysql.connector import FieldType
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def _isoformat(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value
+
+
+def _text(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:  # hashes and other raw bytes
+            return value.hex()
+    return value
+
+
+def _set(value: Any) -> Any:
+    return sorted(value) if isinstance(value, (set, frozenset)) else _text(value)
+
+
+_BY_FIELD_TYPE: Dict[int, Callable[[Any], Any]] = {
+    FieldType.DECIMAL: float,
+    FieldType.NEWDECIMAL: float,
+    FieldType.DATE: _isoformat,
+    FieldType.NEWDATE: _isoformat,
+    FieldType.DATETIME: _isoformat,
+    FieldType.TIMESTAMP: _isoformat,
+    FieldType.TIME: str,  # a timedelta
+    FieldType.SET: _set,
+}
+_STRING_TYPES = frozenset(
+    (
+        FieldType.VARCHAR,
+        FieldType.VAR_STRING,
+        FieldType.STRING,
+        FieldType.ENUM,
+        FieldType.JSON,
+        FieldType.TINY_BLOB,
+        FieldType.MEDIUM_BLOB,
+        FieldType.LONG_BLOB,
+        FieldType.BLOB,
+    )
+)
+BINARY_CHARSET = 63
+
+
+def _converter_for(column: Sequence[Any]) -> Optional[Callable[[Any], Any]]:
+    type_code = column[1]
+    if type_code in _STRING_TYPES:
+        # Only binary-charset columns come back as bytes; text is already str.
+        charset = column[8] if len(column) > 8 else BINARY_CHARSET
+        return _text if charset == BINARY_CHARSET else None
+    return _BY_FIELD_TYPE.get(type_code)
+
+
+def to_jsonable(value: Any) -> Any:
+    """Fallback for values that did not come through a ``RowConverter``."""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return _text(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class RowConverter:
+    """Build JSON-ready row dicts from the tuples of a non-dictionary cursor."""
+
+    def __init__(self, description: Optional[Sequence[Sequence[Any]]]) -> None:
+        description = description or ()
+        self.columns: List[str] = [col[0] for col in description]
+        self._converters = [
+            (i, fn)
+            for i, col in enumerate(description)
+            if (fn := _converter_for(col)) is not None
+        ]
+
+    def __call__(self, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        columns = self.columns
+        if not self._converters:
+            return [dict(zip(columns, row)) for row in rows]
+        converters = self._converters
+        out = []
+        for row in rows:
+            values = list(row)
+            for i, fn in converters:
+                value = values[i]
+                if value is not None:
+                    values[i] = fn(value)
+            out.append(dict(zip(columns, values)))
+        return out
+
+
+if orjson is not None:
+
+    def dumps(obj: Any) -> bytes:
+        """Serialise ``obj`` to compact UTF-8 JSON."""
+        return orjson.dumps(obj, default=to_jsonable, option=orjson.OPT_NON_STR_KEYS)
+
+else:
+    _encoder = json.JSONEncoder(
+        ensure_ascii=False,
+        check_circular=False,
+        separators=(",", ":"),
+        default=to_jsonable,
+    )
+
+    def dumps(obj: Any) -> bytes:
+        """Serialise ``obj`` to compact UTF-8 JSON."""
+        return _encoder.encode(obj).encode("utf-8")
@@ -0,0 +1,258 @@
+"""Table/column overview embedded in the system prompt.
+
+Loaded lazily: from memory, else from a JSON cache file written by an
+earlier run, else from ``information_schema`` in one query.  The server can
+therefore start (and reuse the last known schema) while MySQL is still
+coming up.  A cached overview is checked against a fingerprint of the live
+columns as soon as the database answers and re-read when they differ, so
+migrations are picked up without a restart; ``refresh()`` forces a re-read.
+``tables()`` exposes the same schema as a table → columns map for the SQL
+guard.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendered format changes so old cache files are ignored.
+FORMAT_VERSION = 3
+
+# Seconds between attempts to check a cached overview while MySQL is down.
+VERIFY_RETRY = float(os.getenv("SCHEMA_VERIFY_RETRY", 30))
+
+_SCHEMA_SQL = """
+SELECT t.TABLE_NAME, t.TABLE_COMMENT, c.COLUMN_NAME, c.COLUMN_TYPE
+FROM information_schema.tables t
+JOIN information_schema.columns c
+  ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+WHERE t.TABLE_SCHEMA = %s
+ORDER BY t.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+_COLUMNS_SQL = """
+SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE
+FROM information_schema.columns
+WHERE TABLE_SCHEMA = %s
+ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _fingerprint(columns) -> str:
+    """Digest of ``(table, column, type)`` rows in table and ordinal order."""
+    return _digest(
+        "\n".join(
+            f"{table}.{column} {column_type}"
+            for table, column, column_type in columns
+            # Skip the *__new / *__old / *__stage tables of an in-progress rebuild.
+            if "__" not in table
+        )
+    )
+
+
+def fetch_fingerprint() -> str:
+    """Fingerprint of the live columns; far cheaper than :func:`fetch_overview`."""
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(_COLUMNS_SQL, (conn.database,))
+            return _fingerprint(cur.fetchall())
+
+
+def fetch_overview() -> tuple[str, str, Dict[str, List[str]], str]:
+    """Return ``(overview, database, {table: columns}, fingerprint)`` read from
+    ``information_schema``."""
+    with get_pool().connection() as conn:
+        database = conn.database
+        with conn.cursor() as cur:
+            cur.execute(_SCHEMA_SQL, (database,))
+            rows = cur.fetchall()
+
+    tables: Dict[str, tuple[str, list[str]]] = {}
+    for table, comment, column, column_type in rows:
+        # Skip the *__new / *__old / *__stage tables of an in-progress rebuild.
+        if "__" in table:
+            continue
+        tables.setdefault(table, (comment, []))[1].append(f"{column} {column_type}")
+
+    lines = []
+    columns_by_table: Dict[str, List[str]] = {}
+    for table, (comment, columns) in tables.items():
+        columns_by_table[table] = [c.split(" ", 1)[0] for c in columns]
+        lines.append(f"- {table}: {', '.join(columns)}")
+        if comment:
+            # Summary tables describe their columns in the comment.
+            lines.append(f"  ({comment})")
+    fingerprint = _fingerprint((table, column, type_) for table, _, column, type_ in rows)
+    return "\n".join(lines), database, columns_by_table, fingerprint
+
+
+class SchemaOverview:
+    def __init__(self, cache_path: Optional[str]) -> None:
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._lock = threading.Lock()
+        self._text: Optional[str] = None
+        self._tables: Dict[str, List[str]] = {}
+        self.digest: Optional[str] = None
+        self.source: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        # Fingerprint of the columns the overview was built from; a cached
+        # overview stays unverified until it was compared with the database.
+        self._fingerprint: Optional[str] = None
+        self._verified = False
+        self._verify_attempt = float("-inf")
+
+    def _read_cache(self) -> Optional[tuple[str, Dict[str, List[str]], Optional[str]]]:
+        if self.cache_path is None:
+            return None
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        text = data.get("overview")
+        tables = data.get("tables")
+        if (
+            data.get("format") != FORMAT_VERSION
+            or data.get("database") != os.getenv("MYSQL_DB")
+            or not isinstance(text, str)
+            or not isinstance(tables, dict)
+            or data.get("sha256") != _digest(text)
+        ):
+            logger.info("schema cache %s is stale or corrupt, ignoring", self.cache_path)
+            return None
+        return text, tables, data.get("fingerprint")
+
+    def _write_cache(
+        self, text: str, database: str, tables: Dict[str, List[str]], fingerprint: str
+    ) -> None:
+        if self.cache_path is None:
+            return
+        payload = {
+            "format": FORMAT_VERSION,
+            "database": database,
+            "sha256": _digest(text),
+            "fingerprint": fingerprint,
+            "fetched_at": time.time(),
+            "overview": text,
+            "tables": tables,
+        }
+        tmp = self.cache_path.with_suffix(self.cache_path.suffix + ".tmp")
+        try:
+            tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            logger.warning("could not write schema cache %s", self.cache_path)
+
+    def get(self) -> str:
+        """The overview, loading it on first use."""
+        self._ensure()
+        return self._text  # type: ignore[return-value]
+
+    def tables(self) -> Dict[str, List[str]]:
+        """Column names per table, loading the schema on first use."""
+        self._ensure()
+        return self._tables
+
+    def _ensure(self) -> None:
+        if self._text is None:
+            self._load()
+        elif not self._verified and time.monotonic() - self._verify_attempt >= VERIFY_RETRY:
+            # Other callers keep using the cached overview meanwhile.
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._verify_locked()
+                finally:
+                    self._lock.release()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._text is None:
+                cached = self._read_cache()
+                if cached is None:
+                    self._refresh_locked()
+                    return
+                text, tables, fingerprint = cached
+                self._set(text, tables, "cache")
+                self._fingerprint = fingerprint
+                self._verify_locked()
+
+    def _verify_locked(self) -> None:
+        """Re-read a cached overview if the live columns no longer match it."""
+        if self._verified:
+            return
+        self._verify_attempt = time.monotonic()
+        try:
+            live = fetch_fingerprint()
+        except Exception as exc:
+            logger.info("cannot check schema cache against the database yet: %s", exc)
+            return
+        if live == self._fingerprint:
+            self._verified = True
+            return
+        logger.info("schema changed since %s was written, re-reading", self.cache_path)
+        try:
+            self._refresh_locked()
+        except Exception:
+            logger.warning("could not re-read the schema", exc_info=True)
+
+    def refresh(self) -> bool:
+        """Re-read ``information_schema``; return ``True`` if the overview changed."""
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> bool:
+        text, database, tables, fingerprint = fetch_overview()
+        changed = self.digest != _digest(text)
+        self._set(text, tables, "database")
+        self._fingerprint = fingerprint
+        self._verified = True
+        self._write_cache(text, database, tables, fingerprint)
+        return changed
+
+    def _set(self, text: str, tables: Dict[str, List[str]], source: str) -> None:
+        # _text last: readers only look at the others once it is set.
+        self._tables = tables
+        self.digest = _digest(text)
+        self._text = text
+        self.source = source
+        self.loaded_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        text = self._text
+        return {
+            "loaded": text is not None,
+            "source": self.source,
+            "tables": sum(1 for line in (text or "").splitlines() if line.startswith("- ")),
+            "sha256": self.digest[:12] if self.digest else None,
+            "verified": self._verified,
+            "loaded_at": self.loaded_at,
+        }
+
+
+_overview: Optional[SchemaOverview] = None
+_overview_lock = threading.Lock()
+
+
+def get_schema_overview() -> SchemaOverview:
+    """Process-wide instance; ``SCHEMA_CACHE_PATH=""`` disables the cache file."""
+    global _overview
+    if _overview is None:
+        with _overview_lock:
+            if _overview is None:
+                _overview = SchemaOverview(
+                    os.getenv("SCHEMA_CACHE_PATH", "schema_overview.json")
+                )
+    return _overview
@@ -0,0 +1,248 @@
+"""Per-session conversation storage with pluggable backends."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# A turn is {"role": "user" | "model", "text": str}
+Turn = Dict[str, str]
+
+DEFAULT_SESSION = "default"
+
+
+def _turn_bytes(turn: Turn) -> int:
+    return len(turn["text"].encode("utf-8")) + len(turn["role"])
+
+
+class SessionStore(ABC):
+    """Keeps the last ``max_turns`` turns of each session for ``ttl`` seconds."""
+
+    def __init__(self, max_turns: int = 20, ttl: float = 3600.0) -> None:
+        self.max_turns = max_turns
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, session_id: str) -> List[Turn]:
+        """Return the stored turns of a session, oldest first."""
+
+    @abstractmethod
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        """Add turns to a session, dropping the oldest beyond ``max_turns``."""
+
+    @abstractmethod
+    def clear(self, session_id: str) -> None:
+        """Forget a session."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Session count and memory accounting."""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store; sessions expire after ``ttl`` seconds of inactivity.
+
+    ``max_sessions`` and ``max_bytes`` bound the whole store; the least
+    recently used sessions are evicted first when either is exceeded.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 20,
+        ttl: float = 3600.0,
+        max_sessions: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        super().__init__(max_turns, ttl)
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # session_id -> (turns, size_bytes, last_access)
+        self._sessions: "OrderedDict[str, tuple[List[Turn], int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._evicted = 0
+
+    def _drop(self, session_id: str) -> None:
+        _, size, _ = self._sessions.pop(session_id)
+        self._bytes -= size
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            session_id, (_, _, last) = next(iter(self._sessions.items()))
+            if now - last <= self.ttl:
+                break
+            self._drop(session_id)
+            self._evicted += 1
+
+    def get(self, session_id: str) -> List[Turn]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            turns, size, _ = entry
+            self._sessions[session_id] = (turns, size, now)
+            self._sessions.move_to_end(session_id)
+            return list(turns)
+
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            stored, size, _ = self._sessions.pop(session_id, ([], 0, now))
+            self._bytes -= size
+            stored = stored + list(turns)
+            size += sum(_turn_bytes(t) for t in turns)
+            while len(stored) > self.max_turns:
+                size -= _turn_bytes(stored.pop(0))
+            self._sessions[session_id] = (stored, size, now)
+            self._bytes += size
+            while self._sessions and (
+                len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._sessions))
+                if oldest == session_id:
+                    break
+                self._drop(oldest)
+                self._evicted += 1
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "evicted": self._evicted,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """File-backed store so several worker processes share conversations."""
+
+    def __init__(self, path: str, max_turns: int = 20, ttl: float = 3600.0) -> None:
+        super().__init__(max_turns, ttl)
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_turns (
+                    session_id TEXT NOT NULL,
+                    seq        INTEGER NOT NULL,
+                    role       TEXT NOT NULL,
+                    text       TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                )
+                """
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS session_turns_updated "
+                "ON session_turns (updated_at)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def _expire(self, db: sqlite3.Connection) -> None:
+        # Every turn of a session carries the session's last activity time.
+        db.execute(
+            "DELETE FROM session_turns WHERE updated_at < ?", (time.time() - self.ttl,)
+        )
+
+    def get(self, session_id: str) -> List[Turn]:
+        with self._conn() as db:
+            self._expire(db)
+            rows = db.execute(
+                "SELECT role, text FROM session_turns WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+            db.execute(
+                "UPDATE session_turns SET updated_at = ? WHERE session_id = ?",
+                (time.time(), session_id),
+            )
+        return [{"role": role, "text": text} for role, text in rows]
+
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        now = time.time()
+        with self._conn() as db:
+            # Take the write lock before reading MAX(seq): a concurrent
+            # append from another worker would otherwise reuse the same seq.
+            db.execute("BEGIN IMMEDIATE")
+            self._expire(db)
+            (last_seq,) = db.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM session_turns WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            db.executemany(
+                "INSERT INTO session_turns VALUES (?, ?, ?, ?, ?)",
+                [
+                    (session_id, last_seq + i, t["role"], t["text"], now)
+                    for i, t in enumerate(turns, 1)
+                ],
+            )
+            db.execute(
+                "UPDATE session_turns SET updated_at = ? WHERE session_id = ?",
+                (now, session_id),
+            )
+            db.execute(
+                "DELETE FROM session_turns WHERE session_id = ? AND seq <= ?",
+                (session_id, last_seq + len(turns) - self.max_turns),
+            )
+
+    def clear(self, session_id: str) -> None:
+        with self._conn() as db:
+            db.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._conn() as db:
+            sessions, size = db.execute(
+                "SELECT COUNT(DISTINCT session_id), "
+                "COALESCE(SUM(LENGTH(CAST(text AS BLOB)) + LENGTH(role)), 0) "
+                "FROM session_turns"
+            ).fetchone()
+        return {"backend": "sqlite", "sessions": sessions, "bytes": size}
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide store selected by ``SESSION_BACKEND``."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                max_turns = int(os.getenv("SESSION_MAX_TURNS", 20))
+                ttl = float(os.getenv("SESSION_TTL", 3600))
+                if os.getenv("SESSION_BACKEND", "memory") == "sqlite":
+                    _store = SQLiteSessionStore(
+                        os.getenv("SESSION_DB_PATH", "sessions.sqlite3"),
+                        max_turns=max_turns,
+                        ttl=ttl,
+                    )
+                else:
+                    _store = MemorySessionStore(
+                        max_turns=max_turns,
+                        ttl=ttl,
+                        max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", 1000)),
+                        max_bytes=int(os.getenv("SESSION_MAX_BYTES", 64 * 1024 * 1024)),
+                    )
+    return _store
@@ -0,0 +1,111 @@
+"""Request coalescing: concurrent identical calls share one execution."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.in_flight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": self.in_flight,
+                "coalesced_rate": round(self.coalesced / self.calls, 3)
+                if self.calls
+                else 0.0,
+            }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(_Stats):
+    """Thread version: the first caller for ``key`` runs ``fn``, the others
+    block until it finishes and receive the same result or exception."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                self.in_flight += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as exc:
+                call.error = exc
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    self.in_flight -= 1
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AsyncSingleFlight(_Stats):
+    """asyncio version: the work runs as one task that every caller awaits.
+
+    Callers are shielded from each other, so a cancelled request does not
+    cancel the lookup the remaining callers are waiting for.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._tasks[key] = task
+                self.executions += 1
+                self.in_flight += 1
+                task.add_done_callback(lambda t, key=key: self._finished(key, t))
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        with self._lock:
+            self._tasks.pop(key, None)
+            self.in_flight -= 1
+        # Every caller may have gone away; don't log the error as unretrieved.
+        if not task.cancelled():
+            task.exception()
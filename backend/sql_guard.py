@@ -0,0 +1,515 @@
+"""Local read-only check and schema validation of model-written SQL.
+
+``SQLGuard.validate`` runs before any database contact.  It tokenizes the
+statement, refuses anything but one SELECT (``WITH ... SELECT`` and
+parenthesised queries included) and checks table and column names against
+the schema overview, raising :class:`QueryRejected` with close matches the
+model can retry with.  Verdicts are cached per query shape (the statement
+with its literals stripped) and schema digest, so a repeated shape is not
+walked again.
+
+Name checks are conservative: unqualified columns are only checked when
+every table of the statement is a real one (no CTEs, derived tables or
+``information_schema``), and anything the walk cannot classify is left to
+MySQL.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from query_guard import QueryRejected
+from schema_overview import get_schema_overview
+from sql_text import KEYWORDS, Token, tokenize
+from tracing import span
+
+SQL_GUARD_ENABLED = os.getenv("SQL_GUARD", "1") == "1"
+
+# Schemas the model may read besides the application database.
+SYSTEM_SCHEMAS = frozenset({"information_schema"})
+
+UNSAFE_FUNCTIONS = frozenset(
+    """
+    benchmark get_lock is_free_lock is_used_lock load_file master_pos_wait
+    release_all_locks release_lock sleep source_pos_wait
+    """.split()
+)
+
+# Never column names: the tokenizer's keywords plus type, unit, charset and
+# clause words that show up inside expressions.
+_NON_COLUMNS = KEYWORDS | frozenset(
+    """
+    against binary boolean char character charset collate current
+    current_time current_user day day_hour day_minute day_second distinctrow
+    dual escape except expansion first following force high_priority hour
+    ignore index intersect into key language last localtime localtimestamp
+    lock microsecond minute mode month preceding quarter query range rollup
+    row rows second separator share signed some sql_big_result sql_buffer_result
+    sql_calc_found_rows sql_no_cache sql_small_result unbounded unknown
+    unsigned use week window within year_month
+    """.split()
+)
+
+# End the table list of the FROM clause at the same depth.
+_FROM_END = frozenset(
+    "where group having order limit union except intersect window for lock into".split()
+)
+
+# A word after these names something other than a column.
+_NAME_PREFIXES = frozenset({"as", "over", "window", "collate", "set", "charset", "using"})
+
+_QUERY_START = ("select", "with")
+
+
+def _lower(tok: Optional[Token]) -> str:
+    return tok.text.lower() if tok is not None and tok.kind == "word" else (tok.text if tok else "")
+
+
+def _identifier(tok: Optional[Token]) -> Optional[str]:
+    """The name ``tok`` spells if it can be a table, column or alias."""
+    if tok is None:
+        return None
+    if tok.kind == "quoted":
+        return tok.text[1:-1].replace("``", "`")
+    if tok.kind == "word" and tok.text[0] not in "@$" and tok.text.lower() not in _NON_COLUMNS:
+        return tok.text
+    return None
+
+
+def _skip_parens(tokens: List[Token], i: int) -> int:
+    """Index just past the parenthesis that closes the one at ``tokens[i]``."""
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j].text == "(":
+            depth += 1
+        elif tokens[j].text == ")":
+            depth -= 1
+            if depth == 0:
+                return j + 1
+    return len(tokens)
+
+
+def fingerprint(tokens: List[Token]) -> bytes:
+    """Digest of the query shape: keywords upper-cased, literals replaced by ``?``."""
+    parts = []
+    for kind, text, _ in tokens:
+        if kind in ("string", "number"):
+            text = "?"
+        elif kind == "word" and text.lower() in KEYWORDS:
+            text = text.upper()
+        parts.append(text)
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).digest()
+
+
+# ---------- statement shape ----------
+
+
+def _with_clause(tokens: List[Token], i: int) -> List[str]:
+    """CTE names of the ``WITH`` at ``tokens[i]``; the main statement must be a SELECT."""
+    n = len(tokens)
+    j = i + 1
+    if _lower(tokens[j] if j < n else None) == "recursive":
+        j += 1
+    names = []
+    while True:
+        name = _identifier(tokens[j]) if j < n else None
+        if name is None:
+            raise QueryRejected("syntax_error", "Expected a CTE name after WITH.")
+        names.append(name)
+        j += 1
+        if j < n and tokens[j].text == "(":
+            j = _skip_parens(tokens, j)
+        if j + 1 >= n or _lower(tokens[j]) != "as" or tokens[j + 1].text != "(":
+            raise QueryRejected("syntax_error", f"Expected AS (...) after the CTE name {name}.")
+        j = _skip_parens(tokens, j + 1)
+        if j < n and tokens[j].text == ",":
+            j += 1
+            continue
+        break
+    if j >= n or _lower(tokens[j]) not in ("select", "("):
+        raise QueryRejected(
+            "not_read_only",
+            "WITH must be followed by a SELECT; only read-only queries are allowed.",
+        )
+    return names
+
+
+def check_shape(tokens: List[Token]) -> None:
+    """Raise unless ``tokens`` are exactly one read-only SELECT."""
+    if not tokens:
+        raise QueryRejected("syntax_error", "Empty query.")
+    if any(tok.kind == "executable" for tok in tokens):
+        raise QueryRejected(
+            "not_read_only",
+            "MySQL executable comments (/*! ... */) are not allowed; write the SQL plainly.",
+        )
+    if any(tok.text == ";" for tok in tokens):
+        raise QueryRejected(
+            "multiple_statements",
+            "Only one statement per call is allowed; send each query separately.",
+        )
+    first = _lower(tokens[0])
+    if first not in ("select", "with", "("):
+        raise QueryRejected(
+            "not_read_only",
+            f"Only SELECT queries are allowed, not {tokens[0].text.upper()}.",
+        )
+    if first == "with":
+        _with_clause(tokens, 0)
+
+    depth = 0
+    for i, tok in enumerate(tokens):
+        if tok.text == "(":
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+            if depth < 0:
+                raise QueryRejected("syntax_error", "Unbalanced parentheses.")
+        if tok.kind != "word":
+            continue
+        word = tok.text.lower()
+        nxt = _lower(tokens[i + 1]) if i + 1 < len(tokens) else ""
+        if word == "into":
+            raise QueryRejected("not_read_only", "SELECT ... INTO is not allowed.")
+        if (word == "for" and nxt in ("update", "share")) or (word == "lock" and nxt == "in"):
+            raise QueryRejected(
+                "not_read_only", "Locking reads (FOR UPDATE / FOR SHARE) are not allowed."
+            )
+        if word in UNSAFE_FUNCTIONS and nxt == "(":
+            raise QueryRejected(
+                "unsafe_function", f"The function {word.upper()}() is not allowed."
+            )
+    if depth:
+        raise QueryRejected("syntax_error", "Unbalanced parentheses.")
+
+
+# ---------- table and column names ----------
+
+
+class _Names:
+    """Tables, aliases and CTEs referenced anywhere in one statement."""
+
+    def __init__(self) -> None:
+        # (schema, table, alias) per FROM/JOIN entry
+        self.refs: List[Tuple[Optional[str], str, Optional[str]]] = []
+        self.ctes: Set[str] = set()
+        # Aliases of derived tables and table functions.
+        self.virtual_aliases: Set[str] = set()
+        self.virtual = False
+        # Token indices that are table names or table aliases.
+        self.consumed: Set[int] = set()
+
+    def walk(self, tokens: List[Token]) -> None:
+        n = len(tokens)
+        depth = 0
+        query = {0: True}  # depth -> the parentheses hold a query
+        in_from: Dict[int, bool] = {}
+        alias_after: Set[int] = set()  # depths whose ")" closes a derived table
+        expect = False
+        i = 0
+        while i < n:
+            tok = tokens[i]
+            low = _lower(tok)
+            if expect:
+                expect = False
+                if low == "lateral":
+                    i += 1
+                    continue
+                if low == "(":
+                    depth += 1
+                    query[depth] = True
+                    if _lower(tokens[i + 1] if i + 1 < n else None) in _QUERY_START:
+                        alias_after.add(depth)
+                        self.virtual = True
+                    else:
+                        # Parenthesised join: another table list.
+                        in_from[depth] = True
+                        expect = True
+                    i += 1
+                    continue
+                i = self._table(tokens, i)
+                continue
+
+            if low == "(":
+                depth += 1
+                query[depth] = _lower(tokens[i + 1] if i + 1 < n else None) in _QUERY_START
+            elif low == ")":
+                in_from.pop(depth, None)
+                if depth in alias_after:
+                    alias_after.discard(depth)
+                    depth -= 1
+                    i = self._alias(tokens, i + 1, virtual=True)
+                    continue
+                depth -= 1
+            elif low == "with" and (i == 0 or tokens[i - 1].text == "("):
+                self.ctes.update(_with_clause(tokens, i))
+            elif query.get(depth) and low == "from":
+                in_from[depth] = True
+                expect = True
+            elif query.get(depth) and low in ("join", "straight_join"):
+                expect = True
+            elif low == "," and in_from.get(depth):
+                expect = True
+            elif low == "select" or low in _FROM_END:
+                in_from.pop(depth, None)
+            i += 1
+
+    def _table(self, tokens: List[Token], i: int) -> int:
+        n = len(tokens)
+        name = _identifier(tokens[i])
+        if name is None:
+            return i  # not a name; MySQL reports it
+        if i + 1 < n and tokens[i + 1].text == "(":
+            # Table function such as JSON_TABLE(...)
+            self.virtual = True
+            return self._alias(tokens, _skip_parens(tokens, i + 1), virtual=True)
+        schema = None
+        self.consumed.add(i)
+        j = i + 1
+        if j + 1 < n and tokens[j].text == "." and _identifier(tokens[j + 1]) is not None:
+            schema, name = name, _identifier(tokens[j + 1])  # type: ignore[assignment]
+            self.consumed.add(j + 1)
+            j += 2
+        alias_at = j + 1 if _lower(tokens[j] if j < n else None) == "as" else j
+        alias = _identifier(tokens[alias_at]) if alias_at < n else None
+        if alias is not None:
+            self.consumed.add(alias_at)
+            j = alias_at + 1
+        self.refs.append((schema, name, alias))
+        # Index hints: USE / FORCE / IGNORE INDEX (...)
+        while j < n and _lower(tokens[j]) in ("use", "force", "ignore"):
+            while j < n and tokens[j].text != "(":
+                j += 1
+            j = _skip_parens(tokens, j)
+        return j
+
+    def _alias(self, tokens: List[Token], j: int, virtual: bool) -> int:
+        n = len(tokens)
+        if _lower(tokens[j] if j < n else None) == "as":
+            j += 1
+        alias = _identifier(tokens[j]) if j < n else None
+        if alias is None:
+            return j
+        self.consumed.add(j)
+        if virtual:
+            self.virtual_aliases.add(alias.lower())
+        return j + 1
+
+
+def _suggest(name: str, choices: List[str]) -> List[str]:
+    exact = [c for c in choices if c.lower() == name.lower() and c != name]
+    close = difflib.get_close_matches(name.lower(), [c.lower() for c in choices], n=3, cutoff=0.6)
+    by_lower = {c.lower(): c for c in choices}
+    return list(dict.fromkeys(exact + [by_lower[c] for c in close]))
+
+
+def _has_column(schema: Dict[str, List[str]], table: str, column: str) -> bool:
+    column = column.lower()
+    return any(c.lower() == column for c in schema[table])
+
+
+def _column_error(message: str, column: str, schema: Dict[str, List[str]], tables: List[str]):
+    available = [c for t in tables for c in schema[t]]
+    return QueryRejected(
+        "unknown_column",
+        message,
+        suggestions=_suggest(column, available),
+        available_columns={t: schema[t] for t in tables},
+        found_in=sorted(t for t in schema if _has_column(schema, t, column)),
+    )
+
+
+def check_names(tokens: List[Token], schema: Dict[str, List[str]]) -> None:
+    """Raise when a table or column of ``tokens`` does not exist in ``schema``."""
+    names = _Names()
+    names.walk(tokens)
+    database = os.getenv("MYSQL_DB")
+
+    # alias or table name (lower) -> schema table, or None when its columns are unknown
+    scope: Dict[str, Optional[str]] = {a: None for a in names.virtual_aliases}
+    ctes = {c.lower() for c in names.ctes}
+    tables: Set[str] = set()
+    for table_schema, table, alias in names.refs:
+        resolved: Optional[str] = None
+        if table_schema is not None and table_schema.lower() in SYSTEM_SCHEMAS:
+            names.virtual = True
+        elif table_schema is not None and table_schema != database:
+            raise QueryRejected(
+                "unknown_table",
+                f"Unknown database {table_schema}; query the tables listed in the schema.",
+            )
+        elif table_schema is None and table.lower() in ctes:
+            names.virtual = True
+        elif table in schema:
+            resolved = table
+            tables.add(table)
+        else:
+            raise QueryRejected(
+                "unknown_table",
+                f"Unknown table {table}.",
+                suggestions=_suggest(table, list(schema)),
+                hint="Table names are case-sensitive; use the names from the schema.",
+            )
+        scope[table.lower()] = resolved
+        if alias is not None:
+            scope[alias.lower()] = resolved
+
+    n = len(tokens)
+    output_names: Set[str] = set()
+    candidates: List[str] = []
+    for i, tok in enumerate(tokens):
+        name = _identifier(tok)
+        if name is None or i in names.consumed:
+            continue
+        prev = tokens[i - 1] if i else None
+        nxt = tokens[i + 1] if i + 1 < n else None
+        if nxt is not None and (nxt.text == "(" or nxt.kind == "string"):
+            continue  # function call, or a literal prefix like _utf8mb4'...' / X'...'
+        if prev is not None and prev.text == ".":
+            continue
+        if nxt is not None and nxt.text == ".":
+            column = tokens[i + 2] if i + 2 < n else None
+            if (
+                column is None
+                or _identifier(column) is None
+                or (i + 3 < n and tokens[i + 3].text in (".", "("))
+            ):
+                continue  # q.*, db.table.column or db.function()
+            _check_qualified(name, _identifier(column), scope, schema)  # type: ignore[arg-type]
+            continue
+        if prev is not None and _lower(prev) in _NAME_PREFIXES:
+            output_names.add(name.lower())
+        elif prev is not None and (
+            prev.kind in ("number", "string")
+            or prev.text == ")"
+            or (_identifier(prev) is not None and i - 1 not in names.consumed)
+        ):
+            # Implicit alias: "SELECT primaryTitle title"
+            output_names.add(name.lower())
+        else:
+            candidates.append(name)
+
+    if names.virtual or not names.refs:
+        return
+    in_scope = sorted(tables)
+    for name in candidates:
+        if name.lower() in output_names or any(_has_column(schema, t, name) for t in in_scope):
+            continue
+        raise _column_error(
+            f"Unknown column {name} in {', '.join(in_scope)}.", name, schema, in_scope
+        )
+
+
+def _check_qualified(
+    qualifier: str, column: str, scope: Dict[str, Optional[str]], schema: Dict[str, List[str]]
+) -> None:
+    key = qualifier.lower()
+    if key not in scope:
+        raise QueryRejected(
+            "unknown_column",
+            f"Unknown table or alias {qualifier} in {qualifier}.{column}.",
+            suggestions=_suggest(qualifier, list(scope)),
+        )
+    table = scope[key]
+    if table is None or _has_column(schema, table, column):
+        return
+    raise _column_error(f"Unknown column {qualifier}.{column}.", column, schema, [table])
+
+
+# ---------- cached validator ----------
+
+
+class SQLGuard:
+    """Validates model SQL, caching the verdict per query shape and schema digest."""
+
+    def __init__(self, max_entries: int = 2048) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (fingerprint, schema digest) -> None when valid, else (code, message, details)
+        self._verdicts: "OrderedDict[Tuple[bytes, str], Optional[tuple]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rejected: Dict[str, int] = {}
+
+    def validate(self, sql: str) -> None:
+        """Raise :class:`QueryRejected` unless ``sql`` is one valid read-only SELECT."""
+        overview = get_schema_overview()
+        try:
+            schema, digest = overview.tables(), overview.digest
+        except Exception:
+            # Schema unavailable: check the shape only and let MySQL judge the names.
+            schema, digest = {}, None
+
+        with span("sql.guard") as s:
+            tokens = list(tokenize(sql))
+            while tokens and tokens[-1].text == ";":
+                tokens.pop()
+            key = (fingerprint(tokens), digest or "")
+            with self._lock:
+                cached = key in self._verdicts
+                if cached:
+                    self._verdicts.move_to_end(key)
+                    verdict = self._verdicts[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            s.set(cached=cached)
+
+            if not cached:
+                verdict = None
+                try:
+                    check_shape(tokens)
+                    if schema:
+                        check_names(tokens, schema)
+                except QueryRejected as rej:
+                    verdict = (rej.code, rej.message, rej.details)
+                if digest is not None:
+                    self._store(key, verdict)
+
+            if verdict is not None:
+                code, message, details = verdict
+                with self._lock:
+                    self.rejected[code] = self.rejected.get(code, 0) + 1
+                s.set(rejected=code)
+                # A fresh exception each time: re-raising a cached one grows its traceback.
+                raise QueryRejected(code, message, **details)
+
+    def _store(self, key: Tuple[bytes, str], verdict: Optional[tuple]) -> None:
+        with self._lock:
+            self._verdicts[key] = verdict
+            self._verdicts.move_to_end(key)
+            while len(self._verdicts) > self.max_entries:
+                self._verdicts.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._verdicts),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "rejected": dict(self.rejected),
+            }
+
+
+_guard: Optional[SQLGuard] = None
+_guard_lock = threading.Lock()
+
+
+def get_sql_guard() -> Optional[SQLGuard]:
+    """Process-wide guard, or ``None`` when ``SQL_GUARD=0``."""
+    global _guard
+    if not SQL_GUARD_ENABLED:
+        return None
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = SQLGuard(int(os.getenv("SQL_GUARD_CACHE_SIZE", 2048)))
+    return _guard
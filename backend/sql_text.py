@@ -0,0 +1,129 @@
+"""Lightweight MySQL tokenizer and canonical query text."""
+
+from __future__ import annotations
+
+import re
+from typing import Iterator, List, NamedTuple
+
+# Reserved words and common function names that MySQL treats case-insensitively.
+# Everything else is left as written, because table names are case-sensitive
+# on Linux servers.
+KEYWORDS = frozenset(
+    """
+    all and any as asc avg between by case cast coalesce concat count cross
+    current_date current_timestamp date desc distinct div else end exists
+    false for from full group group_concat having if ifnull in inner interval
+    is join lateral left like limit lower max min mod natural not null nullif
+    offset on or order outer over partition recursive regexp right rlike round
+    row_number rank dense_rank select straight_join substring sum then true
+    union upper using when where with xor year
+    """.split()
+)
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<space>\s+)
+  | (?P<executable>/\*!.*?\*/)
+  | (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<quoted>`(?:[^`]|``)*`)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)
+  | (?P<word>[A-Za-z_@$][\w$]*)
+  | (?P<op><=>|<>|!=|<=|>=|:=|\|\||&&|->>|->)
+  | (?P<punct>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+class Token(NamedTuple):
+    kind: str  # string | quoted | number | word | op | punct | executable
+    text: str
+    pos: int
+
+
+def tokenize(sql: str) -> Iterator[Token]:
+    """Yield significant tokens; whitespace and comments are skipped.
+
+    MySQL runs the text of ``/*! ... */`` comments, so those are yielded whole
+    as ``executable`` tokens; ``/*+ ... */`` optimizer hints are skipped.
+    """
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        yield Token(kind, match.group(), match.start())  # type: ignore[arg-type]
+
+
+def canonical_tokens(sql: str) -> List[str]:
+    """Tokens in canonical spelling.
+
+    Keywords are upper-cased, plain double-quoted strings are re-quoted with
+    single quotes, integer literals lose leading zeros and trailing
+    semicolons are dropped.
+    """
+    out: List[str] = []
+    for kind, text, _ in tokenize(sql):
+        if kind == "word" and text.lower() in KEYWORDS:
+            text = text.upper()
+        elif kind == "string" and text[0] == '"':
+            body = text[1:-1]
+            # Escapes are left alone: MySQL keeps the backslash in '\%' and '\_'.
+            if not any(c in body for c in "'\\\""):
+                text = f"'{body}'"
+        elif kind == "number" and text.isdigit():
+            text = str(int(text))
+        out.append(text)
+    while out and out[-1] == ";":
+        out.pop()
+    return out
+
+
+def normalize_sql(sql: str) -> str:
+    """Canonical text of ``sql``: equal for queries that differ only in
+    whitespace, comments, keyword case or literal quoting."""
+    return " ".join(canonical_tokens(sql))
+
+
+def is_query(sql: str) -> bool:
+    """Whether ``sql`` starts like a SELECT (``SELECT``, ``WITH`` or ``(``)."""
+    first = next(tokenize(sql), None)
+    return first is not None and first.text.lower() in ("select", "with", "(")
+
+
+def cap_limit(sql: str, cap: int) -> str:
+    """Make the outermost statement return at most ``cap`` rows.
+
+    An existing top-level ``LIMIT`` larger than ``cap`` is lowered, a missing
+    one is appended. Statements that are not queries (``SHOW``, ``DESCRIBE``,
+    ...) are returned unchanged.
+    """
+    tokens = list(tokenize(sql))
+    while tokens and tokens[-1].text == ";":
+        sql = sql[: tokens.pop().pos]
+    if not is_query(sql):
+        return sql
+
+    depth = 0
+    limit_at = None
+    for i, tok in enumerate(tokens):
+        if tok.text == "(":
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+        elif depth == 0 and tok.kind == "word" and tok.text.lower() == "limit":
+            limit_at = i
+
+    if limit_at is None:
+        # Newline first, in case the statement ends with a "--" comment.
+        return f"{sql.rstrip()}\nLIMIT {cap}"
+
+    # LIMIT count | LIMIT offset, count | LIMIT count OFFSET offset
+    rest = tokens[limit_at + 1 :]
+    count = rest[2] if len(rest) >= 3 and rest[1].text == "," else rest[0] if rest else None
+    if count is None or count.kind != "number" or not count.text.isdigit():
+        return sql
+    if int(count.text) <= cap:
+        return sql
+    end = count.pos + len(count.text)
+    return f"{sql[: count.pos]}{cap}{sql[end:]}"
@@ -0,0 +1,277 @@
+"""Small IMDb-shaped SQLite database that stands in for MySQL offline.
+
+Usage::
+
+    python sqlite_fixture.py fixture.sqlite3 --titles 20000
+
+``build_fixture`` generates deterministic data for the core tables plus the
+``title_genre``, ``title_director`` and ``title_popularity`` derived tables
+and ``dataset_version``.  ``SQLiteConnection`` wraps one SQLite connection
+in the subset of the mysql-connector API the backend uses (``%s`` and
+``%(name)s`` parameters, dictionary cursors, ``fetchmany``), so
+``ConnectionPool(lambda: SQLiteConnection(path))`` can replace the MySQL
+pool.  ``SET`` statements are ignored, ``EXPLAIN`` answers with a cheap
+plan and ``information_schema`` reads are answered from the SQLite catalog.
+Queries must stick to SQL that both databases understand.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+GENRES = (
+    "Drama", "Comedy", "Action", "Thriller", "Romance", "Horror",
+    "Documentary", "Crime", "Adventure", "Animation", "Sci-Fi", "Family",
+)
+TITLE_TYPES = ("movie", "movie", "movie", "tvSeries", "short", "tvMovie")
+_WORDS = (
+    "Night", "River", "Empire", "Last", "Silent", "Golden", "Star", "Dream",
+    "Shadow", "City", "Love", "War", "Secret", "Journey", "Storm", "Light",
+)
+_FIRST = ("Anna", "James", "Li", "Maria", "David", "Yuki", "Omar", "Sofia", "Chen", "Paul")
+_LAST = ("Smith", "Wang", "Garcia", "Kim", "Müller", "Rossi", "Sato", "Brown", "Novak", "Ali")
+
+_SCHEMA = """
+CREATE TABLE title_basics (
+  tconst TEXT PRIMARY KEY, titleType TEXT, primaryTitle TEXT, originalTitle TEXT,
+  isAdult INTEGER, startYear INTEGER, endYear INTEGER, runtimeMinutes INTEGER, genres TEXT
+);
+CREATE TABLE title_ratings (tconst TEXT PRIMARY KEY, averageRating REAL, numVotes INTEGER);
+CREATE TABLE name_basics (
+  nconst TEXT PRIMARY KEY, primaryName TEXT, birthYear INTEGER, deathYear INTEGER,
+  primaryProfession TEXT, knownForTitles TEXT
+);
+CREATE TABLE title_principals (
+  tconst TEXT, ordering INTEGER, nconst TEXT, category TEXT, job TEXT, characters TEXT,
+  PRIMARY KEY (tconst, ordering)
+);
+CREATE INDEX title_principals_nconst ON title_principals (nconst);
+CREATE TABLE title_genre (tconst TEXT, genre TEXT, PRIMARY KEY (tconst, genre));
+CREATE INDEX title_genre_genre ON title_genre (genre);
+CREATE TABLE title_director (tconst TEXT, nconst TEXT, PRIMARY KEY (tconst, nconst));
+CREATE INDEX title_director_nconst ON title_director (nconst);
+CREATE TABLE title_popularity (
+  tconst TEXT PRIMARY KEY, titleType TEXT, primaryTitle TEXT, startYear INTEGER,
+  averageRating REAL, numVotes INTEGER, popularity_rank INTEGER, type_rank INTEGER
+);
+CREATE INDEX title_popularity_rank ON title_popularity (popularity_rank);
+CREATE INDEX title_basics_year ON title_basics (startYear);
+CREATE TABLE dataset_version (id INTEGER PRIMARY KEY, loaded_at TEXT);
+"""
+
+
+def tconst(n: int) -> str:
+    return f"tt{n:07d}"
+
+
+def nconst(n: int) -> str:
+    return f"nm{n:07d}"
+
+
+def build_fixture(
+    path: Path | str, titles: int = 20_000, people: int = 5_000, seed: int = 7
+) -> Path:
+    """(Re)create the fixture database at ``path``."""
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    rng = random.Random(seed)
+    db = sqlite3.connect(path)
+    db.executescript(_SCHEMA)
+
+    names = [
+        (
+            nconst(i),
+            f"{rng.choice(_FIRST)} {rng.choice(_LAST)} {i}",
+            rng.randint(1920, 2000),
+            None,
+            rng.choice(("actor", "actress", "director", "writer,director")),
+            "",
+        )
+        for i in range(1, people + 1)
+    ]
+    db.executemany("INSERT INTO name_basics VALUES (?,?,?,?,?,?)", names)
+
+    basics, ratings, principals, genre_rows, directors = [], [], [], [], []
+    for i in range(1, titles + 1):
+        genres = rng.sample(GENRES, rng.randint(1, 3))
+        title = " ".join(rng.sample(_WORDS, rng.randint(1, 3))) + f" {i}"
+        basics.append(
+            (
+                tconst(i), rng.choice(TITLE_TYPES), title, title, 0,
+                rng.randint(1950, 2024), None, rng.randint(70, 180), ",".join(genres),
+            )
+        )
+        genre_rows.extend((tconst(i), g) for g in genres)
+        if rng.random() < 0.8:
+            # Vote counts are heavy-tailed like the real data.
+            votes = int(rng.paretovariate(1.2) * 50)
+            ratings.append((tconst(i), round(rng.uniform(2.0, 9.5), 1), votes))
+        director = rng.randint(1, people)
+        directors.append((tconst(i), nconst(director)))
+        principals.append((tconst(i), 1, nconst(director), "director", None, None))
+        for ordering, person in enumerate(rng.sample(range(1, people + 1), 3), start=2):
+            principals.append(
+                (tconst(i), ordering, nconst(person), "actor", None, f'["Role {ordering}"]')
+            )
+    db.executemany("INSERT INTO title_basics VALUES (?,?,?,?,?,?,?,?,?)", basics)
+    db.executemany("INSERT INTO title_ratings VALUES (?,?,?)", ratings)
+    db.executemany("INSERT INTO title_principals VALUES (?,?,?,?,?,?)", principals)
+    db.executemany("INSERT INTO title_genre VALUES (?,?)", genre_rows)
+    db.executemany("INSERT INTO title_director VALUES (?,?)", directors)
+
+    # Same definition as db/summaries.sql, without window functions.
+    rows = db.execute(
+        "SELECT b.tconst, b.titleType, b.primaryTitle, b.startYear, r.averageRating, "
+        "COALESCE(r.numVotes, 0) AS votes FROM title_basics b "
+        "LEFT JOIN title_ratings r ON r.tconst = b.tconst ORDER BY votes DESC, b.tconst"
+    ).fetchall()
+    type_seen: Dict[str, int] = {}
+    popularity = []
+    for rank, (tc, ttype, title, year, rating, votes) in enumerate(rows, start=1):
+        type_seen[ttype] = type_seen.get(ttype, 0) + 1
+        popularity.append((tc, ttype, title, year, rating, votes, rank, type_seen[ttype]))
+    db.executemany("INSERT INTO title_popularity VALUES (?,?,?,?,?,?,?,?)", popularity)
+    db.execute(
+        "INSERT INTO dataset_version VALUES (1, ?)",
+        (time.strftime("%Y-%m-%d %H:%M:%S"),),
+    )
+    db.commit()
+    db.close()
+    return path
+
+
+# ---------- mysql-connector shaped adapter ----------
+
+_NAMED_PARAM = re.compile(r"%\((\w+)\)s")
+# EXPLAIN always reports a cheap plan; the cost guard is not exercised here.
+_EXPLAIN_COLUMNS = ["id", "select_type", "table", "type", "rows"]
+_EXPLAIN_ROW = (1, "SIMPLE", None, "ref", 1)
+
+
+class SQLiteCursor:
+    def __init__(self, conn: "SQLiteConnection", dictionary: bool = False) -> None:
+        self._cur = conn._db.cursor()
+        self._dictionary = dictionary
+        self._rows: Optional[List[tuple]] = None
+        self.description: Optional[Sequence[Sequence[Any]]] = None
+        self.rowcount = -1
+
+    def execute(self, sql: str, params: Any = None) -> None:
+        head = sql.lstrip()[:20].upper()
+        self._rows = None
+        if head.startswith("SET "):
+            self.description = None
+            return
+        if head.startswith("EXPLAIN"):
+            self._fake_result(_EXPLAIN_COLUMNS, [_EXPLAIN_ROW])
+            return
+        if "information_schema" in sql:
+            self._information_schema()
+            return
+        if isinstance(params, dict):
+            sql = _NAMED_PARAM.sub(r":\1", sql)
+        else:
+            sql = sql.replace("%s", "?")
+        self._cur.execute(sql, params or ())
+        self.description = self._cur.description
+        self.rowcount = self._cur.rowcount
+
+    def _fake_result(self, columns: List[str], rows: List[tuple]) -> None:
+        self.description = [(c, None, None, None, None, None, None) for c in columns]
+        self._rows = rows
+
+    def _information_schema(self) -> None:
+        # Only the schema overview query (tables JOIN columns) is supported.
+        tables = [
+            r[0]
+            for r in self._cur.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+            )
+        ]
+        rows = []
+        for table in tables:
+            for col in self._cur.execute(f'PRAGMA table_info("{table}")').fetchall():
+                rows.append((table, "", col[1], (col[2] or "text").lower()))
+        self._fake_result(["TABLE_NAME", "TABLE_COMMENT", "COLUMN_NAME", "COLUMN_TYPE"], rows)
+
+    def _shape(self, rows: List[tuple]) -> List[Any]:
+        if not self._dictionary or not self.description:
+            return rows
+        columns = [d[0] for d in self.description]
+        return [dict(zip(columns, r)) for r in rows]
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        if self._rows is not None:
+            batch, self._rows = self._rows[:size], self._rows[size:]
+        else:
+            batch = self._cur.fetchmany(size)
+        return self._shape(batch)
+
+    def fetchall(self) -> List[Any]:
+        if self._rows is not None:
+            batch, self._rows = self._rows, []
+        else:
+            batch = self._cur.fetchall()
+        return self._shape(batch)
+
+    def fetchone(self) -> Any:
+        batch = self.fetchmany(1)
+        return batch[0] if batch else None
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.fetchall())
+
+    def close(self) -> None:
+        self._cur.close()
+
+    def __enter__(self) -> "SQLiteCursor":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class SQLiteConnection:
+    """One SQLite connection behaving enough like a mysql-connector one."""
+
+    database = "imdb"
+
+    def __init__(self, path: Path | str) -> None:
+        # The pool hands a connection to one thread at a time.
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self.autocommit = True
+
+    def cursor(self, dictionary: bool = False, **_: Any) -> SQLiteCursor:
+        return SQLiteCursor(self, dictionary)
+
+    def is_connected(self) -> bool:
+        return True
+
+    def ping(self, reconnect: bool = False, **_: Any) -> None:
+        pass
+
+    def commit(self) -> None:
+        self._db.commit()
+
+    def rollback(self) -> None:
+        self._db.rollback()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--titles", type=int, default=20_000)
+    parser.add_argument("--people", type=int, default=5_000)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    build_fixture(args.path, args.titles, args.people)
+    print(f"wrote {args.path} in {time.perf_counter() - started:.1f}s")
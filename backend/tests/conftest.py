@@ -0,0 +1,7 @@
+"""The backend modules import each other as top-level modules (``import
+db_pool``), the way ``uvicorn`` and the bench scripts run them."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
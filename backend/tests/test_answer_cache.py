@@ -0,0 +1,84 @@
+import pytest
+
+from answer_cache import Answer, AnswerCache, normalize_question
+
+
+def answer(text, rows=None):
+    rows = rows if rows is not None else [{"primaryTitle": text}]
+    return Answer(text, "SELECT 1", rows, [{"sql": "SELECT 1", "data": rows}])
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("Please list the top 10 movies of 1994.", "list top 10 movies of 1994"),
+        ("Hey, could you list the top movies of 1994?", "List the top movies of 1994"),
+        ("请问1994年有哪些好电影？", "1994年有哪些好电影"),
+        ("1994年有哪些好电影呢", "1994年有哪些好电影"),
+    ],
+)
+def test_rewordings_share_a_key(a, b):
+    assert normalize_question(a) == normalize_question(b)
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("What is the top movie of 1994?", "List the top movies of 1994"),
+        ("top movie of 1994", "top movies of 1994"),
+        ("电影《可以》", "电影"),
+        ("有什么电影", "有电影"),
+    ],
+)
+def test_different_questions_keep_different_keys(a, b):
+    assert normalize_question(a) != normalize_question(b)
+
+
+@pytest.mark.parametrize(
+    "cached, asked",
+    [
+        ("top movies directed by Nolan", "top movies not directed by Nolan"),
+        ("top movies with Tom Hanks", "top movies without Tom Hanks"),
+        ("best rated movies of 1994", "worst rated movies of 1994"),
+        ("movies released before 1990", "movies released after 1990"),
+        ("movies of 1994", "movies of 1995"),
+        ("诺兰导演的电影", "不是诺兰导演的电影"),
+        ("评分最高的科幻电影", "评分最低的科幻电影"),
+    ],
+)
+def test_similar_questions_with_other_anchors_miss(cached, asked):
+    cache = AnswerCache(similarity=0.5)
+    cache.put(cached, answer(cached))
+    assert cache.get(asked) is None
+
+
+def test_similar_rewording_hits():
+    cache = AnswerCache(similarity=0.85)
+    cache.put("top rated movies directed by Christopher Nolan", answer("nolan"))
+    hit = cache.get("top rated movie directed by Christopher Nolan")
+    assert hit is not None and hit.text == "nolan"
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_hits_return_independent_copies():
+    cache = AnswerCache()
+    original = answer("x")
+    cache.put("top movies of 1994", original)
+    original.data.append({"primaryTitle": "added after put"})
+
+    first = cache.get("top movies of 1994")
+    first.data.clear()
+    first.results[0]["data"].clear()
+
+    second = cache.get("top movies of 1994")
+    assert second.data == [{"primaryTitle": "x"}]
+    assert second.results[0]["data"] == [{"primaryTitle": "x"}]
+
+
+def test_exact_hit_and_miss_counts():
+    cache = AnswerCache()
+    cache.put("top movies of 1994", answer("x"))
+    assert cache.get("Top movies of 1994?").text == "x"
+    assert cache.get("top movies of 1995") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["similar_hits"]) == (1, 1, 0)
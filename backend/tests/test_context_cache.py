@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+import Schema
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = 0
+        self.deleted = []
+        self.fail = False
+
+    def create(self, model, config):
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        self.created += 1
+        return SimpleNamespace(name=f"cachedContents/{self.created}")
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    caches = FakeCaches()
+    monkeypatch.setattr(Schema, "client", SimpleNamespace(caches=caches))
+    monkeypatch.setattr(Schema, "CONTEXT_CACHE_ENABLED", True)
+    monkeypatch.setattr(Schema, "_get_system_instruction", lambda: "prompt")
+    return caches
+
+
+@pytest.mark.parametrize("ttl", [30, 60, 3600])
+def test_cached_config_is_reused_within_its_ttl(caches, monkeypatch, ttl):
+    monkeypatch.setattr(Schema, "CONTEXT_CACHE_TTL", ttl)
+    config = Schema._BaseConfig()
+    first = config.build()
+    assert first.cached_content == "cachedContents/1"
+    assert config.current() is first
+    assert config.build() is first
+    assert caches.created == 1
+
+
+def test_failed_rebuild_deletes_the_previous_cache(caches):
+    config = Schema._BaseConfig()
+    config.build()
+    config.invalidate()
+    caches.fail = True
+    fallback = config.build()
+    assert fallback.cached_content is None and fallback.system_instruction == "prompt"
+    assert caches.deleted == ["cachedContents/1"]
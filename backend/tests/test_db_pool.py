@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+from mysql.connector import errors
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, n):
+        self.n = n
+        self.closed = False
+        self.alive = True
+
+    def is_connected(self):
+        return self.alive
+
+    def close(self):
+        self.closed = True
+
+
+class Factory:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self):
+        conn = FakeConnection(len(self.opened))
+        self.opened.append(conn)
+        return conn
+
+
+def test_reuses_idle_connections():
+    factory = Factory()
+    pool = ConnectionPool(factory, size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(factory.opened) == 1
+    assert pool.stats()["handshakes"] == 1
+
+
+def test_acquire_times_out_when_exhausted():
+    pool = ConnectionPool(Factory(), size=1)
+    conn = pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+    assert isinstance(PoolTimeout(), errors.PoolError)
+    assert pool.stats()["timeouts"] == 1
+    pool.release(conn)
+    assert pool.acquire(timeout=0.05) is conn
+
+
+def test_waiter_gets_released_connection():
+    pool = ConnectionPool(Factory(), size=1)
+    conn = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=2)))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(conn)
+    waiter.join()
+    assert got == [conn]
+
+
+def test_recycles_old_connections():
+    factory = Factory()
+    pool = ConnectionPool(factory, size=1, recycle=0.0)
+    with pool.connection() as first:
+        pass
+    time.sleep(0.01)
+    with pool.connection() as second:
+        pass
+    assert first is not second and first.closed
+    assert pool.stats()["recycled"] == 1
+
+
+def test_pings_idle_connections_and_replaces_dead_ones():
+    factory = Factory()
+    pool = ConnectionPool(factory, size=1, ping_after=0.0)
+    with pool.connection() as first:
+        pass
+    first.alive = False
+    time.sleep(0.01)
+    with pool.connection() as second:
+        pass
+    assert second is not first and first.closed
+
+
+def test_invalidated_and_broken_connections_are_not_reused():
+    factory = Factory()
+    pool = ConnectionPool(factory, size=1)
+    with pool.connection() as conn:
+        pool.invalidate(conn)
+    assert conn.closed
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.alive = False
+            raise RuntimeError("query failed")
+    assert conn.closed
+    assert pool.stats()["in_use"] == 0
+
+
+def test_failed_open_frees_the_slot():
+    def factory():
+        raise errors.InterfaceError(msg="unreachable")
+
+    pool = ConnectionPool(factory, size=1)
+    with pytest.raises(errors.InterfaceError):
+        pool.acquire()
+    assert pool.stats()["in_use"] == 0
+
+
+def test_closed_pool_refuses_acquires():
+    pool = ConnectionPool(Factory(), size=1)
+    with pool.connection() as conn:
+        pass
+    pool.close()
+    assert conn.closed
+    with pytest.raises(errors.PoolError):
+        pool.acquire()
@@ -0,0 +1,92 @@
+import re
+from pathlib import Path
+
+import incremental_refresh
+from incremental_refresh import Refresher, TableDiff
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.with_rows = False
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.conn.log.append(" ".join(sql.split()))
+        self.with_rows = sql.startswith("SELECT")
+
+    def fetchone(self):
+        return (3,)  # MAX(seq): two batches of two
+
+
+class FakeConnection:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def start_transaction(self):
+        self.log.append("BEGIN")
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def close(self):
+        pass
+
+
+def run_refresh(monkeypatch, diffs):
+    conn = FakeConnection()
+    refresher = Refresher(Path("."), [d.table for d in diffs], batch_size=2)
+    by_name = {d.table: d for d in diffs}
+    monkeypatch.setattr(refresher, "_prepare", lambda spec: by_name[spec.name])
+    monkeypatch.setattr(refresher, "_connect", lambda: conn)
+    monkeypatch.setattr(incremental_refresh, "run_script", lambda *a: None)
+    refresher.run(workers=1, derive=False)
+    return conn.log
+
+
+def writes_to(statement, table):
+    return re.match(rf"(DELETE t FROM|INSERT INTO) {table}\b(?!__)", statement)
+
+
+def test_deltas_go_to_shadow_tables_and_are_published_by_one_rename(monkeypatch):
+    log = run_refresh(
+        monkeypatch,
+        [
+            TableDiff("title_basics", current=10, updated=2),
+            TableDiff("title_ratings", current=10, inserted=1),
+            TableDiff("title_crew", current=10),
+        ],
+    )
+    renames = [i for i, sql in enumerate(log) if sql.startswith("RENAME TABLE")]
+    assert len(renames) == 1
+    rename = log[renames[0]]
+    for table in ("title_basics", "title_basics__hash", "title_ratings", "title_ratings__hash"):
+        assert f"{table} TO {table}__old, {table}__new TO {table}" in rename
+    assert "title_crew" not in rename
+
+    before = log[: renames[0]]
+    for table in ("title_basics", "title_ratings", "title_basics__hash", "title_ratings__hash"):
+        assert not any(writes_to(sql, table) for sql in before)
+    assert any(writes_to(sql, "title_ratings__new") for sql in before)
+    # Two batches per table, each committed on its own.
+    assert before.count("COMMIT") == 4
+
+    version = next(i for i, sql in enumerate(log) if "dataset_version" in sql)
+    assert version > renames[0]
+
+
+def test_unchanged_dataset_is_not_published(monkeypatch):
+    log = run_refresh(monkeypatch, [TableDiff("title_ratings", current=10)])
+    assert not any(sql.startswith(("RENAME", "REPLACE")) for sql in log)
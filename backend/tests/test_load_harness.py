@@ -0,0 +1,79 @@
+"""Runs ``bench_load.py`` offline (scripted Gemini, OMDb stub, SQLite fixture)
+as the CI regression gate for the chat and info endpoints."""
+
+import json
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from fake_gemini import QUESTIONS, SCENARIOS, ScriptedGemini, question
+from sqlite_fixture import SQLiteConnection, build_fixture
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def run_bench(tmp_path, *options):
+    report = tmp_path / "load.json"
+    proc = subprocess.run(
+        [
+            sys.executable, "bench_load.py", "--json", str(report),
+            "--titles", "5000", "--requests", "40", "--concurrency", "4", "--warmup", "2",
+            "--model-latency", "0", "--omdb-latency", "0", *options,
+        ],
+        cwd=BACKEND,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert report.exists(), proc.stdout + proc.stderr
+    return proc, json.loads(report.read_text(encoding="utf-8"))
+
+
+@pytest.fixture(scope="module")
+def fixture_db(tmp_path_factory):
+    return build_fixture(tmp_path_factory.mktemp("fixture") / "imdb.sqlite3")
+
+
+@pytest.mark.parametrize("scenario", [s for s in SCENARIOS if s != "chitchat"])
+def test_scripted_questions_return_rows(fixture_db, scenario):
+    conn = SQLiteConnection(fixture_db)
+    gemini = ScriptedGemini()
+    empty = 0
+    for seed in range(20):
+        for step in gemini.rounds(question(scenario, random.Random(seed))):
+            for _, args in [] if isinstance(step, str) else step:
+                with conn.cursor() as cur:
+                    cur.execute(args["sql"])
+                    empty += not cur.fetchall()
+    # A person may have directed nothing; everything else must find rows.
+    assert empty <= (3 if scenario == "director" else 0)
+
+
+def test_every_scenario_has_a_question():
+    assert set(QUESTIONS) == set(SCENARIOS)
+
+
+def test_offline_load_has_no_errors(tmp_path):
+    proc, report = run_bench(tmp_path)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert {e["endpoint"] for e in report["endpoints"]} == {"chat", "stream", "info"}
+    for endpoint in report["endpoints"]:
+        assert endpoint["requests"] == 40
+        assert endpoint["errors"] == 0
+    spans = {s["span"]: s["count"] for s in report["spans"]}
+    assert spans["tool.execute_mysql_query"] > 0 and spans["omdb.fetch"] > 0
+
+
+def test_replica_outage_fails_over_without_errors(tmp_path):
+    proc, report = run_bench(
+        tmp_path, "--endpoints", "chat", "--replicas", "2", "--fail-replica", "0.2",
+        "--no-query-cache", "--no-answer-cache", "--model-latency", "0.01",
+    )
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert report["endpoints"][0]["errors"] == 0
+    replicas = report["replicas"]["replicas"]
+    assert not replicas["replica1"]["healthy"]
+    assert replicas["replica2"]["queries"] > 0
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import get_info
+from get_info import OMDbError, aget_info, get_info_many
+from omdb_cache import OMDbCache
+from omdb_stub import fake_record
+
+
+class StubOMDb:
+    """httpx transport answering like ``omdb_stub``, optionally failing first."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.requests = []
+
+    def __call__(self, request):
+        imdb_id = request.url.params["i"]
+        self.requests.append(imdb_id)
+        if self.failures:
+            return httpx.Response(self.failures.pop(0))
+        if set(imdb_id[2:]) == {"0"}:
+            return httpx.Response(200, json={"Response": "False", "Error": "Incorrect IMDb ID."})
+        return httpx.Response(200, json=fake_record(imdb_id))
+
+    def client(self):
+        return httpx.AsyncClient(base_url="http://omdb.test/", transport=httpx.MockTransport(self))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = OMDbCache(str(tmp_path / "omdb.sqlite3"))
+    monkeypatch.setattr(get_info, "get_omdb_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    async def sleep(seconds):
+        pass
+
+    monkeypatch.setattr(get_info.asyncio, "sleep", sleep)
+
+
+def test_batch_fetches_missing_ids_once_and_caches_them(cache):
+    stub = StubOMDb()
+    ids = ["tt0111161", "tt0068646", "tt0111161", "bad", "tt0000000"]
+    results, errors = asyncio.run(get_info_many(ids, stub.client()))
+    assert sorted(results) == ["tt0068646", "tt0111161"]
+    assert results["tt0111161"]["Title"] == fake_record("tt0111161")["Title"]
+    assert errors == {"bad": "invalid IMDb id", "tt0000000": "Incorrect IMDb ID."}
+    assert sorted(stub.requests) == ["tt0000000", "tt0068646", "tt0111161"]
+
+    again, _ = asyncio.run(get_info_many(["tt0111161", "tt0068646"], stub.client()))
+    assert again == results
+    assert len(stub.requests) == 3
+    assert cache.stats()["hits"] == 2
+
+
+def test_single_lookup_errors(cache):
+    stub = StubOMDb()
+    with pytest.raises(ValueError):
+        asyncio.run(aget_info("tt12", stub.client()))
+    with pytest.raises(OMDbError):
+        asyncio.run(aget_info("tt0000000", stub.client()))
+    assert stub.requests == ["tt0000000"]
+
+
+def test_transient_errors_are_retried(cache, no_backoff):
+    stub = StubOMDb(failures=[503, 429])
+    assert asyncio.run(aget_info("tt0111161", stub.client()))["imdbID"] == "tt0111161"
+    assert len(stub.requests) == 3
+
+
+def test_client_errors_are_not_retried(cache, no_backoff):
+    stub = StubOMDb(failures=[401])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(aget_info("tt0111161", stub.client()))
+    assert len(stub.requests) == 1
+
+
+def test_cache_entries_expire(tmp_path):
+    cache = OMDbCache(str(tmp_path / "omdb.sqlite3"), ttl=0.01)
+    cache.put_many({"tt0111161": {"Title": "x"}})
+    assert cache.get_many(["tt0111161"]) == {"tt0111161": {"Title": "x"}}
+    time.sleep(0.02)
+    assert cache.get_many(["tt0111161"]) == {}
+
+
+def test_cache_evicts_least_recently_read(tmp_path):
+    body = {"Plot": "x" * 90}  # about 100 bytes each
+    cache = OMDbCache(str(tmp_path / "omdb.sqlite3"), max_bytes=350)
+    cache.put_many({"tt0000001": body, "tt0000002": body, "tt0000003": body})
+    time.sleep(0.01)
+    cache.get_many(["tt0000001"])
+    cache.put_many({"tt0000004": body})
+    assert sorted(cache.get_many(["tt0000001", "tt0000002", "tt0000003", "tt0000004"])) == [
+        "tt0000001", "tt0000003", "tt0000004",
+    ]
+    stats = cache.stats()
+    assert stats["bytes"] <= 350 and stats["evictions"] == 1
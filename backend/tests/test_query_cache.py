@@ -0,0 +1,77 @@
+import time
+
+from query_cache import QueryCache
+from sql_text import normalize_sql
+
+
+def test_hit_and_miss_counts():
+    cache = QueryCache()
+    assert cache.get("k") == (False, None)
+    cache.put("k", [{"a": 1}])
+    assert cache.get("k") == (True, [{"a": 1}])
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_entries_expire_after_ttl():
+    cache = QueryCache(ttl=0.01)
+    cache.put("k", 1)
+    time.sleep(0.02)
+    assert cache.get("k") == (False, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used_beyond_max_bytes():
+    row = "x" * 90  # about 100 bytes of JSON per entry
+    cache = QueryCache(max_bytes=250, max_entry_bytes=200)
+    cache.put("a", row)
+    cache.put("b", row)
+    assert cache.get("a")[0]  # "b" is now the least recently used
+    cache.put("c", row)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a")[0] and cache.get("c")[0]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 250
+
+
+def test_skips_entries_larger_than_max_entry_bytes():
+    cache = QueryCache(max_bytes=1000, max_entry_bytes=10)
+    cache.put("k", "x" * 100)
+    assert cache.get("k") == (False, None)
+
+
+def test_new_dataset_version_empties_the_cache():
+    version = [1]
+    cache = QueryCache(version_fn=lambda: version[0], version_check=0)
+    cache.put("k", 1)
+    assert cache.get("k") == (True, 1)
+    version[0] = 2
+    assert cache.get("k") == (False, None)
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_version_is_polled_at_most_every_version_check_seconds():
+    calls = []
+    cache = QueryCache(version_fn=lambda: calls.append(1) or 1, version_check=60)
+    for _ in range(5):
+        cache.get("k")
+    assert len(calls) == 1
+
+
+def test_failing_version_check_keeps_entries():
+    def broken():
+        raise OSError("database down")
+
+    cache = QueryCache(version_fn=broken, version_check=0)
+    cache.put("k", 1)
+    assert cache.get("k") == (True, 1)
+
+
+def test_normalized_sql_key_ignores_formatting():
+    assert normalize_sql("select  *\nfrom title_basics -- all\nWHERE x = \"a\";") == (
+        normalize_sql("SELECT * FROM title_basics WHERE x = 'a'")
+    )
+    assert normalize_sql("SELECT * FROM t WHERE x = 'a'") != normalize_sql(
+        "SELECT * FROM t WHERE x = 'A'"
+    )
+    assert normalize_sql("SELECT * FROM T") != normalize_sql("SELECT * FROM t")
@@ -0,0 +1,115 @@
+import pytest
+
+import query_guard
+from query_guard import QueryRejected, check_plan, estimate_rows, execution_timeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.broken:
+            raise RuntimeError("connection lost")
+        self.conn.executed.append(sql if params is None else (sql, params))
+
+    def fetchall(self):
+        return self.conn.plan
+
+
+class FakeConnection:
+    def __init__(self, plan=()):
+        self.plan = list(plan)
+        self.executed = []
+        self.broken = False
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+
+class FakePool:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, conn):
+        self.invalidated.append(conn)
+
+
+def step(table, type_, rows, id_=1):
+    return {"id": id_, "table": table, "type": type_, "rows": rows}
+
+
+def test_estimate_multiplies_joins_and_sums_selects():
+    plan = [step("r", "ALL", 1000), step("b", "eq_ref", 1), step("x", "ref", 10, id_=2)]
+    assert estimate_rows(plan) == 1010
+
+
+def test_full_scan_of_a_large_table_is_rejected():
+    # SELECT * FROM title_basics WHERE primaryTitle LIKE '%matrix%'
+    conn = FakeConnection([step("title_basics", "ALL", 11_000_000)])
+    with pytest.raises(QueryRejected) as exc:
+        check_plan(conn, "SELECT * FROM title_basics WHERE primaryTitle LIKE '%matrix%'")
+    error = exc.value.to_error()
+    assert error["code"] == "too_expensive"
+    assert error["full_scans"] == [{"table": "title_basics", "rows": 11_000_000}]
+    assert conn.executed[0].startswith("EXPLAIN SELECT")
+
+
+def test_full_index_scan_of_a_large_table_is_rejected():
+    conn = FakeConnection([step("title_basics", "index", 11_000_000)])
+    with pytest.raises(QueryRejected):
+        check_plan(conn, "SELECT COUNT(*) FROM title_basics")
+
+
+def test_scan_of_a_small_table_passes():
+    # Top rated: scan title_ratings, look each title up by primary key.
+    conn = FakeConnection(
+        [step("title_ratings", "ALL", 1_500_000), step("title_basics", "eq_ref", 1)]
+    )
+    check_plan(conn, "SELECT ... FROM title_ratings JOIN title_basics USING (tconst)")
+
+
+def test_large_join_estimate_is_rejected():
+    conn = FakeConnection(
+        [step("title_ratings", "ALL", 1_500_000), step("title_principals", "ref", 10)]
+    )
+    with pytest.raises(QueryRejected) as exc:
+        check_plan(conn, "SELECT ...")
+    assert exc.value.details["estimated_rows"] == 15_000_000
+
+
+def test_select_gets_an_optimizer_hint():
+    conn, pool = FakeConnection(), FakePool()
+    with execution_timeout(pool, conn, "SELECT 1") as statement:
+        pass
+    assert statement == (
+        f"SELECT /*+ MAX_EXECUTION_TIME({query_guard.MAX_EXECUTION_MS}) */ 1"
+    )
+    assert conn.executed == []
+
+
+def test_session_timeout_is_reset_after_the_query():
+    conn, pool = FakeConnection(), FakePool()
+    sql = "WITH t AS (SELECT 1) SELECT * FROM t"
+    with pytest.raises(ValueError):
+        with execution_timeout(pool, conn, sql) as statement:
+            assert statement == sql
+            raise ValueError("query failed")
+    assert conn.executed == [
+        ("SET SESSION max_execution_time = %s", (query_guard.MAX_EXECUTION_MS,)),
+        "SET SESSION max_execution_time = DEFAULT",
+    ]
+    assert pool.invalidated == []
+
+
+def test_connection_that_cannot_be_reset_is_dropped():
+    conn, pool = FakeConnection(), FakePool()
+    with execution_timeout(pool, conn, "(SELECT 1) UNION (SELECT 2)"):
+        conn.broken = True
+    assert pool.invalidated == [conn]
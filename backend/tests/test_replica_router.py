@@ -0,0 +1,156 @@
+from contextlib import contextmanager
+
+import pytest
+from mysql.connector import errors
+
+from replica_router import ReplicaRouter
+
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.pool.checks += 1
+
+    def fetchone(self):
+        return (self.pool.version,)
+
+
+class FakePool:
+    """Stands in for a ConnectionPool; ``down`` makes every connection fail."""
+
+    def __init__(self, name, version="v1"):
+        self.name = name
+        self.version = version
+        self.down = False
+        self.busy = False
+        self.checks = 0
+        self.closed = False
+
+    @contextmanager
+    def connection(self, timeout=None):
+        if self.busy:
+            raise errors.PoolError(msg="pool exhausted")
+        if self.down:
+            raise errors.InterfaceError(msg=f"{self.name} unreachable")
+        yield self
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        self.closed = True
+
+
+def served_by(pool, conn):
+    return pool.name
+
+
+@pytest.fixture
+def pools():
+    return {"r1": FakePool("r1"), "r2": FakePool("r2")}
+
+
+def make_router(pools, primary=None, fail_threshold=2):
+    return ReplicaRouter(pools, primary=primary, check_interval=0, fail_threshold=fail_threshold)
+
+
+def test_queries_are_spread_over_replicas(pools):
+    router = make_router(pools)
+    assert {router.run(served_by) for _ in range(4)} == {"r1", "r2"}
+
+
+def test_connection_failure_fails_over_to_another_replica(pools):
+    pools["r1"].down = True
+    router = make_router(pools)
+    assert [router.run(served_by) for _ in range(4)] == ["r2"] * 4
+    stats = router.stats()
+    assert stats["failovers"] >= 1
+    assert stats["replicas"]["r1"]["errors"] >= 1
+
+
+def test_replica_leaves_rotation_after_fail_threshold(pools):
+    pools["r1"].down = True
+    router = make_router(pools)
+    for _ in range(6):
+        router.run(served_by)
+    assert router.stats()["replicas"]["r1"]["healthy"] is False
+    failovers = router.stats()["failovers"]
+    for _ in range(4):
+        assert router.run(served_by) == "r2"
+    # Out of rotation: r1 is no longer tried first.
+    assert router.stats()["failovers"] == failovers
+
+
+def test_check_puts_a_recovered_replica_back(pools):
+    pools["r1"].down = True
+    router = make_router(pools, fail_threshold=1)
+    router.check()
+    assert router.stats()["usable"] == 1
+    pools["r1"].down = False
+    router.check()
+    assert router.stats()["replicas"]["r1"]["healthy"] is True
+    assert router.stats()["usable"] == 2
+
+
+def test_stale_replica_is_held_back_until_it_catches_up(pools):
+    primary = FakePool("primary", version="v2")
+    pools["r2"].version = "v2"
+    router = make_router(pools, primary=primary)
+    router.check()
+    assert router.stats()["replicas"]["r1"]["stale"] is True
+    assert {router.run(served_by) for _ in range(4)} == {"r2"}
+    pools["r1"].version = "v2"
+    router.check()
+    assert router.stats()["replicas"]["r1"]["stale"] is False
+    assert {router.run(served_by) for _ in range(4)} == {"r1", "r2"}
+
+
+def test_primary_serves_when_no_replica_is_usable(pools):
+    primary = FakePool("primary")
+    for pool in pools.values():
+        pool.down = True
+    router = make_router(pools, primary=primary)
+    assert router.run(served_by) == "primary"
+    assert router.stats()["primary_queries"] == 1
+
+
+def test_without_primary_the_last_connection_error_is_raised(pools):
+    for pool in pools.values():
+        pool.down = True
+    router = make_router(pools)
+    with pytest.raises(errors.InterfaceError):
+        router.run(served_by)
+
+
+def test_busy_pool_fails_over_without_marking_the_replica_down(pools):
+    pools["r1"].busy = True
+    router = make_router(pools, fail_threshold=1)
+    assert [router.run(served_by) for _ in range(4)] == ["r2"] * 4
+    r1 = router.stats()["replicas"]["r1"]
+    assert r1["healthy"] is True and r1["consecutive_failures"] == 0
+
+
+def test_sql_errors_are_not_retried(pools):
+    calls = []
+
+    def bad_query(pool, conn):
+        calls.append(pool.name)
+        raise errors.ProgrammingError(msg="Unknown column")
+
+    router = make_router(pools, primary=FakePool("primary"), fail_threshold=1)
+    with pytest.raises(errors.ProgrammingError):
+        router.run(bad_query)
+    assert len(calls) == 1
+    assert router.stats()["usable"] == 2
+    assert router.stats()["failovers"] == 0
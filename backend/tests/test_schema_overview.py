@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import schema_overview
+from schema_overview import SchemaOverview, _fingerprint
+
+OLD = [("title_ratings", "", "tconst", "varchar(12)"), ("title_ratings", "", "numVotes", "int")]
+NEW = OLD + [("title_ratings", "", "updatedAt", "datetime")]
+
+
+class FakeDatabase:
+    """Serves ``fetch_overview`` / ``fetch_fingerprint`` from a list of rows."""
+
+    def __init__(self, monkeypatch, rows):
+        self.rows = rows
+        self.down = False
+        self.overview_reads = 0
+        monkeypatch.setenv("MYSQL_DB", "imdb")
+        monkeypatch.setattr(schema_overview, "fetch_overview", self.fetch_overview)
+        monkeypatch.setattr(schema_overview, "fetch_fingerprint", self.fetch_fingerprint)
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("MySQL is down")
+
+    def fetch_fingerprint(self):
+        self._check()
+        return _fingerprint((t, c, ty) for t, _, c, ty in self.rows)
+
+    def fetch_overview(self):
+        self._check()
+        self.overview_reads += 1
+        tables = {}
+        for table, _, column, _ in self.rows:
+            tables.setdefault(table, []).append(column)
+        text = "\n".join(f"- {t}: {', '.join(cols)}" for t, cols in tables.items())
+        return text, "imdb", tables, self.fetch_fingerprint()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(schema_overview, "VERIFY_RETRY", 0.0)
+    return FakeDatabase(monkeypatch, list(OLD))
+
+
+@pytest.fixture
+def cache_path(tmp_path, db):
+    path = tmp_path / "schema.json"
+    SchemaOverview(str(path)).get()  # written from the old schema
+    db.overview_reads = 0
+    return path
+
+
+def test_matching_cache_is_used_without_reading_the_overview(db, cache_path):
+    overview = SchemaOverview(str(cache_path))
+    assert overview.tables() == {"title_ratings": ["tconst", "numVotes"]}
+    assert overview.stats()["source"] == "cache" and overview.stats()["verified"]
+    assert db.overview_reads == 0
+
+
+def test_cache_is_re_read_after_a_migration(db, cache_path):
+    db.rows = list(NEW)
+    overview = SchemaOverview(str(cache_path))
+    assert "updatedAt" in overview.tables()["title_ratings"]
+    assert overview.stats()["source"] == "database"
+    assert "fingerprint" in json.loads(cache_path.read_text())
+    assert db.overview_reads == 1
+
+
+def test_cache_serves_while_down_and_is_checked_once_the_database_answers(db, cache_path):
+    db.down = True
+    db.rows = list(NEW)
+    overview = SchemaOverview(str(cache_path))
+    assert overview.tables() == {"title_ratings": ["tconst", "numVotes"]}
+    assert not overview.stats()["verified"]
+
+    db.down = False
+    assert "updatedAt" in overview.tables()["title_ratings"]
+    assert overview.stats()["verified"]
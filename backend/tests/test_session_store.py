@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+def exchange(n):
+    return [{"role": "user", "text": f"q{n}"}, {"role": "model", "text": f"a{n}"}]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(max_turns=6)
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), max_turns=6)
+
+
+def test_keeps_last_turns_per_session(store):
+    for n in range(5):
+        store.append("a", exchange(n))
+    store.append("b", exchange(9))
+    assert [t["text"] for t in store.get("a")] == ["q2", "a2", "q3", "a3", "q4", "a4"]
+    assert store.get("b") == exchange(9)
+    store.clear("a")
+    assert store.get("a") == []
+    assert store.stats()["sessions"] == 1
+
+
+def test_expired_sessions_are_dropped(store):
+    store.ttl = -1
+    store.append("a", exchange(0))
+    assert store.get("a") == []
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_sessions=2)
+    for session in "abc":
+        store.append(session, exchange(0))
+    assert store.get("a") == []
+    assert store.stats()["evicted"] == 1
+
+
+def test_concurrent_sqlite_appends_do_not_collide(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    # One store per thread mimics separate worker processes on one file.
+    stores = [SQLiteSessionStore(path, max_turns=1000) for _ in range(8)]
+    failures = []
+
+    def worker(store, w):
+        try:
+            for n in range(20):
+                store.append("shared", exchange(f"{w}-{n}"))
+        except Exception as exc:
+            failures.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(s, w)) for w, s in enumerate(stores)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert failures == []
+    turns = stores[0].get("shared")
+    assert len(turns) == 8 * 20 * 2
+    # Each exchange stays in order: a user turn directly followed by its answer.
+    for question, answer in zip(turns[::2], turns[1::2]):
+        assert question["text"][1:] == answer["text"][1:]
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+
+def run_concurrently(flight, n, fn, key="k"):
+    results, errors = [], []
+
+    def caller():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=caller) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    executions = []
+
+    def slow():
+        executions.append(1)
+        time.sleep(0.1)
+        return ["row"]
+
+    results, errors = run_concurrently(flight, 8, slow)
+    assert executions == [1] and errors == []
+    assert results == [["row"]] * 8
+    assert all(r is results[0] for r in results)
+    stats = flight.stats()
+    assert (stats["calls"], stats["executions"], stats["coalesced"]) == (8, 1, 7)
+    assert stats["in_flight"] == 0
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.1)
+        raise ValueError("query failed")
+
+    results, errors = run_concurrently(flight, 4, failing)
+    assert results == [] and len(errors) == 4
+    assert all(isinstance(e, ValueError) for e in errors)
+    # The next call runs again instead of replaying the failure.
+    assert flight.do("k", lambda: 1) == 1
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert [flight.do(k, lambda k=k: k) for k in "ab"] == ["a", "b"]
+    assert flight.stats()["executions"] == 2
+
+
+def test_async_callers_share_one_task():
+    flight = AsyncSingleFlight()
+    executions = []
+
+    async def fetch():
+        executions.append(1)
+        await asyncio.sleep(0.05)
+        return {"Title": "Heat"}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("tt0113277", fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert executions == [1]
+    assert results == [{"Title": "Heat"}] * 5
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_error_propagates_to_every_caller():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise LookupError("not found")
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do("k", fetch) for _ in range(3)), return_exceptions=True
+        )
+
+    outcomes = asyncio.run(main())
+    assert all(isinstance(o, LookupError) for o in outcomes)
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", fetch))
+        second = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 42
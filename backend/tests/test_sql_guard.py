@@ -0,0 +1,117 @@
+import pytest
+
+import sql_guard
+from query_guard import QueryRejected
+from sql_guard import SQLGuard
+from sql_text import normalize_sql, tokenize
+
+SCHEMA = {
+    "title_basics": ["tconst", "primaryTitle", "startYear", "genres"],
+    "title_ratings": ["tconst", "averageRating", "numVotes"],
+    "name_basics": ["nconst", "primaryName"],
+}
+
+
+class FakeOverview:
+    digest = "schema-v1"
+
+    def tables(self):
+        return SCHEMA
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    monkeypatch.setattr(sql_guard, "get_schema_overview", FakeOverview)
+    return SQLGuard()
+
+
+def rejected(guard, sql):
+    with pytest.raises(QueryRejected) as exc:
+        guard.validate(sql)
+    return exc.value
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT primaryTitle FROM title_basics WHERE startYear = 1994 LIMIT 10",
+        "SELECT b.primaryTitle, r.averageRating FROM title_basics b "
+        "JOIN title_ratings r ON r.tconst = b.tconst ORDER BY r.numVotes DESC",
+        "WITH top AS (SELECT tconst FROM title_ratings WHERE numVotes > 1000) "
+        "SELECT COUNT(*) FROM top",
+        "(SELECT primaryName FROM name_basics) UNION (SELECT primaryTitle FROM title_basics)",
+        "SELECT /*+ MAX_EXECUTION_TIME(1000) */ primaryTitle FROM title_basics;",
+        "SELECT primaryTitle FROM title_basics -- the /*! is inside a comment\n",
+        "SELECT '/*! INTO OUTFILE */' AS note FROM title_basics",
+    ],
+)
+def test_read_only_selects_pass(guard, sql):
+    guard.validate(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT 1 /*! INTO OUTFILE '/tmp/x' */",
+        "SELECT /*!50000 SLEEP(100) */ 1",
+        "SELECT primaryTitle FROM title_basics /*! FOR UPDATE */",
+        "/*! DELETE FROM title_basics */ SELECT 1",
+    ],
+)
+def test_executable_comments_are_rejected(guard, sql):
+    assert rejected(guard, sql).code == "not_read_only"
+
+
+def test_executable_comment_does_not_reuse_a_cached_verdict(guard):
+    guard.validate("SELECT primaryTitle FROM title_basics WHERE startYear = 1994")
+    assert rejected(
+        guard, "SELECT primaryTitle FROM title_basics WHERE startYear = 1994 /*! FOR UPDATE */"
+    ).code == "not_read_only"
+    assert guard.stats()["hits"] == 0
+
+
+def test_executable_comments_are_kept_in_normalized_text():
+    assert normalize_sql("SELECT 1 /*! INTO OUTFILE 'x' */") != normalize_sql("SELECT 1")
+    assert normalize_sql("SELECT /*+ BKA(t) */ 1") == normalize_sql("SELECT 1")
+    assert [t.kind for t in tokenize("SELECT /*!50000 1 */")] == ["word", "executable"]
+
+
+@pytest.mark.parametrize(
+    "sql, code",
+    [
+        ("DELETE FROM title_basics", "not_read_only"),
+        ("WITH t AS (SELECT 1) DELETE FROM title_basics", "not_read_only"),
+        ("SELECT tconst INTO @x FROM title_basics", "not_read_only"),
+        ("SELECT * FROM title_basics FOR UPDATE", "not_read_only"),
+        ("SELECT * FROM title_basics LOCK IN SHARE MODE", "not_read_only"),
+        ("SELECT SLEEP(10)", "unsafe_function"),
+        ("SELECT BENCHMARK(1000000, MD5('x'))", "unsafe_function"),
+        ("SELECT 1; DROP TABLE title_basics", "multiple_statements"),
+        ("SELECT (1", "syntax_error"),
+        ("", "syntax_error"),
+    ],
+)
+def test_unsafe_statements_are_rejected(guard, sql, code):
+    assert rejected(guard, sql).code == code
+
+
+def test_unknown_table_suggests_close_names(guard):
+    error = rejected(guard, "SELECT * FROM title_basic").to_error()
+    assert error["code"] == "unknown_table"
+    assert "title_basics" in error["suggestions"]
+
+
+def test_unknown_column_suggests_close_names(guard):
+    error = rejected(guard, "SELECT primaryTitel FROM title_basics").to_error()
+    assert error["code"] == "unknown_column"
+    assert "primaryTitle" in error["suggestions"]
+
+
+def test_verdicts_are_cached_per_shape(guard):
+    guard.validate("SELECT primaryTitle FROM title_basics WHERE startYear = 1994")
+    guard.validate("SELECT primaryTitle FROM title_basics WHERE startYear = 2001")
+    for _ in range(2):
+        assert rejected(guard, "SELECT SLEEP(5)").code == "unsafe_function"
+    stats = guard.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["rejected"] == {"unsafe_function": 2}
@@ -0,0 +1,89 @@
+from contextlib import contextmanager
+
+import mysql.connector
+import pytest
+from mysql.connector.constants import FieldType
+
+import title_search
+from query_guard import ER_QUERY_TIMEOUT, QueryRejected
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = [
+            ("tconst", FieldType.VAR_STRING),
+            ("primaryTitle", FieldType.VAR_STRING),
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+        if self.conn.error is not None:
+            raise self.conn.error
+
+    def fetchall(self):
+        return [("tt0133093", "The Matrix")]
+
+
+class FakePool:
+    def __init__(self, error=None):
+        self.executed = []
+        self.error = error
+
+    @contextmanager
+    def connection(self, timeout=None):
+        yield self
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def invalidate(self, conn):
+        pass
+
+
+class FakeRouter:
+    def __init__(self, pool):
+        self.pool = pool
+        self.calls = 0
+
+    def run(self, fn):
+        self.calls += 1
+        return fn(self.pool, self.pool)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(title_search, "get_pool", lambda: pool)
+    monkeypatch.setattr(title_search, "get_replica_router", lambda: None)
+    return pool
+
+
+def test_search_runs_under_max_execution_time_with_bounded_candidates(pool):
+    rows = title_search.search_titles("ma", limit=5)
+    assert rows == [{"tconst": "tt0133093", "primaryTitle": "The Matrix"}]
+    (sql, params), = pool.executed
+    assert "MAX_EXECUTION_TIME" in sql
+    assert sql.count("LIMIT %(cand)s") == 2
+    assert params["q"] == '"ma"'
+    assert params["cand"] == title_search.MAX_SEARCH_CANDIDATES
+
+
+def test_search_goes_through_the_replica_router(pool, monkeypatch):
+    router = FakeRouter(pool)
+    monkeypatch.setattr(title_search, "get_replica_router", lambda: router)
+    title_search.search_titles("Inception")
+    assert router.calls == 1 and len(pool.executed) == 1
+
+
+def test_timeout_is_reported_as_too_expensive(pool):
+    pool.error = mysql.connector.Error(msg="timeout", errno=ER_QUERY_TIMEOUT)
+    with pytest.raises(QueryRejected) as exc:
+        title_search.search_titles("the")
+    assert exc.value.code == "too_expensive"
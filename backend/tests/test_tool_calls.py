@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+import Schema
+
+
+def call(name, **args):
+    return SimpleNamespace(name=name, args=args)
+
+
+@pytest.mark.parametrize(
+    "fc, argument",
+    [
+        (call("execute_mysql_query"), "sql"),
+        (call("execute_mysql_query", sql=""), "sql"),
+        (call("execute_mysql_query", sql="SELECT 1", limit="ten"), "limit"),
+        (call("execute_mysql_query", sql="SELECT 1", limit=2.5), "limit"),
+        (call("search_titles", limit=5), "query"),
+        (call("search_titles", query="heat", limit=[5]), "limit"),
+        (call("search_titles", query="heat", title_type=3), "title_type"),
+    ],
+)
+def test_malformed_arguments_become_tool_errors(fc, argument):
+    payload, data, entries = Schema._run_tool_call(fc)
+    assert data is None
+    assert payload["error"]["code"] == "invalid_argument"
+    assert payload["error"]["argument"] == argument
+    assert payload["metadata"]["query_successful"] is False
+    assert "error" in entries[0]
+
+
+def test_missing_args_object():
+    payload, data, _ = Schema._run_tool_call(SimpleNamespace(name="search_titles", args=None))
+    assert payload["error"]["argument"] == "query"
+
+
+def test_numeric_limits_are_accepted():
+    assert Schema._int_arg({"limit": 20.0}, "limit") == 20
+    assert Schema._int_arg({"limit": "20"}, "limit") == 20
+    assert Schema._int_arg({}, "limit") is None
+
+
+def test_unexpected_handler_errors_do_not_escape(monkeypatch):
+    def broken(fc, entries):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(Schema._TOOL_HANDLERS, "search_titles", broken)
+    payload, data, entries = Schema._run_tool_call(call("search_titles", query="heat"))
+    assert data is None
+    assert payload["error"]["code"] == "internal_error"
+    assert entries == [{"tool": "search_titles", "error": "Internal error: boom"}]
@@ -0,0 +1,134 @@
+"""Popularity-ranked title lookup backed by the ngram FULLTEXT indexes."""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List
+
+import mysql.connector
+
+from db_pool import get_pool
+from query_guard import ER_QUERY_TIMEOUT, execution_timeout, timeout_error
+from replica_router import get_replica_router
+from row_codec import RowConverter
+from tracing import span
+
+MAX_SEARCH_RESULTS = 50
+# Matches read per index before grouping, joining and sorting by votes: a
+# two-character phrase such as "ma" matches millions of titles.
+MAX_SEARCH_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 2000))
+
+search_titles_declaration: Dict[str, Any] = {
+    "name": "search_titles",
+    "description": (
+        "Finds titles by (partial) name in any language, including alternative "
+        "and translated titles from title_akas. Returns candidates with tconst, "
+        "primaryTitle, titleType, startYear, averageRating and numVotes, most "
+        "popular first. Use this instead of LIKE '%name%' to resolve a movie or "
+        "show name to its tconst."
+    ),
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "The title or part of it, e.g. 'Inception' or '盗梦空间'.",
+            },
+            "title_type": {
+                "type": "string",
+                "description": "Optional titleType filter, e.g. 'movie' or 'tvSeries'.",
+            },
+            "limit": {
+                "type": "integer",
+                "description": "Number of candidates (1-50, default 10).",
+                "minimum": 1,
+                "maximum": MAX_SEARCH_RESULTS,
+            },
+        },
+        "required": ["query"],
+    },
+}
+
+# Both indexes use the ngram parser (see db/init.sql), so a quoted phrase in
+# BOOLEAN MODE matches the consecutive ngrams of the search text anywhere in
+# a title, in any script.  Each branch keeps only its ``cand`` most relevant
+# matches; InnoDB stops reading the index there instead of ranking them all.
+_SEARCH_SQL = """
+SELECT tb.tconst, tb.primaryTitle, tb.originalTitle, tb.titleType, tb.startYear,
+       tr.averageRating, tr.numVotes, m.matchedTitle
+FROM (
+    SELECT tconst, MIN(matchedTitle) AS matchedTitle
+    FROM (
+        (SELECT tconst, primaryTitle AS matchedTitle
+         FROM title_basics
+         WHERE MATCH(primaryTitle, originalTitle) AGAINST (%(q)s IN BOOLEAN MODE)
+         ORDER BY MATCH(primaryTitle, originalTitle) AGAINST (%(q)s IN BOOLEAN MODE) DESC
+         LIMIT %(cand)s)
+        UNION ALL
+        (SELECT titleId, title
+         FROM title_akas
+         WHERE MATCH(title) AGAINST (%(q)s IN BOOLEAN MODE)
+         ORDER BY MATCH(title) AGAINST (%(q)s IN BOOLEAN MODE) DESC
+         LIMIT %(cand)s)
+    ) hits
+    GROUP BY tconst
+) m
+JOIN title_basics tb ON tb.tconst = m.tconst
+LEFT JOIN title_ratings tr ON tr.tconst = m.tconst
+WHERE %(type)s IS NULL OR tb.titleType = %(type)s
+ORDER BY COALESCE(tr.numVotes, 0) DESC, COALESCE(tr.averageRating, 0) DESC
+LIMIT %(limit)s
+"""
+
+# Titles shorter than the ngram token size have no ngrams; match them exactly.
+_EXACT_SQL = """
+SELECT tb.tconst, tb.primaryTitle, tb.originalTitle, tb.titleType, tb.startYear,
+       tr.averageRating, tr.numVotes, tb.primaryTitle AS matchedTitle
+FROM title_basics tb
+LEFT JOIN title_ratings tr ON tr.tconst = tb.tconst
+WHERE tb.primaryTitle = %(raw)s AND (%(type)s IS NULL OR tb.titleType = %(type)s)
+ORDER BY COALESCE(tr.numVotes, 0) DESC
+LIMIT %(limit)s
+"""
+
+
+def search_titles(
+    query: str, limit: int | None = None, title_type: str | None = None
+) -> List[Dict[str, Any]]:
+    """Return up to ``limit`` titles matching ``query``, most voted first."""
+    query = " ".join(query.split())
+    if not query:
+        return []
+    limit = max(1, min(int(limit or 10), MAX_SEARCH_RESULTS))
+    # Boolean-mode operators would change the meaning; keep a plain phrase.
+    phrase = '"' + "".join(" " if c in '"+-<>()~*@' else c for c in query) + '"'
+    params = {
+        "q": phrase,
+        "raw": query,
+        "type": title_type or None,
+        "limit": limit,
+        "cand": MAX_SEARCH_CANDIDATES,
+    }
+    sql = _EXACT_SQL if len(query) < 2 else _SEARCH_SQL
+
+    router = get_replica_router()
+    if router is not None:
+        return router.run(lambda pool, conn: _search(pool, conn, sql, params))
+    pool = get_pool()
+    with pool.connection() as conn:
+        return _search(pool, conn, sql, params)
+
+
+def _search(pool, conn, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Run one search statement under ``max_execution_time``."""
+    with execution_timeout(pool, conn, sql) as statement:
+        with conn.cursor() as cur, span("db.search") as s:
+            try:
+                cur.execute(statement, params)
+            except mysql.connector.Error as err:
+                if err.errno == ER_QUERY_TIMEOUT:
+                    raise timeout_error(err) from err
+                raise
+            rows = RowConverter(cur.description)(cur.fetchall())
+            s.set(rows=len(rows))
+            return rows
@@ -0,0 +1,123 @@
+"""Structured tracing spans for chat turns.
+
+Usage::
+
+    with span("db.execute", sql=sql) as s:
+        ...
+        s.set(rows=len(rows))
+
+Spans nest through a context variable, so the model rounds, tool calls, DB
+and OMDb work of one turn share a trace id (``run_blocking`` copies the
+context into its worker threads).  Every finished span feeds the
+``moviegpt_span_*`` histograms on ``/metrics``: its duration, and its
+``rows``, ``bytes``, ``tokens_in`` and ``tokens_out`` attributes when set.
+With ``TRACE_LOG=1`` each span is also logged as one JSON line.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from metrics import SIZE_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
+
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+# Longer string attributes (SQL text) are cut in the log line.
+TRACE_LOG_MAX_CHARS = 300
+
+SPAN_SECONDS = registry.histogram(
+    "moviegpt_span_duration_seconds", "Duration of traced operations.", ["span"]
+)
+SPAN_ROWS = registry.histogram(
+    "moviegpt_span_rows", "Rows returned by traced operations.", ["span"], buckets=SIZE_BUCKETS
+)
+SPAN_BYTES = registry.histogram(
+    "moviegpt_span_bytes", "Payload bytes of traced operations.", ["span"], buckets=SIZE_BUCKETS
+)
+SPAN_TOKENS = registry.histogram(
+    "moviegpt_span_tokens",
+    "Gemini tokens per traced operation.",
+    ["span", "direction"],
+    buckets=SIZE_BUCKETS,
+)
+SPAN_ERRORS = registry.counter(
+    "moviegpt_span_errors_total", "Traced operations that raised.", ["span"]
+)
+
+_current: ContextVar[Optional["Span"]] = ContextVar("moviegpt_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start", "duration")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(8)
+        self.span_id = secrets.token_hex(4)
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """Time the enclosed block as ``name``; ``name`` is a metric label, keep it fixed."""
+    parent = _current.get()
+    current = Span(name, parent, attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Closed from another context, e.g. an abandoned async generator.
+            _current.set(parent)
+        _finish(current)
+
+
+def _observe(hist: Any, value: Any, **labels: str) -> None:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        hist.observe(value, **labels)
+
+
+def _finish(current: Span) -> None:
+    name = current.name
+    attrs = current.attrs
+    SPAN_SECONDS.observe(current.duration, span=name)
+    _observe(SPAN_ROWS, attrs.get("rows"), span=name)
+    _observe(SPAN_BYTES, attrs.get("bytes"), span=name)
+    _observe(SPAN_TOKENS, attrs.get("tokens_in"), span=name, direction="input")
+    _observe(SPAN_TOKENS, attrs.get("tokens_out"), span=name, direction="output")
+    if "error" in attrs:
+        SPAN_ERRORS.inc(span=name)
+
+    if TRACE_LOG:
+        record = {
+            "trace": current.trace_id,
+            "span": current.span_id,
+            "parent": current.parent_id,
+            "name": name,
+            "ms": round(current.duration * 1000, 2),
+        }
+        for key, value in attrs.items():
+            if isinstance(value, str) and len(value) > TRACE_LOG_MAX_CHARS:
+                value = value[:TRACE_LOG_MAX_CHARS] + "…"
+            record[key] = value
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
@@ -92,8 +92,7 @@ CREATE TABLE title_episode (
   tconst        CHAR(10) PRIMARY KEY,
   parentTconst  CHAR(10),
   seasonNumber  INT UNSIGNED,
-  episodeNumber INT UNSIGNED,
-  INDEX (parentTconst)
+  episodeNumber INT UNSIGNED
 ) DEFAULT CHARSET = utf8mb4;
 
 LOAD DATA INFILE '/var/lib/mysql-files/title.episode.tsv'
@@ -112,8 +111,7 @@ CREATE TABLE title_principals (
   category   VARCHAR(64),
   job        TEXT,
   characters VARCHAR(1024),
-  PRIMARY KEY (tconst, ordering),
-  INDEX (nconst)
+  PRIMARY KEY (tconst, ordering)
 ) DEFAULT CHARSET = utf8mb4;
 
 LOAD DATA INFILE '/var/lib/mysql-files/title.principals.tsv'
@@ -138,6 +136,28 @@ LINES  TERMINATED BY '\n'
 IGNORE 1 LINES
 (tconst, averageRating, numVotes);
 
+/* ========= 二级索引：导入完成后再建，比边导入边维护快得多 ========= */
+ALTER TABLE title_episode    ADD INDEX parentTconst (parentTconst);
+ALTER TABLE title_principals ADD INDEX nconst (nconst);
+
+/* ========= 8. 片名全文索引（ngram，中英文片名模糊查找，供 search_titles 使用） ========= */
+/* ngram 会丢弃含停用词的分词（如 "a"），英文片名需关闭停用词 */
+SET SESSION innodb_ft_enable_stopword = OFF;
+
+ALTER TABLE title_basics
+  ADD FULLTEXT INDEX ft_title_basics (primaryTitle, originalTitle) WITH PARSER ngram;
+
+ALTER TABLE title_akas
+  ADD FULLTEXT INDEX ft_title_akas (title) WITH PARSER ngram;
+
+/* ========= 9. 数据版本（每次导入都会更新，后端据此清空查询缓存） ========= */
+CREATE TABLE IF NOT EXISTS dataset_version (
+  id        TINYINT PRIMARY KEY,
+  loaded_at TIMESTAMP(6) NOT NULL
+) DEFAULT CHARSET = utf8mb4;
+
+REPLACE INTO dataset_version VALUES (1, CURRENT_TIMESTAMP(6));
+
 /* ========= 收尾：恢复原设置 ========= */
 SET SQL_LOG_BIN             = @OLD_SQL_LOG_BIN;
 SET FOREIGN_KEY_CHECKS      = @OLD_FOREIGN_KEY_CHECKS;
@@ -0,0 +1,111 @@
+/* ========= 列表列拆分为关联表 =========
+   title_basics.genres、title_crew.directors/writers、name_basics.knownForTitles/
+   primaryProfession 都是逗号分隔字符串，只能用 FIND_IN_SET/LIKE 全表扫描。
+   这里把它们拆成带索引的关联表。先写入 *__new 表，建好索引后用 RENAME TABLE
+   原子替换，重跑期间查询不受影响。
+   docker 首次启动时在 init.sql 之后执行；之后可用 `python backend/db_scripts.py normalize` 重跑。 */
+
+/* ========= 1. title_genre ========= */
+DROP TABLE IF EXISTS title_genre__new;
+CREATE TABLE title_genre__new (
+  tconst CHAR(10)    NOT NULL,
+  genre  VARCHAR(32) NOT NULL,
+  PRIMARY KEY (tconst, genre)
+) DEFAULT CHARSET = utf8mb4;
+
+INSERT IGNORE INTO title_genre__new (tconst, genre)
+SELECT tb.tconst, j.genre
+FROM title_basics tb,
+     JSON_TABLE(CONCAT('["', REPLACE(tb.genres, ',', '","'), '"]'),
+                '$[*]' COLUMNS (genre VARCHAR(32) PATH '$')) j
+WHERE tb.genres <> '';
+
+ALTER TABLE title_genre__new ADD INDEX idx_genre (genre, tconst);
+
+/* ========= 2. title_director ========= */
+DROP TABLE IF EXISTS title_director__new;
+CREATE TABLE title_director__new (
+  tconst CHAR(10) NOT NULL,
+  nconst CHAR(10) NOT NULL,
+  PRIMARY KEY (tconst, nconst)
+) DEFAULT CHARSET = utf8mb4;
+
+INSERT IGNORE INTO title_director__new (tconst, nconst)
+SELECT tc.tconst, j.nconst
+FROM title_crew tc,
+     JSON_TABLE(CONCAT('["', REPLACE(tc.directors, ',', '","'), '"]'),
+                '$[*]' COLUMNS (nconst CHAR(10) PATH '$')) j
+WHERE tc.directors <> '';
+
+ALTER TABLE title_director__new ADD INDEX idx_nconst (nconst, tconst);
+
+/* ========= 3. title_writer ========= */
+DROP TABLE IF EXISTS title_writer__new;
+CREATE TABLE title_writer__new (
+  tconst CHAR(10) NOT NULL,
+  nconst CHAR(10) NOT NULL,
+  PRIMARY KEY (tconst, nconst)
+) DEFAULT CHARSET = utf8mb4;
+
+INSERT IGNORE INTO title_writer__new (tconst, nconst)
+SELECT tc.tconst, j.nconst
+FROM title_crew tc,
+     JSON_TABLE(CONCAT('["', REPLACE(tc.writers, ',', '","'), '"]'),
+                '$[*]' COLUMNS (nconst CHAR(10) PATH '$')) j
+WHERE tc.writers <> '';
+
+ALTER TABLE title_writer__new ADD INDEX idx_nconst (nconst, tconst);
+
+/* ========= 4. person_known_for ========= */
+DROP TABLE IF EXISTS person_known_for__new;
+CREATE TABLE person_known_for__new (
+  nconst CHAR(10) NOT NULL,
+  tconst CHAR(10) NOT NULL,
+  PRIMARY KEY (nconst, tconst)
+) DEFAULT CHARSET = utf8mb4;
+
+INSERT IGNORE INTO person_known_for__new (nconst, tconst)
+SELECT nb.nconst, j.tconst
+FROM name_basics nb,
+     JSON_TABLE(CONCAT('["', REPLACE(nb.knownForTitles, ',', '","'), '"]'),
+                '$[*]' COLUMNS (tconst CHAR(10) PATH '$')) j
+WHERE nb.knownForTitles <> '';
+
+ALTER TABLE person_known_for__new ADD INDEX idx_tconst (tconst, nconst);
+
+/* ========= 5. person_profession ========= */
+DROP TABLE IF EXISTS person_profession__new;
+CREATE TABLE person_profession__new (
+  nconst     CHAR(10)    NOT NULL,
+  profession VARCHAR(64) NOT NULL,
+  PRIMARY KEY (nconst, profession)
+) DEFAULT CHARSET = utf8mb4;
+
+INSERT IGNORE INTO person_profession__new (nconst, profession)
+SELECT nb.nconst, j.profession
+FROM name_basics nb,
+     JSON_TABLE(CONCAT('["', REPLACE(nb.primaryProfession, ',', '","'), '"]'),
+                '$[*]' COLUMNS (profession VARCHAR(64) PATH '$')) j
+WHERE nb.primaryProfession <> '';
+
+ALTER TABLE person_profession__new ADD INDEX idx_profession (profession, nconst);
+
+/* ========= 6. 原子替换 ========= */
+CREATE TABLE IF NOT EXISTS title_genre       LIKE title_genre__new;
+CREATE TABLE IF NOT EXISTS title_director    LIKE title_director__new;
+CREATE TABLE IF NOT EXISTS title_writer      LIKE title_writer__new;
+CREATE TABLE IF NOT EXISTS person_known_for  LIKE person_known_for__new;
+CREATE TABLE IF NOT EXISTS person_profession LIKE person_profession__new;
+
+RENAME TABLE
+  title_genre       TO title_genre__old,       title_genre__new       TO title_genre,
+  title_director    TO title_director__old,    title_director__new    TO title_director,
+  title_writer      TO title_writer__old,      title_writer__new      TO title_writer,
+  person_known_for  TO person_known_for__old,  person_known_for__new  TO person_known_for,
+  person_profession TO person_profession__old, person_profession__new TO person_profession;
+
+DROP TABLE title_genre__old, title_director__old, title_writer__old,
+           person_known_for__old, person_profession__old;
+
+/* 派生数据变了，让后端清空查询缓存 */
+REPLACE INTO dataset_version VALUES (1, CURRENT_TIMESTAMP(6));
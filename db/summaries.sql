@@ -0,0 +1,153 @@
+/* ========= 预计算汇总表 =========
+   同名片按热度排序、"某年/某类型最佳"、"某导演拍过多少部"这类问题每次都要在
+   title_basics LEFT JOIN title_ratings 或 title_principals 上重新聚合。这里把结果
+   物化成小表，模型可以直接查询。依赖 normalize.sql 生成的关联表，文件名保证
+   docker 首次启动时排在它之后执行；之后可用
+   `python backend/db_scripts.py normalize summaries` 刷新（增量刷新脚本会自动调用）。
+   与 normalize.sql 相同：先写 *__new，再用 RENAME TABLE 原子替换。 */
+
+/* ========= 1. title_popularity ========= */
+DROP TABLE IF EXISTS title_popularity__new;
+CREATE TABLE title_popularity__new (
+  tconst          CHAR(10)     NOT NULL PRIMARY KEY,
+  titleType       VARCHAR(32),
+  primaryTitle    VARCHAR(512),
+  startYear       SMALLINT,
+  averageRating   DECIMAL(3,1),
+  numVotes        INT          NOT NULL,
+  popularity_rank INT UNSIGNED NOT NULL,
+  type_rank       INT UNSIGNED NOT NULL
+) DEFAULT CHARSET = utf8mb4
+  COMMENT = 'Every title with its rating; popularity_rank = position by numVotes (1 = most voted), type_rank = same within titleType. numVotes is 0 for unrated titles.';
+
+INSERT INTO title_popularity__new
+SELECT tb.tconst, tb.titleType, tb.primaryTitle, tb.startYear,
+       tr.averageRating, COALESCE(tr.numVotes, 0),
+       ROW_NUMBER() OVER (ORDER BY COALESCE(tr.numVotes, 0) DESC,
+                                   COALESCE(tr.averageRating, 0) DESC, tb.tconst),
+       ROW_NUMBER() OVER (PARTITION BY tb.titleType
+                          ORDER BY COALESCE(tr.numVotes, 0) DESC,
+                                   COALESCE(tr.averageRating, 0) DESC, tb.tconst)
+FROM title_basics tb
+LEFT JOIN title_ratings tr ON tr.tconst = tb.tconst;
+
+ALTER TABLE title_popularity__new
+  ADD INDEX idx_title (primaryTitle(100), numVotes),
+  ADD INDEX idx_type_rank (titleType, type_rank),
+  ADD INDEX idx_year (startYear, titleType, numVotes);
+
+/* ========= 2. year_genre_stats ========= */
+DROP TABLE IF EXISTS year_genre_stats__new;
+CREATE TABLE year_genre_stats__new (
+  startYear       SMALLINT     NOT NULL,
+  genre           VARCHAR(32)  NOT NULL,
+  titleType       VARCHAR(32)  NOT NULL,
+  title_count     INT UNSIGNED NOT NULL,
+  rated_count     INT UNSIGNED NOT NULL,
+  avg_rating      DECIMAL(4,2),
+  weighted_rating DECIMAL(4,2),
+  total_votes     BIGINT       NOT NULL,
+  top_tconst      CHAR(10),
+  best_tconst     CHAR(10),
+  PRIMARY KEY (startYear, genre, titleType)
+) DEFAULT CHARSET = utf8mb4
+  COMMENT = 'Per startYear/genre/titleType: avg_rating over rated titles, weighted_rating weighted by numVotes, top_tconst = most voted title, best_tconst = highest rated title with >= 1000 votes. For decades re-aggregate with SUM(avg_rating * rated_count) / SUM(rated_count).';
+
+INSERT INTO year_genre_stats__new
+WITH g AS (
+  SELECT p.startYear, tg.genre, p.titleType, p.tconst, p.averageRating, p.numVotes,
+         ROW_NUMBER() OVER (PARTITION BY p.startYear, tg.genre, p.titleType
+                            ORDER BY p.numVotes DESC, p.tconst) AS vote_pos,
+         ROW_NUMBER() OVER (PARTITION BY p.startYear, tg.genre, p.titleType
+                            ORDER BY p.numVotes >= 1000 DESC, p.averageRating DESC,
+                                     p.numVotes DESC, p.tconst) AS rating_pos
+  FROM title_popularity__new p
+  JOIN title_genre tg ON tg.tconst = p.tconst
+  WHERE p.startYear IS NOT NULL
+)
+SELECT startYear, genre, titleType,
+       COUNT(*),
+       COUNT(averageRating),
+       ROUND(AVG(averageRating), 2),
+       ROUND(SUM(averageRating * numVotes)
+             / NULLIF(SUM(IF(averageRating IS NULL, 0, numVotes)), 0), 2),
+       SUM(numVotes),
+       MAX(IF(vote_pos = 1, tconst, NULL)),
+       MAX(IF(rating_pos = 1 AND numVotes >= 1000, tconst, NULL))
+FROM g
+GROUP BY startYear, genre, titleType;
+
+ALTER TABLE year_genre_stats__new
+  ADD INDEX idx_genre (genre, titleType, startYear);
+
+/* ========= 3. person_filmography ========= */
+DROP TABLE IF EXISTS person_filmography__new;
+CREATE TABLE person_filmography__new (
+  nconst          CHAR(10)     NOT NULL PRIMARY KEY,
+  primaryName     VARCHAR(255),
+  title_count     INT UNSIGNED NOT NULL,
+  movie_count     INT UNSIGNED NOT NULL,
+  acting_count    INT UNSIGNED NOT NULL,
+  directing_count INT UNSIGNED NOT NULL,
+  writing_count   INT UNSIGNED NOT NULL,
+  rated_count     INT UNSIGNED NOT NULL,
+  avg_rating      DECIMAL(4,2),
+  total_votes     BIGINT       NOT NULL,
+  first_year      SMALLINT,
+  last_year       SMALLINT,
+  top_tconst      CHAR(10)
+) DEFAULT CHARSET = utf8mb4
+  COMMENT = 'Per person: distinct titles credited as actor/actress (title_principals), director or writer (title_crew); avg_rating over their rated titles, top_tconst = their most voted title.';
+
+INSERT INTO person_filmography__new
+WITH credits AS (
+  SELECT nconst, tconst,
+         MAX(role = 'a') AS acted, MAX(role = 'd') AS directed, MAX(role = 'w') AS wrote
+  FROM (
+    SELECT nconst, tconst, 'a' AS role FROM title_principals
+    WHERE category IN ('actor', 'actress')
+    UNION ALL
+    SELECT nconst, tconst, 'd' FROM title_director
+    UNION ALL
+    SELECT nconst, tconst, 'w' FROM title_writer
+  ) c
+  GROUP BY nconst, tconst
+), ranked AS (
+  SELECT c.nconst, c.tconst, c.acted, c.directed, c.wrote,
+         p.titleType, p.startYear, p.averageRating, p.numVotes,
+         ROW_NUMBER() OVER (PARTITION BY c.nconst ORDER BY p.numVotes DESC, c.tconst) AS pos
+  FROM credits c
+  JOIN title_popularity__new p ON p.tconst = c.tconst
+)
+SELECT r.nconst, MAX(nb.primaryName),
+       COUNT(*),
+       SUM(r.titleType = 'movie'),
+       SUM(r.acted), SUM(r.directed), SUM(r.wrote),
+       COUNT(r.averageRating),
+       ROUND(AVG(r.averageRating), 2),
+       SUM(r.numVotes),
+       MIN(r.startYear), MAX(r.startYear),
+       MAX(IF(r.pos = 1, r.tconst, NULL))
+FROM ranked r
+LEFT JOIN name_basics nb ON nb.nconst = r.nconst
+GROUP BY r.nconst;
+
+ALTER TABLE person_filmography__new
+  ADD INDEX idx_directing (directing_count),
+  ADD INDEX idx_acting (acting_count),
+  ADD INDEX idx_votes (total_votes);
+
+/* ========= 4. 原子替换 ========= */
+CREATE TABLE IF NOT EXISTS title_popularity   LIKE title_popularity__new;
+CREATE TABLE IF NOT EXISTS year_genre_stats   LIKE year_genre_stats__new;
+CREATE TABLE IF NOT EXISTS person_filmography LIKE person_filmography__new;
+
+RENAME TABLE
+  title_popularity   TO title_popularity__old,   title_popularity__new   TO title_popularity,
+  year_genre_stats   TO year_genre_stats__old,   year_genre_stats__new   TO year_genre_stats,
+  person_filmography TO person_filmography__old, person_filmography__new TO person_filmography;
+
+DROP TABLE title_popularity__old, year_genre_stats__old, person_filmography__old;
+
+/* 派生数据变了，让后端清空查询缓存 */
+REPLACE INTO dataset_version VALUES (1, CURRENT_TIMESTAMP(6));
@@ -1,7 +1,7 @@
 import React, { useState, useCallback, useRef, useEffect, useLayoutEffect } from 'react';
 import { Message } from './types';
 import { generateId } from './utils/mockData';
-import { callLLMAPI, clearChatHistory, healthCheck } from './services/apiService';
+import { callLLMAPI, clearChatHistory, healthCheck, prefetchMovieInfo } from './services/apiService';
 import MessageList from './components/MessageList';
 import ExampleQueries from './components/ExampleQueries';
 import InputArea from './components/InputArea';
@@ -112,6 +112,8 @@ const App: React.FC = () => {
       } else {
         // 添加AI回复
         addMessage('assistant', response.text, response.sql, response.data, response.results);
+        // 结果里的影片信息一次批量预取，点击时无需再逐个请求
+        prefetchMovieInfo(response.data);
       }
     } catch (error) {
       // 处理API调用异常
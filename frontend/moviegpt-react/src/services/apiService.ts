@@ -3,6 +3,18 @@ import { Message } from '../types';
 // API服务配置
 const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:8000';
 
+// 每个浏览器标签页一个会话，后端按 session_id 分开保存对话历史
+const SESSION_KEY = 'moviegpt_session_id';
+
+const getSessionId = (): string => {
+  let sessionId = sessionStorage.getItem(SESSION_KEY);
+  if (!sessionId) {
+    sessionId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+    sessionStorage.setItem(SESSION_KEY, sessionId);
+  }
+  return sessionId;
+};
+
 // API响应数据类型
 export interface APIResponse {
   text: string;
@@ -12,8 +24,15 @@ export interface APIResponse {
   error?: string;
 }
 
-// OMDb movie info
+// OMDb movie info，批量预取过的结果直接从这里返回
+const movieInfoCache = new Map<string, any>();
+const IMDB_ID_PATTERN = /^tt\d{7,10}$/;
+const MAX_BATCH_IDS = 50;
+
 export const getMovieInfo = async (imdbId: string): Promise<any> => {
+  if (movieInfoCache.has(imdbId)) {
+    return movieInfoCache.get(imdbId);
+  }
   try {
     const response = await fetch(`${API_BASE_URL}/api/info/${imdbId}`, {
       method: 'GET',
@@ -26,13 +45,58 @@ export const getMovieInfo = async (imdbId: string): Promise<any> => {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
 
-    return await response.json();
+    const data = await response.json();
+    movieInfoCache.set(imdbId, data);
+    return data;
   } catch (error) {
     console.error('获取影片信息失败:', error);
     return null;
   }
 };
 
+// 一次请求批量获取多部影片信息（后端并发访问 OMDb）
+export const getMovieInfoBatch = async (imdbIds: string[]): Promise<Record<string, any>> => {
+  const ids = Array.from(new Set(imdbIds)).filter(
+    id => IMDB_ID_PATTERN.test(id) && !movieInfoCache.has(id)
+  );
+  for (let i = 0; i < ids.length; i += MAX_BATCH_IDS) {
+    const chunk = ids.slice(i, i + MAX_BATCH_IDS);
+    try {
+      const response = await fetch(
+        `${API_BASE_URL}/api/info?ids=${encodeURIComponent(chunk.join(','))}`,
+        { method: 'GET' }
+      );
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const data = await response.json();
+      Object.entries(data.results || {}).forEach(([id, info]) => movieInfoCache.set(id, info));
+    } catch (error) {
+      console.error('批量获取影片信息失败:', error);
+    }
+  }
+  const result: Record<string, any> = {};
+  imdbIds.forEach(id => {
+    if (movieInfoCache.has(id)) {
+      result[id] = movieInfoCache.get(id);
+    }
+  });
+  return result;
+};
+
+// 从查询结果中收集 tconst，提前批量拉取影片信息
+export const prefetchMovieInfo = (rows: any): void => {
+  if (!Array.isArray(rows)) {
+    return;
+  }
+  const ids = rows
+    .map(row => (row && typeof row === 'object' ? row.tconst : undefined))
+    .filter((id): id is string => typeof id === 'string');
+  if (ids.length > 0) {
+    void getMovieInfoBatch(ids);
+  }
+};
+
 // 调用后端的chat接口
 export const callLLMAPI = async (userInput: string): Promise<APIResponse> => {
   try {
@@ -41,7 +105,7 @@ export const callLLMAPI = async (userInput: string): Promise<APIResponse> => {
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify({ message: userInput }),
+      body: JSON.stringify({ message: userInput, session_id: getSessionId() }),
     });
 
     if (!response.ok) {
@@ -69,7 +133,7 @@ export const callLLMAPI = async (userInput: string): Promise<APIResponse> => {
 // 清除后端聊天历史
 export const clearChatHistory = async (): Promise<boolean> => {
   try {
-    const response = await fetch(`${API_BASE_URL}/api/clear`, {
+    const response = await fetch(`${API_BASE_URL}/api/clear?session_id=${encodeURIComponent(getSessionId())}`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -86,7 +150,7 @@ export const clearChatHistory = async (): Promise<boolean> => {
 // 获取后端聊天历史
 export const getChatHistory = async (): Promise<Message[]> => {
   try {
-    const response = await fetch(`${API_BASE_URL}/api/history`, {
+    const response = await fetch(`${API_BASE_URL}/api/history?session_id=${encodeURIComponent(getSessionId())}`, {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
@@ -133,6 +197,7 @@ export const callLLMAPIStream = async (
       },
       body: JSON.stringify({
         message: userInput,
+        session_id: getSessionId(),
       }),
     });
 